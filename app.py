@@ -1,24 +1,63 @@
 # app.py (Updated to always generate AI results)
+import io
 import os
+import re
 import json
-import requests
-from flask import Flask, render_template, request, send_file, jsonify
+import logging
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timezone
+from flask import Flask, render_template, request, send_file, jsonify, Response, stream_with_context, url_for, g
 from dotenv import load_dotenv
-from utils.ocr import extract_text_from_pdf, extract_text_from_image
-from utils.extract import extract_tests
-from utils.summarizer import generate_summary
-from utils.pdf_export import generate_pdf_from_html
+from utils.cache import analysis_cache
+from utils.llm import ai_health, breaker
+from utils.pipeline import (
+    get_text, get_tests, get_summary, start_summary, start_tests, stream_summary, save_report, get_report
+)
+from utils.summarizer import fallback_summary
+from utils.jobs import job_queue, ensure_workers
+from utils.bulk import BulkError, stage_documents, analyze_documents
+from utils.uploads import receive_upload
+from utils.results import result_store
+from utils.router import router, start_deadline, end_deadline
+from utils.metrics import timed, render_metrics, start_request, end_request, server_timing
+from utils.pdf_export import build_report_html, generate_pdf_from_html
+from utils.startup import PRELOAD, preload
 from werkzeug.utils import secure_filename
 
 load_dotenv()
+# INFO by default; per-test and per-request detail is logged at DEBUG
+logging.basicConfig(
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
 app = Flask(__name__)
-UPLOAD_FOLDER = 'uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Reject request bodies above this size before reading them
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_MB', '25')) * 1024 * 1024
 
-# AI service health status (set on first request)
+# AI service health status (refreshed by the background prober)
 app.config['AI_SERVICE_OK'] = None
 
+# Render results immediately and stream the AI summary over /stream/<digest>
+app.config['STREAM_SUMMARY'] = os.getenv('STREAM_SUMMARY', '1') != '0'
+
+# Seconds an interactive upload may spend before AI calls give up and
+# fall back to basic output
+app.config['UPLOAD_DEADLINE'] = float(os.getenv('UPLOAD_DEADLINE', '60'))
+
+# Under gunicorn with PRELOAD=1 this runs once in the master, before the
+# workers fork; otherwise backends load on first use in each worker
+if PRELOAD:
+    preload()
+
+# Characters of extracted text shown in the raw text section of the results page
+app.config['ORIGINAL_PREVIEW_CHARS'] = int(os.getenv('ORIGINAL_PREVIEW_CHARS', '50000'))
+
+# Upload digests and report IDs are both hex SHA-256
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
 
 def _mask_key(val: str) -> str:
     if not val:
@@ -30,113 +69,214 @@ def check_ai_service():
     """Lightweight check to verify OpenRouter auth without leaking tokens.
 
     This will perform a minimal POST with a small max_tokens and set
-    app.config['AI_SERVICE_OK'] = True/False depending on the status.
+    app.config['AI_SERVICE_OK'] = True/False depending on the status. The
+    result also feeds the shared circuit breaker.
     """
-    api_key = os.getenv('OPENROUTER_API_KEY')
-    if not api_key:
-        app.logger.warning("OPENROUTER_API_KEY not set in environment")
-        app.config['AI_SERVICE_OK'] = False
-        return False
+    ok = ai_health.probe()
+    if ok:
+        app.logger.info("AI auth check succeeded")
+    else:
+        app.logger.warning(f"AI auth check failed: {ai_health.error}")
+    app.config['AI_SERVICE_OK'] = ok
+    return ok
 
-    try:
-        resp = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "mistralai/mixtral-8x7b-instruct",
-                "messages": [{"role": "user", "content": "auth check"}],
-                "max_tokens": 1
-            },
-            timeout=5
-        )
-        if resp.status_code == 200:
-            app.logger.info("AI auth check succeeded")
-            app.config['AI_SERVICE_OK'] = True
-            return True
-        else:
-            app.logger.warning(f"AI auth check failed: {resp.status_code} {resp.text}")
-            app.config['AI_SERVICE_OK'] = False
-            return False
 
-    except Exception as e:
-        app.logger.warning(f"AI auth check error: {e}")
-        app.config['AI_SERVICE_OK'] = False
-        return False
+@app.before_request
+def start_health_prober():
+    # Idempotent; starts one prober thread per worker process
+    ai_health.start()
+
+
+@app.before_request
+def start_job_workers():
+    # Idempotent; jobs left queued by an earlier process are picked up
+    # without waiting for a new submission (gunicorn starts them at boot)
+    ensure_workers()
+
+
+@app.before_request
+def start_timing():
+    g.request_started = time.perf_counter()
+    g.stage_timings = start_request()
+
+
+@app.before_request
+def start_upload_deadline():
+    # Only the interactive upload is bounded; bulk and job work can run long
+    if request.endpoint == 'upload_file' and request.method == 'POST':
+        start_deadline(app.config['UPLOAD_DEADLINE'])
+
+
+@app.after_request
+def add_server_timing(response):
+    started = g.get('request_started')
+    if started is not None:
+        response.headers['Server-Timing'] = server_timing(g.stage_timings, time.perf_counter() - started)
+    return response
+
+
+@app.teardown_request
+def stop_timing(exc):
+    end_request()
+    end_deadline()
+
+
+def _preview(text):
+    """The start of the extracted text, so the page does not grow with the document"""
+    limit = app.config['ORIGINAL_PREVIEW_CHARS']
+    if not limit or len(text) <= limit:
+        return text
+    return f"{text[:limit]}\n\n[... {len(text) - limit} more characters not shown]"
+
+
+def render_result(**context):
+    """Render the results page, timed as the 'render' stage"""
+    with timed('render'):
+        return render_template('result.html', **context)
 
 
 @app.route('/health', methods=['GET'])
 def health():
-    # Ensure we run the check at least once
-    if app.config.get('AI_SERVICE_OK') is None:
+    # Only probe inline if the background prober has not reported recently
+    if ai_health.is_stale():
         check_ai_service()
     return jsonify({
         'status': 'ok',
-        'ai_service_ok': bool(app.config.get('AI_SERVICE_OK')),
+        'ai_service_ok': bool(ai_health.ok),
+        'ai_circuit': breaker.snapshot()['state'],
+        'ai_models': router.snapshot(),
         'api_key_masked': _mask_key(os.getenv('OPENROUTER_API_KEY'))
     })
 
+@app.errorhandler(413)
+def upload_too_large(e):
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    message = f"Upload too large; the limit is {limit_mb} MB."
+    if request.path == '/':
+        return render_template('DiagonWise.html', error=message), 413
+    return jsonify({'error': message}), 413
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage timings and counters for this worker, in Prometheus text format"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@app.context_processor
+def inject_result_store():
+    return {'result_store_enabled': result_store is not None}
+
+
+def _parse_time(value):
+    """Unix timestamp from an ISO date or datetime (UTC unless an offset is given)"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _history_params(source, allow_new=False):
+    """(profile key, taken) to record results under, or None; raises ValueError if invalid.
+
+    The key must have been issued by the result store. With ``allow_new``,
+    ``new_profile`` asks for a fresh key instead.
+    """
+    if result_store is None:
+        return None
+    profile = (source.get('profile') or '').strip()
+    if allow_new and source.get('new_profile') and not profile:
+        profile = result_store.new_profile()
+    elif not profile:
+        return None
+    elif not result_store.has_profile(profile):
+        raise ValueError("Unknown profile key. Leave it empty and choose 'Start a new history' to get one.")
+    taken = (source.get('taken') or '').strip()
+    try:
+        return profile, _parse_time(taken) if taken else None
+    except ValueError:
+        raise ValueError("Sample date must be an ISO date such as 2024-03-31.") from None
+
+
+def _record_results(entries):
+    """Store (profile, digest, tests, taken, source) entries; failures only cost the history"""
+    try:
+        result_store.record_many(entries)
+    except sqlite3.Error as e:
+        app.logger.warning("Recording results failed: %s", e)
+
+
 @app.route('/', methods=['GET', 'POST'])
 def upload_file():
     if request.method == 'POST':
         f = request.files.get('report')
         if not f:
             return render_template('DiagonWise.html', error="No file uploaded.")
-
         try:
-            filename = secure_filename(f.filename)
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            f.save(file_path)
+            history = _history_params(request.form, allow_new=True)
+        except ValueError as e:
+            return render_template('DiagonWise.html', error=str(e))
 
-            # Extract text
-            if filename.lower().endswith('.pdf'):
-                text = extract_text_from_pdf(file_path)
-            else:
-                text = extract_text_from_image(file_path)
+        try:
+            # Read the upload in memory (spilling large files to a temp file)
+            with receive_upload(f) as upload:
+                digest = upload.digest
+                # Extract text (cached by upload hash)
+                text = get_text(digest, upload.source, secure_filename(f.filename))
 
             # Check if we have any text at all
             if not text or len(text.strip()) < 10:
                 return render_template('DiagonWise.html', error="Could not extract readable text from the document. Please try a clearer image or PDF.")
 
+            if app.config['STREAM_SUMMARY']:
+                # Show tests right away; the summary and AI explanations stream in
+                tests = get_tests(digest, text, fetch=False)
+                app.logger.debug("Found %d structured tests, streaming AI analysis", len(tests))
+                if history and tests:
+                    _record_results([(history[0], digest, tests, history[1], secure_filename(f.filename))])
+                return render_result(
+                    original=_preview(text),
+                    summary='',
+                    profile_key=history[0] if history else None,
+                    stream_url=url_for('stream_analysis', digest=digest),
+                    fallback_url=url_for('finish_analysis', digest=digest),
+                    tests=tests,
+                    tests_json=json.dumps(tests),
+                    ai_only=(len(tests) == 0),
+                    has_structured_data=(len(tests) > 0)
+                )
+
+            # Start the AI summary now so it overlaps with the explanation call
+            summary_future = start_summary(digest, text)
+
             # Try to extract structured test data
-            tests = extract_tests(text)
+            tests = get_tests(digest, text)
             
             # Debug output
-            print(f"Extracted text length: {len(text)}")
-            print(f"Found {len(tests)} structured tests")
-            for i, test in enumerate(tests):
-                print(f"  Test {i+1}: {test['test']} = {test['value']} {test['unit']} ({test['status']})")
-            
+            if app.logger.isEnabledFor(logging.DEBUG):
+                app.logger.debug("Extracted text length: %d", len(text))
+                app.logger.debug("Found %d structured tests", len(tests))
+                for i, test in enumerate(tests):
+                    app.logger.debug("  Test %d: %s = %s %s (%s)", i + 1, test['test'], test['value'], test['unit'], test['status'])
+            if history and tests:
+                _record_results([(history[0], digest, tests, history[1], secure_filename(f.filename))])
+
             # ALWAYS generate AI summary regardless of structured data
             try:
-                summary = generate_summary(text)
-                print("AI summary generated successfully")
+                summary = summary_future.result()
+                app.logger.debug("AI summary generated successfully")
             except Exception as e:
-                print(f"AI summary generation failed: {str(e)}")
-                # Provide a fallback summary
-                summary = f"""
-                <h3>Document Analysis</h3>
-                <ul>
-                    <li>Successfully extracted text from your medical document</li>
-                    <li>Document contains {len(text)} characters of content</li>
-                    {'<li><b>Found ' + str(len(tests)) + ' structured test results</b></li>' if tests else '<li>No structured test tables detected</li>'}
-                </ul>
-                <h3>Next Steps</h3>
-                <ul>
-                    <li>Review the extracted content below</li>
-                    <li>Consult with your healthcare provider for professional interpretation</li>
-                    <li>Keep this document for your medical records</li>
-                </ul>
-                <p><small>Note: AI analysis temporarily unavailable. Error: {str(e)}</small></p>
-                """
+                app.logger.warning("AI summary generation failed: %s", e)
+                summary = fallback_summary(text, e, tests)
+
+            report_id = save_report(summary, tests)
 
             # Always return results - either with or without structured data
-            return render_template(
-                'result.html',
-                original=text,
+            return render_result(
+                original=_preview(text),
                 summary=summary,
+                profile_key=history[0] if history else None,
+                download_url=url_for('download_report', report_id=report_id),
                 tests=tests,
                 tests_json=json.dumps(tests),
                 ai_only=(len(tests) == 0),
@@ -144,49 +284,239 @@ def upload_file():
             )
 
         except Exception as e:
-            print(f"Error processing file: {str(e)}")
+            app.logger.exception("Error processing file: %s", e)
             return render_template('DiagonWise.html', error=f"Error processing file: {str(e)}")
 
     return render_template('DiagonWise.html')
 
 
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue an upload for background analysis and return its job ID"""
+    f = request.files.get('report')
+    if not f or not f.filename:
+        return jsonify({'error': 'No file uploaded.'}), 400
+
+    job_id = job_queue.enqueue(secure_filename(f.filename), f.read())
+    ensure_workers()
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': url_for('job_status', job_id=job_id)
+    }), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report a job's status and current stage, plus the result once done"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+
+    body = {'job_id': job_id, 'status': job['status'], 'stage': job['stage']}
+    if job['status'] == 'done':
+        body['result'] = job['result']
+    elif job['status'] == 'failed':
+        body['error'] = job['error']
+    return jsonify(body)
+
+
+@app.route('/bulk', methods=['POST'])
+def bulk_analyze():
+    """Analyze many reports (or ZIP archives of reports), streaming NDJSON results.
+
+    One line is written per document as soon as it finishes, in
+    completion order, followed by a final ``done`` line with totals.
+    """
+    uploads = [(f.filename, f.stream) for f in request.files.getlist('reports') + request.files.getlist('report') if f.filename]
+    if not uploads:
+        return jsonify({'error': 'No file uploaded.'}), 400
+    try:
+        # The key goes in a header so it stays out of URLs and access logs
+        history = _history_params({'profile': request.headers.get('X-Profile-Key'), 'taken': request.args.get('taken')})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    directory = tempfile.mkdtemp(prefix='bulk-')
+    try:
+        documents = stage_documents(uploads, directory)
+    except BulkError as e:
+        shutil.rmtree(directory, ignore_errors=True)
+        return jsonify({'error': str(e)}), 400
+
+    summarize = request.args.get('summary', '1') != '0'
+    include_text = request.args.get('text', '0') == '1'
+
+    def lines():
+        failed = 0
+        recorded = []
+        try:
+            for result in analyze_documents(documents, summarize=summarize, include_text=include_text):
+                failed += result['status'] == 'error'
+                if history and result.get('tests'):
+                    recorded.append((history[0], result['digest'], result['tests'], history[1], result['filename']))
+                yield json.dumps(result) + '\n'
+            if recorded:
+                # One transaction for the whole upload
+                _record_results(recorded)
+            yield json.dumps({'status': 'done', 'documents': len(documents), 'failed': failed}) + '\n'
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    return Response(
+        stream_with_context(lines()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+@app.route('/profiles', methods=['POST'])
+def create_profile():
+    """Issue a profile key to record results under and read trends with"""
+    if result_store is None:
+        return jsonify({'error': 'Result history is disabled (set RESULT_STORE=1)'}), 404
+    return jsonify({'profile': result_store.new_profile()}), 201
+
+
+@app.route('/trends', methods=['GET'])
+def trends():
+    """Recorded results for a profile: the tests with counts, or one test's time series.
+
+    The profile key goes in the ``X-Profile-Key`` header, so it stays out
+    of URLs and access logs. ``?test=Hemoglobin`` selects a test; ``since``
+    / ``until`` (ISO dates) and ``limit`` (most recent N) narrow the series.
+    """
+    if result_store is None:
+        return jsonify({'error': 'Result history is disabled (set RESULT_STORE=1)'}), 404
+    profile = request.headers.get('X-Profile-Key', '').strip()
+    if not result_store.has_profile(profile):
+        # Same answer for malformed and unknown keys
+        return jsonify({'error': 'Unknown profile key'}), 404
+
+    test = request.args.get('test')
+    with timed('trends'):
+        if not test:
+            tests = result_store.tests(profile)
+            for row in tests:
+                row['latest'] = _iso(row['latest'])
+            return jsonify({'tests': tests})
+        try:
+            since = _parse_time(request.args['since']) if request.args.get('since') else None
+            until = _parse_time(request.args['until']) if request.args.get('until') else None
+            limit = int(request.args.get('limit', 0))
+        except ValueError:
+            return jsonify({'error': 'since/until must be ISO dates and limit an integer'}), 400
+        points = result_store.trend(profile, test, since, until, limit)
+    for point in points:
+        point['taken'] = _iso(point['taken'])
+    return jsonify({'test': test, 'points': points})
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route('/stream/<digest>', methods=['GET'])
+def stream_analysis(digest):
+    """Server-Sent Events: summary chunks, then AI explanations, then done"""
+    text = analysis_cache.get(digest, 'text') if DIGEST_RE.match(digest) else None
+    if text is None:
+        return jsonify({'error': 'Unknown or expired analysis'}), 404
+
+    def events():
+        tests_future = start_tests(digest, text)
+        chunks = []
+        try:
+            for chunk in stream_summary(digest, text):
+                chunks.append(chunk)
+                yield _sse('summary', {'html': chunk})
+            summary = ''.join(chunks)
+        except Exception as e:
+            app.logger.warning("AI summary stream failed: %s", e)
+            summary = fallback_summary(text, e)
+            yield _sse('fallback', {'html': summary})
+
+        tests = tests_future.result()
+        yield _sse('explanations', {t['test']: t['explanation'] for t in tests})
+        report_id = save_report(summary, tests)
+        yield _sse('done', {'download_url': url_for('download_report', report_id=report_id)})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/analysis/<digest>', methods=['GET'])
+def finish_analysis(digest):
+    """The summary, explanations and PDF link of a streamed analysis, as one JSON response.
+
+    The results page falls back to this when its event stream breaks.
+    """
+    text = analysis_cache.get(digest, 'text') if DIGEST_RE.match(digest) else None
+    if text is None:
+        return jsonify({'error': 'Unknown or expired analysis'}), 404
+
+    tests_future = start_tests(digest, text)
+    try:
+        summary = get_summary(digest, text)
+    except Exception as e:
+        app.logger.warning("AI summary failed: %s", e)
+        summary = fallback_summary(text, e)
+    tests = tests_future.result()
+    report_id = save_report(summary, tests)
+    return jsonify({
+        'summary': summary,
+        'explanations': {t['test']: t['explanation'] for t in tests},
+        'download_url': url_for('download_report', report_id=report_id),
+    })
+
+
+@app.route('/report/<report_id>.pdf', methods=['GET'])
+def download_report(report_id):
+    """PDF of a stored analysis, rendered once and then served from the cache"""
+    if not DIGEST_RE.match(report_id):
+        return jsonify({'error': 'Unknown or expired report'}), 404
+    pdf = analysis_cache.get_bytes(report_id, 'pdf')
+    if pdf is None:
+        report = get_report(report_id)
+        if report is None:
+            return jsonify({'error': 'Unknown or expired report'}), 404
+        with timed('pdf_render'):
+            pdf = generate_pdf_from_html(build_report_html(report['summary'], report['tests']))
+        analysis_cache.set_bytes(report_id, 'pdf', pdf)
+    return send_file(
+        io.BytesIO(pdf),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name='medical-report-analysis.pdf'
+    )
+
+
 @app.route('/download', methods=['POST'])
 def download_pdf():
+    """Legacy export from posted summary HTML and tests JSON; prefer /report/<id>.pdf"""
     summary_html = request.form.get('summary', '')
     tests_json = request.form.get('tests', '[]')
-    
-    # Create comprehensive HTML for PDF
+
     try:
         tests = json.loads(tests_json) if tests_json else []
-    except:
+    except ValueError:
         tests = []
-    
-    # Generate enhanced HTML for PDF export
-    pdf_html = f"""
-    <h1>Medical Report Analysis</h1>
-    
-    <h2>AI Analysis Summary</h2>
-    {summary_html}
-    
-    {f'''
-    <h2>Structured Test Results</h2>
-    <table border="1" style="border-collapse: collapse; width: 100%;">
-        <tr>
-            <th>Test</th>
-            <th>Value</th>
-            <th>Reference Range</th>
-            <th>Status</th>
-            <th>Explanation</th>
-        </tr>
-        {"".join([f"<tr><td>{test.get('test', '')}</td><td>{test.get('value', '')} {test.get('unit', '')}</td><td>{test.get('ref_range', '')}</td><td>{test.get('status', '')}</td><td>{test.get('explanation', '')}</td></tr>" for test in tests])}
-    </table>
-    ''' if tests else ''}
-    
-    <p><small>Generated by Medical Report Analyzer - For informational purposes only. Consult healthcare provider for medical advice.</small></p>
-    """
-    
-    pdf_path = generate_pdf_from_html(pdf_html)
-    return send_file(pdf_path, as_attachment=True)
+
+    with timed('pdf_render'):
+        pdf = generate_pdf_from_html(build_report_html(summary_html, tests))
+    return send_file(
+        io.BytesIO(pdf),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name='medical-report-analysis.pdf'
+    )
 
 if __name__ == '__main__':
     app.run(debug=True)
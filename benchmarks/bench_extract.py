@@ -0,0 +1,59 @@
+# benchmarks/bench_extract.py
+"""Microbenchmark for utils.extract.parse_tests.
+
+Run with ``python -m benchmarks.bench_extract``. Prints throughput in
+rows/sec for growing report sizes; a linear-time engine keeps it flat.
+"""
+
+import random
+import time
+
+from utils.extract import parse_tests
+
+ROWS = [
+    ("Hemoglobin", "g/dL", 12.0, 16.0),
+    ("Hematocrit", "%", 36.0, 46.0),
+    ("Platelet Count", "K/uL", 150.0, 400.0),
+    ("Serum Creatinine", "mg/dL", 0.6, 1.2),
+    ("Fasting Glucose", "mg/dL", 70.0, 100.0),
+    ("Total Cholesterol", "mg/dL", 125.0, 200.0),
+    ("TSH", "uIU/mL", 0.4, 4.0),
+    ("Vitamin B12", "pg/mL", 200.0, 900.0),
+]
+
+FILLER = "Patient ID 0042 Sample collected at 08:30 Method: automated analyser"
+
+
+def make_report(n_rows, seed=0):
+    """Build a report with n_rows result rows interleaved with filler text"""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n_rows):
+        name, unit, low, high = ROWS[i % len(ROWS)]
+        value = round(rng.uniform(low * 0.7, high * 1.3), 1)
+        lines.append(f"{name} {value} {unit} {low} - {high}")
+        if i % 5 == 0:
+            lines.append(FILLER)
+    return "\n".join(lines)
+
+
+def bench(n_rows, repeat=3):
+    text = make_report(n_rows)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse_tests(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'rows':>8} {'chars':>10} {'seconds':>10} {'rows/sec':>12}")
+    for n_rows in (100, 1000, 10000, 50000):
+        elapsed = bench(n_rows)
+        chars = len(make_report(n_rows))
+        print(f"{n_rows:>8} {chars:>10} {elapsed:>10.4f} {n_rows / elapsed:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/bench_names.py
+"""Test-name resolution: fuzzy name index versus a linear alias scan.
+
+Run with ``python -m benchmarks.bench_names``. Three resolvers are
+compared on the same names:
+
+- ``linear``: the substring scan over the alias table that the parser
+  used before the token index (``alias in name or name in alias``)
+- ``exact``: the token trie without typo tolerance
+- ``fuzzy``: the full index from utils/names.py
+
+There are three kinds of names: aliases as printed, aliases with OCR
+typos (look-alike characters swapped, or a letter dropped), and
+distractors. Distractors are report words that share letters with short
+aliases, plus other tests and findings spelled a few edits away from an
+alias ("Creatine Kinase" next to creatinine). The false-positive rate is
+only as good as this list; add neighbours here as they are found.
+For each resolver the benchmark reports accuracy on the first two, how
+often a distractor is taken for a test, and microseconds per lookup,
+both cold (memos cleared) and warm.
+"""
+
+import argparse
+import random
+import time
+
+from utils.extract import MEDICAL_TESTS, NEAR_MISSES
+from utils.names import NameIndex
+
+# Characters OCR confuses, each way round
+CONFUSIONS = [('l', '1'), ('i', 'l'), ('o', '0'), ('e', 'c'), ('s', '5'), ('b', 'h'), ('t', 'f')]
+
+DISTRACTORS = [
+    "Patient Name", "Alternative", "Salt intake", "Mortgage", "Tablet", "Thought", "Report Date",
+    "Referred By", "Sample Type", "Collected On", "Page", "Lab No", "Signature", "Method",
+    "Altitude", "Phone", "Email", "Address", "Tight", "Bottle", "Hobby", "Platform", "Plate No",
+    "Ultra", "Dr Smith", "Consultant", "Remarks", "Interpretation", "Comments", "Technician",
+]
+
+# Other tests and findings close to an alias
+NEIGHBOURS = [
+    "Creatine Kinase", "Creatine", "CPK Creatine", "Eosinophilia", "Neutrophilia", "Basophilia",
+    "Lymphocytosis", "Monocytosis", "Myelocytes", "Glucagon", "Transferase", "Prealbumin",
+    "Uric Acid", "Urate", "Lipase", "Thyroglobulin", "Bilirubinuria", "Reticulocytes",
+]
+
+
+def linear_scan(name):
+    """The old resolver: first alias that contains, or is contained in, the name"""
+    lowered = name.lower()
+    for standard_name, variations in MEDICAL_TESTS.items():
+        for variation in variations:
+            if variation in lowered or lowered in variation:
+                return standard_name
+    return None
+
+
+def ocr_typo(alias, rng):
+    """The alias with one OCR-style error in a word of five or more letters"""
+    words = alias.split()
+    long_words = [i for i, word in enumerate(words) if len(word) >= 5]
+    if not long_words:
+        return None
+    index = rng.choice(long_words)
+    word = words[index]
+    spots = [(i, b) for i, c in enumerate(word) for a, b in CONFUSIONS + [(b, a) for a, b in CONFUSIONS] if c == a]
+    if spots and rng.random() < 0.7:
+        i, replacement = rng.choice(spots)
+        word = word[:i] + replacement + word[i + 1:]
+    else:
+        i = rng.randrange(1, len(word) - 1)
+        word = word[:i] + word[i + 1:]
+    words[index] = word
+    return ' '.join(words)
+
+
+def build_cases(seed=0, typos_per_alias=3):
+    rng = random.Random(seed)
+    clean, typos = [], []
+    for standard_name, variations in MEDICAL_TESTS.items():
+        for alias in variations:
+            clean.append((alias.title(), standard_name))
+            for _ in range(typos_per_alias):
+                typo = ocr_typo(alias, rng)
+                if typo:
+                    typos.append((typo.title(), standard_name))
+    return clean, typos, [(name, None) for name in DISTRACTORS + NEIGHBOURS]
+
+
+def _accuracy(resolve, cases):
+    return sum(resolve(name) == expected for name, expected in cases) / len(cases)
+
+
+def _microseconds(resolve, names, repeat, reset=None):
+    best = float('inf')
+    for _ in range(repeat):
+        if reset:
+            reset()
+        start = time.perf_counter()
+        for name in names:
+            resolve(name)
+        best = min(best, time.perf_counter() - start)
+    return best / len(names) * 1e6
+
+
+def run(seed=0, repeat=5):
+    clean, typos, distractors = build_cases(seed)
+    names = [name for name, _ in clean + typos + distractors]
+    exact = NameIndex(MEDICAL_TESTS, fuzzy=False, near_misses=NEAR_MISSES)
+    fuzzy = NameIndex(MEDICAL_TESTS, fuzzy=True, near_misses=NEAR_MISSES)
+
+    def clear(index):
+        return lambda: (index._tokens.clear(), index._names.clear())
+
+    results = []
+    for label, resolve, reset in (
+        ('linear', linear_scan, None),
+        ('exact', exact.lookup, clear(exact)),
+        ('fuzzy', fuzzy.lookup, clear(fuzzy)),
+    ):
+        results.append({
+            'resolver': label,
+            'clean': _accuracy(resolve, clean),
+            'typos': _accuracy(resolve, typos),
+            'false_positives': 1 - _accuracy(resolve, distractors),
+            'cold_us': _microseconds(resolve, names, repeat, reset),
+            'warm_us': _microseconds(resolve, names, repeat),
+        })
+    return results, (len(clean), len(typos), len(distractors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare test-name resolvers")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    results, (clean, typos, distractors) = run(args.seed, args.repeat)
+    print(f"{clean} clean aliases, {typos} with OCR typos, {distractors} distractors")
+    print(f"{'resolver':<8} {'clean':>6} {'typos':>6} {'false +':>8} {'cold us':>8} {'warm us':>8}")
+    for row in results:
+        print(f"{row['resolver']:<8} {row['clean']:>6.2f} {row['typos']:>6.2f} {row['false_positives']:>8.2f} "
+              f"{row['cold_us']:>8.1f} {row['warm_us']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/bench_ocr.py
+"""Per-page OCR latency of each OCR backend on synthetic scanned pages.
+
+Run with ``python -m benchmarks.bench_ocr``. Every backend OCRs the same
+rendered pages in one thread, the way a pool worker does. The first page
+is reported separately as the cold start: for tesserocr it includes
+loading the language model, which pytesseract pays on every page. Recall
+against the corpus truth is printed too, so a backend that is faster but
+reads worse is visible.
+
+Backends that are not installed are reported as skipped.
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import time
+
+from benchmarks.bench_pipeline import score
+from benchmarks.corpus import make_report, render_page_image
+from utils import ocr
+from utils.extract import parse_tests
+
+
+def _available(backend):
+    if shutil.which('tesseract') is None and backend == 'pytesseract':
+        return "tesseract not installed"
+    if backend == 'tesserocr' and ocr.tesserocr is None:
+        return "tesserocr not installed"
+    return None
+
+
+def run(pages=10, backends=ocr.BACKENDS[1:], seed=0):
+    """Time OCR of the same pages with each backend; returns a list of result dicts"""
+    texts, _ = make_report(pages, seed)
+    images = [render_page_image(text, seed=seed + i) for i, text in enumerate(texts)]
+    first_page_truth = make_report(1, seed)[1]
+    results = []
+    for backend in backends:
+        row = {'backend': backend, 'pages': pages}
+        unavailable = _available(backend)
+        if unavailable:
+            row['skipped'] = unavailable
+            results.append(row)
+            continue
+        latencies = []
+        outputs = []
+        for image in images:
+            start = time.perf_counter()
+            outputs.append(ocr.ocr_image(image, backend))
+            latencies.append(time.perf_counter() - start)
+        if ocr.resolve_backend(backend) != backend:
+            row['skipped'] = "engine failed to start, see log"
+            results.append(row)
+            continue
+        warm = latencies[1:] or latencies
+        row.update({
+            'first_s': latencies[0],
+            'median_s': statistics.median(warm),
+            'p95_s': sorted(warm)[max(0, int(round(0.95 * len(warm))) - 1)],
+            'pages_per_s': len(images) / sum(latencies),
+            'recall': score(parse_tests(outputs[0]), first_page_truth)['recall'],
+        })
+        results.append(row)
+    return results
+
+
+def print_table(results):
+    print(f"{'backend':<12} {'pages':>5} {'first s':>9} {'median s':>9} {'p95 s':>9} {'pages/s':>8} {'recall':>6}")
+    for row in results:
+        if 'skipped' in row:
+            print(f"{row['backend']:<12} {row['pages']:>5}  skipped: {row['skipped']}")
+            continue
+        print(f"{row['backend']:<12} {row['pages']:>5} {row['first_s']:>9.3f} {row['median_s']:>9.3f} "
+              f"{row['p95_s']:>9.3f} {row['pages_per_s']:>8.2f} {row['recall']:>6.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-page latency of the OCR backends")
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--backends', nargs='+', choices=ocr.BACKENDS[1:], default=list(ocr.BACKENDS[1:]))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help="also write the results as JSON for comparing runs")
+    args = parser.parse_args()
+
+    results = run(args.pages, args.backends, args.seed)
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
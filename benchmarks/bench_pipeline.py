@@ -0,0 +1,183 @@
+# benchmarks/bench_pipeline.py
+"""Stage-by-stage benchmark over the synthetic corpus, with accuracy.
+
+Run with ``python -m benchmarks.bench_pipeline``. For each report size
+it times every stage and reports median and p95 latency, pages/sec and
+peak Python memory. Extraction precision/recall is printed next to the
+speed, so a faster change that breaks parsing shows up. LLM calls are
+stubbed, so results do not depend on the network.
+
+Stages whose system dependencies are missing (tesseract for OCR, the
+WeasyPrint libraries for PDF rendering) are skipped with a note.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.corpus import make_report, render_image, render_pdf, render_scanned_pdf, render_table_pdf, render_text
+from utils import extract, summarizer
+from utils.explanations import ExplanationMemo
+from utils.extract import parse_tests
+
+STAGES = ['extract', 'pdf_text', 'pdf_document', 'pdf_layout', 'pdf_tables', 'pdf_tables_layout', 'ocr_pdf', 'ocr_image', 'explain', 'summary', 'pdf_render']
+
+
+def _stub_llm():
+    """Replace every LLM call with an instant canned answer, and keep the memo off the real cache"""
+    memo_dir = tempfile.mkdtemp(prefix='bench-')
+    extract.explanation_memo = ExplanationMemo(os.path.join(memo_dir, 'explanations.sqlite3'))
+    extract.fetch_ai_explanations = lambda tests: {t['test']: f"{t['test']} explanation" for t in tests}
+    summarizer.routed_completion = lambda *args, **kwargs: (
+        "<h3>Summary</h3><ul><li>Stubbed summary of the synthetic report for benchmarking.</li></ul>"
+    )
+
+
+def score(found, truth):
+    """Precision, recall and exact-value accuracy of extracted tests against truth"""
+    expected = {t['test']: t for t in truth}
+    got = {t['test']: t for t in found}
+    matched = [name for name in got if name in expected]
+    correct = [
+        name for name in matched
+        if got[name]['value'] == expected[name]['value']
+        and got[name]['unit'] == expected[name]['unit']
+        and got[name]['status'] == expected[name]['status']
+    ]
+    return {
+        'precision': len(matched) / len(got) if got else 0.0,
+        'recall': len(matched) / len(expected) if expected else 0.0,
+        'exact': len(correct) / len(expected) if expected else 0.0,
+    }
+
+
+def _measure(fn, repeat):
+    """Run fn repeat times; return (latencies, last result, peak bytes of one traced run)"""
+    latencies = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        latencies.append(time.perf_counter() - start)
+    # Tracing slows the run down, so measure memory separately
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return latencies, result, peak
+
+
+def _stage_functions(texts, truth, seed):
+    """(stage -> (callable, output scorer or None, reason it is unavailable))"""
+    from utils.layout import iter_document_tests
+    from utils.ocr import extract_text_from_image, extract_text_from_pdf, iter_pdf_pages
+    from utils.pipeline import extract_document
+
+    text = render_text(texts)
+    pdf = render_pdf(texts)
+    tables = render_table_pdf(texts)
+    has_tesseract = shutil.which('tesseract') is not None
+    stages = {
+        'extract': (lambda: parse_tests(text), lambda r: score(r, truth), None),
+        'pdf_text': (lambda: parse_tests(extract_text_from_pdf(pdf)), lambda r: score(r, truth), None),
+        'pdf_document': (lambda: extract_document(pdf)[1], lambda r: score(r, truth), None),
+        'pdf_layout': (lambda: list(iter_document_tests(iter_pdf_pages(pdf, layout=True))), lambda r: score(r, truth), None),
+        'pdf_tables': (lambda: parse_tests(extract_text_from_pdf(tables)), lambda r: score(r, truth), None),
+        'pdf_tables_layout': (lambda: list(iter_document_tests(iter_pdf_pages(tables, layout=True))), lambda r: score(r, truth), None),
+        'explain': (lambda: extract.get_ai_explanations(parse_tests(text)), None, None),
+        'summary': (lambda: summarizer.request_summary(text), None, None),
+    }
+
+    if has_tesseract:
+        scanned = render_scanned_pdf(texts)
+        image = render_image(texts)
+        first_page_truth = make_report(1, seed)[1]
+        stages['ocr_pdf'] = (lambda: parse_tests(extract_text_from_pdf(scanned)), lambda r: score(r, truth), None)
+        stages['ocr_image'] = (
+            lambda: parse_tests(extract_text_from_image(image)),
+            lambda r: score(r, first_page_truth),
+            None
+        )
+    else:
+        stages['ocr_pdf'] = stages['ocr_image'] = (None, None, "tesseract not installed")
+
+    try:
+        from utils.pdf_export import build_report_html, generate_pdf_from_html, weasyprint
+        weasyprint.load()
+    except (ImportError, OSError) as e:
+        stages['pdf_render'] = (None, None, f"WeasyPrint unavailable ({type(e).__name__})")
+    else:
+        tests = parse_tests(text)
+        report_html = build_report_html("<h3>Summary</h3><p>Synthetic report.</p>", tests)
+        stages['pdf_render'] = (lambda: generate_pdf_from_html(report_html), None, None)
+    return stages
+
+
+def run(page_counts, stages=STAGES, repeat=3, seed=0):
+    """Benchmark the stages for each report size; returns a list of result dicts"""
+    _stub_llm()
+    results = []
+    for pages in page_counts:
+        texts, truth = make_report(pages, seed)
+        available = _stage_functions(texts, truth, seed)
+        for stage in stages:
+            fn, scorer, unavailable = available[stage]
+            row = {'stage': stage, 'pages': pages}
+            if unavailable:
+                row['skipped'] = unavailable
+                results.append(row)
+                continue
+            # OCR is slow; one timed run is enough for large scanned reports
+            runs = 1 if stage.startswith('ocr') and pages > 10 else repeat
+            latencies, output, peak = _measure(fn, runs)
+            median = statistics.median(latencies)
+            row.update({
+                'median_s': median,
+                'p95_s': sorted(latencies)[max(0, int(round(0.95 * len(latencies))) - 1)],
+                'pages_per_s': pages / median if median else float('inf'),
+                'peak_mb': peak / (1024 * 1024),
+            })
+            if scorer:
+                row.update(scorer(output))
+            results.append(row)
+    return results
+
+
+def print_table(results):
+    print(f"{'stage':<18} {'pages':>5} {'median s':>10} {'p95 s':>10} {'pages/s':>10} {'peak MB':>8} "
+          f"{'prec':>6} {'recall':>6} {'exact':>6}")
+    for row in results:
+        if 'skipped' in row:
+            print(f"{row['stage']:<18} {row['pages']:>5}  skipped: {row['skipped']}")
+            continue
+        accuracy = ''.join(
+            f" {row[key]:>6.2f}" if key in row else f" {'-':>6}"
+            for key in ('precision', 'recall', 'exact')
+        )
+        print(f"{row['stage']:<18} {row['pages']:>5} {row['median_s']:>10.4f} {row['p95_s']:>10.4f} "
+              f"{row['pages_per_s']:>10.1f} {row['peak_mb']:>8.2f}{accuracy}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DiagonWise pipeline stages on a synthetic corpus")
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 50, 200], help="report sizes in pages")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help="also write the results as JSON for comparing runs")
+    args = parser.parse_args()
+
+    results = run(args.pages, args.stages, args.repeat, args.seed)
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
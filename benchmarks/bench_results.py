@@ -0,0 +1,91 @@
+# benchmarks/bench_results.py
+"""Insert throughput and trend query latency of the result store.
+
+Run with ``python -m benchmarks.bench_results``. Fills a temporary store
+with synthetic history (profiles x analyses x the corpus panel), then
+times trend queries for random (profile, test) pairs and the per-profile
+test listing. The defaults give about 440,000 result rows.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.corpus import PANEL, expected_name, expected_status
+from utils.results import ResultStore
+
+DAY = 24 * 3600
+
+
+def _analysis(rng):
+    tests = []
+    for standard, _, unit, low, high in PANEL:
+        value = round(rng.uniform(low * 0.6, high * 1.4), 1)
+        tests.append({
+            'test': expected_name(standard), 'value': value, 'unit': unit,
+            'ref_low': low, 'ref_high': high, 'status': expected_status(value, low, high),
+        })
+    return tests
+
+
+def fill(store, profiles, analyses, seed=0, batch=500):
+    """Record analyses per profile, batch at a time; returns rows per second"""
+    rng = random.Random(seed)
+    entries = []
+    rows = 0
+    start = time.perf_counter()
+    for p in range(profiles):
+        for a in range(analyses):
+            entries.append((f"profile-{p}", f"{p}-{a}", _analysis(rng), a * 30 * DAY, None))
+            rows += len(PANEL)
+            if len(entries) >= batch:
+                store.record_many(entries)
+                entries = []
+    store.record_many(entries)
+    return rows, rows / (time.perf_counter() - start)
+
+
+def _latencies(fn, queries):
+    latencies = []
+    for args in queries:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.median(latencies), latencies[max(0, int(round(0.95 * len(latencies))) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the result store")
+    parser.add_argument('--profiles', type=int, default=1000)
+    parser.add_argument('--analyses', type=int, default=20, help="analyses per profile")
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench-results-') as directory:
+        store = ResultStore(os.path.join(directory, 'results.sqlite3'))
+        rows, rate = fill(store, args.profiles, args.analyses, args.seed)
+        print(f"inserted {rows} rows at {rate:,.0f} rows/s")
+
+        rng = random.Random(args.seed)
+        pairs = [
+            (f"profile-{rng.randrange(args.profiles)}", expected_name(rng.choice(PANEL)[0]))
+            for _ in range(args.queries)
+        ]
+        half = args.analyses * 30 * DAY / 2
+        for label, fn, queries in (
+            ('trend', store.trend, pairs),
+            ('trend since', lambda p, t: store.trend(p, t, since=half), pairs),
+            ('trend last 5', lambda p, t: store.trend(p, t, limit=5), pairs),
+            ('tests', store.tests, [(p,) for p, _ in pairs]),
+        ):
+            median, p95 = _latencies(fn, queries)
+            print(f"{label:<14} median {median * 1000:7.3f} ms   p95 {p95 * 1000:7.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+# benchmarks/bench_startup.py
+"""Startup time and memory per worker, lazy versus preloaded.
+
+Run with ``python -m benchmarks.bench_startup`` from the repository root.
+It reports:
+
+- ``import app`` time in a fresh interpreter, with the backends lazy
+  (the default) and with ``PRELOAD=1`` (the cost the master pays once)
+- for gunicorn in each mode, against a local fake OpenRouter: time from
+  launch to the first answered request, time for all workers to come back
+  after they are killed (what an autoscaled or restarted worker costs),
+  the first upload and PDF export (which pay for lazy loading), and RSS
+  and PSS per worker after that traffic
+
+PSS (proportional set size) splits each shared page between the
+processes mapping it, so it shows what copy-on-write sharing saves;
+RSS counts shared pages in full for every worker. Both come from
+``/proc/<pid>/smaps_rollup`` and are Linux only.
+"""
+
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from benchmarks.corpus import make_report, render_pdf
+from benchmarks.fake_openrouter import FakeOpenRouter
+from benchmarks.loadtest import REPO_ROOT, _free_port, _unique
+
+MODES = {'lazy': {'PRELOAD': '0'}, 'preload': {'PRELOAD': '1'}}
+_IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+
+
+def import_seconds(env, repeat=3):
+    """Median wall time of ``import app`` in a fresh interpreter"""
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, '-c', _IMPORT_SNIPPET], cwd=REPO_ROOT, env=env,
+            capture_output=True, text=True, check=True
+        ).stdout
+        times.append(float(out.strip().splitlines()[-1]))
+    return statistics.median(times)
+
+
+def worker_pids(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as fh:
+        return [int(pid) for pid in fh.read().split()]
+
+
+def memory_kib(pid):
+    """{'rss': KiB, 'pss': KiB} of a process"""
+    usage = {}
+    with open(f'/proc/{pid}/smaps_rollup') as fh:
+        for line in fh:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                usage[key.lower()] = int(rest.split()[0])
+    return usage
+
+
+def _wait_for(url, process, timeout=120):
+    """Seconds until url answers, polling often enough to time a boot"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        try:
+            if requests.get(url, timeout=5).ok:
+                return time.perf_counter() - start
+        except requests.RequestException:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError("gunicorn did not become ready")
+
+
+def _wait_for_workers(master_pid, count, old, process, timeout=120):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        pids = set(worker_pids(master_pid)) - old
+        if len(pids) >= count:
+            return pids
+        time.sleep(0.01)
+    raise RuntimeError("workers were not replaced")
+
+
+def measure_server(mode_env, workers, directory, api_url):
+    """Boot, restart and first-request timings plus memory for one gunicorn configuration"""
+    port = _free_port()
+    env = dict(
+        os.environ, **mode_env,
+        OPENROUTER_API_URL=api_url, OPENROUTER_API_KEY='bench',
+        ANALYSIS_CACHE_PATH=os.path.join(directory, 'analysis.sqlite3'),
+        EXPLANATION_MEMO_PATH=os.path.join(directory, 'explanations.sqlite3'),
+        JOBS_DB_PATH=os.path.join(directory, 'jobs.sqlite3'),
+        LOG_LEVEL='WARNING',
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    log_path = os.path.join(directory, 'gunicorn.log')
+    with open(log_path, 'wb') as log:
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+             '--workers', str(workers), '--timeout', '120'],
+            cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+    try:
+        row = {'boot_s': _wait_for(base_url + '/health', process)}
+        pids = set(_wait_for_workers(process.pid, workers, set(), process))
+
+        # Kill every worker; the master forks replacements
+        start = time.perf_counter()
+        for pid in pids:
+            os.kill(pid, signal.SIGKILL)
+        _wait_for_workers(process.pid, workers, pids, process)
+        _wait_for(base_url + '/health', process)
+        row['restart_s'] = time.perf_counter() - start
+
+        # One upload and one export per worker, so each has used the backends
+        texts, _ = make_report(1)
+        pdf = render_pdf(texts)
+        uploads, downloads = [], []
+        for _ in range(workers):
+            start = time.perf_counter()
+            response = requests.post(base_url + '/', timeout=180, files={
+                'report': ('report.pdf', _unique(pdf, 'pdf'), 'application/pdf')})
+            uploads.append((time.perf_counter() - start, response.ok))
+            start = time.perf_counter()
+            response = requests.post(base_url + '/download', timeout=180, data={
+                'summary': '<p>Summary</p>', 'tests': '[]'})
+            downloads.append((time.perf_counter() - start, response.ok))
+        row['first_upload_s'] = uploads[0][0] if uploads[0][1] else None
+        row['first_download_s'] = downloads[0][0] if downloads[0][1] else None
+
+        usage = [memory_kib(pid) for pid in worker_pids(process.pid)]
+        row['worker_rss_mib'] = statistics.mean(u['rss'] for u in usage) / 1024
+        row['worker_pss_mib'] = statistics.mean(u['pss'] for u in usage) / 1024
+        row['total_pss_mib'] = (sum(u['pss'] for u in usage) + memory_kib(process.pid)['pss']) / 1024
+        return row
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def run(workers=4, repeat=3):
+    results = []
+    with FakeOpenRouter(latency=0.0, jitter=0.0) as fake:
+        for mode, mode_env in MODES.items():
+            row = {'mode': mode, 'workers': workers, 'import_s': import_seconds(dict(os.environ, **mode_env), repeat)}
+            with tempfile.TemporaryDirectory(prefix='bench-startup-') as directory:
+                row.update(measure_server(mode_env, workers, directory, fake.url))
+            results.append(row)
+    return results
+
+
+def _fmt(value, spec):
+    return format(value, spec) if value is not None else f"{'failed':>{spec.split('.')[0]}}"
+
+
+def print_table(results):
+    print(f"{'mode':<8} {'import s':>8} {'boot s':>7} {'restart s':>9} {'upload s':>8} {'export s':>8} "
+          f"{'RSS MiB':>8} {'PSS MiB':>8} {'total PSS':>9}")
+    for row in results:
+        print(f"{row['mode']:<8} {row['import_s']:>8.3f} {row['boot_s']:>7.3f} {row['restart_s']:>9.3f} "
+              f"{_fmt(row['first_upload_s'], '8.3f')} {_fmt(row['first_download_s'], '8.3f')} "
+              f"{row['worker_rss_mib']:>8.1f} {row['worker_pss_mib']:>8.1f} {row['total_pss_mib']:>9.1f}")
+    print("RSS/PSS are per worker after one upload and one export each; total PSS includes the master.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure worker startup time and memory, lazy vs preloaded")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3, help="fresh interpreters per import timing")
+    args = parser.parse_args()
+    print_table(run(args.workers, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
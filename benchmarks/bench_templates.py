@@ -0,0 +1,102 @@
+# benchmarks/bench_templates.py
+"""Lab templates versus the generic parsers, per corpus layout.
+
+Run with ``python -m benchmarks.bench_templates``. The shipped registry
+is empty, so the benchmark registers a template for each lab layout of
+the synthetic corpus (see ``BENCH_TEMPLATES``) while it runs. For each,
+a report is rendered in that layout and parsed two ways:
+
+- ``text``: page text through ``parse_tests``, as for OCRed pages and
+  images, where the generic path is the row regex
+- ``pdf``: a PDF with a text layer through ``iter_pdf_pages`` with
+  layout, as uploads are read, where the generic path is the word-box
+  parser of utils/layout.py
+
+Each is timed with templates off and on. The table shows rows per
+second, the speedup and extraction accuracy against the corpus truth.
+"""
+
+import argparse
+import time
+
+from benchmarks.bench_pipeline import score
+from benchmarks.corpus import ROWS_PER_PAGE, make_report, render_pdf, render_text
+from utils import extract
+from utils.extract import parse_tests
+from utils.layout import iter_document_tests
+from utils.ocr import iter_pdf_pages
+from utils.templates import LabTemplate, TemplateRegistry
+
+# A template for each corpus layout, by corpus lab
+BENCH_TEMPLATES = {
+    'city': LabTemplate(
+        'city_diagnostic', header='CITY DIAGNOSTIC LABORATORY',
+        columns=('name', 'value', 'unit', 'low', '-', 'high'),
+    ),
+    'northside': LabTemplate(
+        'northside_pathology', header='NORTHSIDE PATHOLOGY SERVICES',
+        columns=('name', 'value', 'unit', 'range', 'flag'), separator='|',
+    ),
+}
+
+
+def _best(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def measure(fn, truth, repeat):
+    """{'generic': ..., 'lab': ...} timings and accuracy of one parse, templates off and on"""
+    row = {}
+    for label, enabled in (('generic', False), ('lab', True)):
+        extract.lab_templates.enabled = enabled
+        seconds, found = _best(fn, repeat)
+        row[label] = dict(score(found, truth), seconds=seconds, rows=len(found))
+    return row
+
+
+def run(pages=50, repeat=5, seed=0):
+    results = []
+    shipped = extract.lab_templates
+    extract.lab_templates = TemplateRegistry(BENCH_TEMPLATES.values())
+    try:
+        for lab, template in BENCH_TEMPLATES.items():
+            texts, truth = make_report(pages, seed, lab=lab)
+            text = render_text(texts)
+            pdf = render_pdf(texts)
+            for path, fn in (
+                ('text', lambda: parse_tests(text)),
+                ('pdf', lambda: list(iter_document_tests(iter_pdf_pages(pdf, layout=True)))),
+            ):
+                results.append(dict(measure(fn, truth, repeat), template=template.name, path=path))
+    finally:
+        extract.lab_templates = shipped
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare lab templates with the generic parsers")
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = run(args.pages, args.repeat, args.seed)
+    print(f"{args.pages}-page reports; rows/s counts the panel rows on every page")
+    print(f"{'template':<20} {'path':<5} {'generic r/s':>12} {'template r/s':>12} {'speedup':>8} "
+          f"{'generic exact':>13} {'template exact':>14}")
+    for row in results:
+        generic, lab = row['generic'], row['lab']
+        panel_rows = args.pages * ROWS_PER_PAGE
+        print(f"{row['template']:<20} {row['path']:<5} {panel_rows / generic['seconds']:>12.0f} "
+              f"{panel_rows / lab['seconds']:>12.0f} {generic['seconds'] / lab['seconds']:>7.1f}x "
+              f"{generic['exact']:>13.2f} {lab['exact']:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+# benchmarks/corpus.py
+"""Synthetic lab-report corpus with known ground truth.
+
+Every report is generated from a seed, so runs are reproducible. A report
+is a list of page texts plus the values that extraction should recover.
+It can be rendered as plain text, as a PDF with a text layer, as a
+scanned (image-only) PDF, or as a noisy rasterized image.
+
+Write a corpus to disk with::
+
+    python -m benchmarks.corpus out/ --pages 1 10 50 200
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+# (standard name, alias printed on the report, unit, reference low, high)
+PANEL = [
+    ("hemoglobin", "Hemoglobin", "g/dL", 13.0, 17.0),
+    ("hematocrit", "Hematocrit", "%", 40.0, 50.0),
+    ("rbc", "RBC", "mill/uL", 4.5, 5.5),
+    ("wbc", "Total Leucocyte Count", "cells/uL", 4000.0, 11000.0),
+    ("platelet", "Platelet Count", "10^3/uL", 150.0, 400.0),
+    ("mcv", "MCV", "fL", 83.0, 101.0),
+    ("mch", "MCH", "pg", 27.0, 32.0),
+    ("rdw", "RDW", "%", 11.6, 14.0),
+    ("esr", "ESR", "mm/hr", 0.0, 20.0),
+    ("glucose", "Fasting Glucose", "mg/dL", 70.0, 100.0),
+    ("urea", "Blood Urea", "mg/dL", 15.0, 40.0),
+    ("creatinine", "Serum Creatinine", "mg/dL", 0.6, 1.2),
+    ("bilirubin", "Total Bilirubin", "mg/dL", 0.3, 1.2),
+    ("sgpt", "SGPT", "U/L", 7.0, 56.0),
+    ("sgot", "SGOT", "U/L", 5.0, 40.0),
+    ("cholesterol", "Total Cholesterol", "mg/dL", 125.0, 200.0),
+    ("triglycerides", "Triglycerides", "mg/dL", 50.0, 150.0),
+    ("hdl", "HDL Cholesterol", "mg/dL", 40.0, 60.0),
+    ("ldl", "LDL Cholesterol", "mg/dL", 50.0, 130.0),
+    ("ferritin", "Ferritin", "ng/mL", 30.0, 400.0),
+    ("vitamin_b12", "Vitamin B12", "pg/mL", 200.0, 900.0),
+    ("tsh", "TSH", "uIU/mL", 0.4, 4.0),
+]
+
+NARRATIVE = [
+    "Sample collected at 08:30 and processed on an automated analyser.",
+    "Results should be interpreted in the clinical context of the patient.",
+    "Fasting status confirmed by the patient at the time of collection.",
+    "Haemolysed samples may give falsely raised potassium values.",
+    "Method: photometry, calibrated against certified reference material.",
+]
+
+# Report layouts by lab: header line, column titles, and row format.
+# bench_templates reads each with a lab template.
+LABS = {
+    'city': (
+        "CITY DIAGNOSTIC LABORATORY",
+        "Test Result Unit Reference Range",
+        "{alias} {value} {unit} {low} - {high}",
+    ),
+    'northside': (
+        "NORTHSIDE PATHOLOGY SERVICES",
+        "Test | Result | Unit | Reference | Flag",
+        "{alias} | {value} | {unit} | {low}-{high} | {flag}",
+    ),
+}
+
+ROWS_PER_PAGE = 12
+_LINES_PER_PAGE = 40
+
+
+def expected_name(standard):
+    """Display name parse_tests reports for a standard test name"""
+    return standard.replace('_', ' ').title()
+
+
+def expected_status(value, low, high):
+    """Status band by the documented rule: beyond 20% outside the range is 'Very'"""
+    if value < low:
+        return "Low" if value >= low * 0.8 else "Very Low"
+    if value > high:
+        return "High" if value <= high * 1.2 else "Very High"
+    return "Normal"
+
+
+def make_report(pages, seed=0, rows_per_page=ROWS_PER_PAGE, lab='city'):
+    """Return (page texts, ground truth) for a report of the given length.
+
+    Pages repeat the panel with fresh values, like serial results, in the
+    layout of one of the ``LABS``. Ground truth is the first occurrence
+    of each test, which is what ``parse_tests`` keeps.
+    """
+    header, titles, row_format = LABS[lab]
+    rng = random.Random(seed)
+    texts = []
+    truth = {}
+    for page in range(pages):
+        lines = [
+            header,
+            f"Patient: Synthetic {seed:04d}   Age/Sex: 45/M   Page {page + 1} of {pages}",
+            titles,
+        ]
+        for i in range(rows_per_page):
+            standard, alias, unit, low, high = PANEL[(page * rows_per_page + i) % len(PANEL)]
+            value = round(rng.uniform(low * 0.6, high * 1.4), 1)
+            flag = 'L' if value < low else 'H' if value > high else ''
+            lines.append(row_format.format(alias=alias, value=value, unit=unit, low=low, high=high, flag=flag).rstrip())
+            truth.setdefault(standard, {
+                'test': expected_name(standard),
+                'value': value,
+                'unit': unit,
+                'status': expected_status(value, low, high),
+            })
+            if rng.random() < 0.25:
+                lines.append(rng.choice(NARRATIVE))
+        lines.append("This is a computer generated report.")
+        texts.append("\n".join(lines))
+    return texts, list(truth.values())
+
+
+def render_text(texts):
+    return "\n".join(texts)
+
+
+def render_pdf(texts):
+    """PDF bytes with a text layer (no OCR needed)"""
+    doc = fitz.open()
+    for text in texts:
+        page = doc.new_page()
+        page.insert_text((50, 60), text, fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _split_row(line):
+    """[name, value, unit, range] for a test row line, or None for other lines"""
+    parts = line.rsplit(' ', 5)
+    if len(parts) != 6 or parts[4] != '-':
+        return None
+    return [parts[0], parts[1], parts[2], f"{parts[3]} - {parts[5]}"]
+
+
+def render_table_pdf(texts, columns=2):
+    """PDF bytes with each page's rows laid out as side-by-side tables.
+
+    Rows are dealt across ``columns`` tables, and every table is drawn
+    one column at a time (all names, then all values...), as many report
+    generators write them. The text layer is then out of reading order,
+    which is what the layout-aware extraction is for. Other lines follow
+    the tables.
+    """
+    doc = fitz.open()
+    offsets = (0, 110, 150, 205)
+    for text in texts:
+        page = doc.new_page()
+        width = (page.rect.width - 60) / columns
+        rows, notes = [], []
+        for line in text.splitlines():
+            row = _split_row(line)
+            (rows if row else notes).append(row or line)
+        for column in range(columns):
+            table = rows[column::columns]
+            x = 30 + column * width
+            for cell, offset in enumerate(offsets):
+                for i, row in enumerate(table):
+                    page.insert_text((x + offset, 60 + 14 * i), row[cell], fontsize=8)
+        y = 80 + 14 * ((len(rows) + columns - 1) // columns)
+        for i, note in enumerate(notes):
+            page.insert_text((30, y + 12 * i), note, fontsize=8)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 has a single fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def render_page_image(text, noise=0.02, rotation=0.0, seed=0, width=1700, height=2200):
+    """Rasterize one page like a scanner would: grayscale, speckled, slightly skewed"""
+    rng = random.Random(seed)
+    image = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    draw.multiline_text((80, 80), text, fill=0, font=_font(28), spacing=12)
+    if rotation:
+        image = image.rotate(rotation, resample=Image.Resampling.BICUBIC, fillcolor=255)
+    if noise:
+        pixels = image.load()
+        for _ in range(int(width * height * noise)):
+            x, y = rng.randrange(width), rng.randrange(height)
+            pixels[x, y] = rng.choice((0, 255))
+    return image.filter(ImageFilter.GaussianBlur(0.6))
+
+
+def render_image(texts, noise=0.02, rotation=0.7, seed=0):
+    """PNG bytes of the first page as a noisy photo/scan"""
+    buffer = io.BytesIO()
+    render_page_image(texts[0], noise, rotation, seed).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def render_scanned_pdf(texts, noise=0.02, rotation=0.5, seed=0):
+    """Image-only PDF bytes: every page must go through OCR"""
+    doc = fitz.open()
+    for i, text in enumerate(texts):
+        buffer = io.BytesIO()
+        render_page_image(text, noise, rotation, seed + i).save(buffer, format='PNG')
+        page = doc.new_page()
+        page.insert_image(page.rect, stream=buffer.getvalue())
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def write_corpus(directory, page_counts, seed=0):
+    """Write every rendering of one report per page count, plus truth JSON"""
+    os.makedirs(directory, exist_ok=True)
+    for pages in page_counts:
+        texts, truth = make_report(pages, seed)
+        stem = os.path.join(directory, f"report_{pages:03d}p")
+        with open(stem + '.txt', 'w', encoding='utf-8') as fh:
+            fh.write(render_text(texts))
+        with open(stem + '.pdf', 'wb') as fh:
+            fh.write(render_pdf(texts))
+        with open(stem + '_tables.pdf', 'wb') as fh:
+            fh.write(render_table_pdf(texts))
+        with open(stem + '_scanned.pdf', 'wb') as fh:
+            fh.write(render_scanned_pdf(texts, seed=seed))
+        with open(stem + '.png', 'wb') as fh:
+            fh.write(render_image(texts, seed=seed))
+        with open(stem + '.truth.json', 'w', encoding='utf-8') as fh:
+            json.dump(truth, fh, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic lab-report corpus")
+    parser.add_argument('directory')
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 50, 200])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_corpus(args.directory, args.pages, args.seed)
+    print(f"Wrote {len(args.pages)} reports to {args.directory}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+# benchmarks/fake_openrouter.py
+"""Local stand-in for the OpenRouter chat completions API.
+
+Answers ``POST .../chat/completions`` like OpenRouter does, with
+configurable latency, slow-tail, error rate and streaming pace, so load
+tests exercise the app's AI paths without the network or an API key.
+Explanation prompts get JSON explanations for the tests they list, and
+everything else gets a short HTML summary.
+
+Run standalone and point the app at it::
+
+    python -m benchmarks.fake_openrouter --port 8099 --latency 1.5 --error-rate 0.02
+    OPENROUTER_API_URL=http://127.0.0.1:8099/api/v1/chat/completions OPENROUTER_API_KEY=x python app.py
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUMMARY_HTML = (
+    "<h3>Key Findings</h3><ul><li>Most results are within their reference ranges.</li></ul>"
+    "<h3>Medical Interpretation</h3><ul><li>Values flagged high or low are mild deviations.</li></ul>"
+    "<h3>Health Insights</h3><ul><li>No urgent findings in this synthetic report.</li></ul>"
+    "<h3>Recommendations</h3><ul><li>Discuss the flagged values with your clinician.</li></ul>"
+)
+# "- Name: Status" lines of the explanation prompt
+_TEST_LINE_RE = re.compile(r'^- ([^:\n]+): ', re.MULTILINE)
+
+
+class FakeOpenRouter:
+    """Threaded HTTP server imitating chat completions; use as a context manager"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=1.0, jitter=0.2, slow_rate=0.0, slow_latency=10.0,
+                 error_rate=0.0, chunks=20, model_latency=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.chunks = chunks
+        self.model_latency = model_latency or {}
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v1/chat/completions"
+
+    def _plan(self, model):
+        """(seconds to answer, whether to fail) for one request"""
+        with self._lock:
+            self.requests += 1
+            latency = self.model_latency.get(model, self.latency)
+            if self._rng.random() < self.slow_rate:
+                latency = self.slow_latency
+            latency *= 1 + self._rng.uniform(-self.jitter, self.jitter)
+            return max(0.0, latency), self._rng.random() < self.error_rate
+
+    @staticmethod
+    def content_for(prompt):
+        if '"explanations"' in prompt:
+            tests = _TEST_LINE_RE.findall(prompt)
+            return json.dumps({'explanations': {
+                name.strip(): f"{name.strip()} is a routine laboratory measurement." for name in tests
+            }})
+        return SUMMARY_HTML
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    return self._send_json(400, {'error': {'message': 'invalid JSON'}})
+                if not self.path.endswith('/chat/completions'):
+                    return self._send_json(404, {'error': {'message': 'not found'}})
+
+                latency, fail = fake._plan(payload.get('model'))
+                prompt = ''.join(m.get('content', '') for m in payload.get('messages', []))
+                content = fake.content_for(prompt)[:max(1, payload.get('max_tokens', 1000)) * 4]
+                if fail:
+                    time.sleep(latency / 2)
+                    return self._send_json(503, {'error': {'message': 'upstream overloaded'}})
+                if not payload.get('stream'):
+                    time.sleep(latency)
+                    return self._send_json(200, {
+                        'model': payload.get('model'),
+                        'choices': [{'message': {'role': 'assistant', 'content': content}}],
+                    })
+
+                # Streaming: first token after a third of the latency, the rest paced evenly
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                time.sleep(latency / 3)
+                size = max(1, -(-len(content) // fake.chunks))
+                pieces = [content[i:i + size] for i in range(0, len(content), size)]
+                for piece in pieces:
+                    chunk = {'choices': [{'delta': {'content': piece}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    time.sleep(latency * 2 / 3 / len(pieces))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-openrouter', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _model_latency(values):
+    pairs = (value.split('=', 1) for value in values or [])
+    return {model: float(seconds) for model, seconds in pairs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake OpenRouter API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=1.0, help="typical seconds per completion")
+    parser.add_argument('--jitter', type=float, default=0.2, help="± fraction of random variation")
+    parser.add_argument('--slow-rate', type=float, default=0.0, help="fraction of calls in the slow tail")
+    parser.add_argument('--slow-latency', type=float, default=10.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of calls answered with 503")
+    parser.add_argument('--chunks', type=int, default=20, help="pieces a streamed answer is sent in")
+    parser.add_argument('--model-latency', nargs='*', metavar='MODEL=SECONDS', help="per-model latency overrides")
+    args = parser.parse_args()
+
+    server = FakeOpenRouter(args.host, args.port, args.latency, args.jitter, args.slow_rate, args.slow_latency,
+                            args.error_rate, args.chunks, _model_latency(args.model_latency))
+    print(f"Fake OpenRouter listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
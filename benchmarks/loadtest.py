@@ -0,0 +1,347 @@
+# benchmarks/loadtest.py
+"""Load test of the real app under gunicorn, against a fake OpenRouter.
+
+Run with ``python -m benchmarks.loadtest`` from the repository root. For
+every worker class and worker count it starts gunicorn on a free port,
+then drives ``/``, ``/download`` and ``/health`` at each concurrency
+level with a weighted mix of synthetic text PDFs, scanned PDFs and
+images. When an upload answers with a streaming results page, the
+client also reads its ``/stream`` events to the end, as a browser would.
+AI calls go to a local ``FakeOpenRouter`` with the given latency and
+error rate.
+
+For each configuration and concurrency it reports throughput, latency
+percentiles per endpoint and the error rate. It also names the
+saturation point: the concurrency where adding clients stops adding
+throughput, or where errors pass 1%.
+
+Every upload gets unique bytes, so each one misses the analysis cache
+like a new report would. The explanation memo warms up as it does in
+production. Worker classes whose package is missing (gevent, eventlet)
+are skipped.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import requests
+
+from benchmarks.corpus import make_report, render_image, render_pdf, render_scanned_pdf, render_text
+from benchmarks.fake_openrouter import FakeOpenRouter
+from utils.extract import parse_tests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKER_CLASSES = ('sync', 'gthread', 'gevent', 'eventlet')
+# A level saturates when it adds less than this fraction of throughput
+SATURATION_GAIN = 0.10
+MAX_ERROR_RATE = 0.01
+_STREAM_URL_RE = re.compile(r'new EventSource\("([^"]+)"\)')
+
+
+def _weights(text):
+    """'pdf=6,image=2' -> {'pdf': 6.0, 'image': 2.0}"""
+    pairs = (item.split('=', 1) for item in text.split(',') if item)
+    return {name.strip(): float(weight) for name, weight in pairs}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def build_documents(seed=0):
+    """{kind: (filename, bytes, content type)} for each document kind in the mix"""
+    texts, _ = make_report(2, seed)
+    return {
+        'pdf': ('report.pdf', render_pdf(texts), 'application/pdf'),
+        'scanned': ('scan.pdf', render_scanned_pdf(texts[:1]), 'application/pdf'),
+        'image': ('photo.png', render_image(texts), 'image/png'),
+    }
+
+
+def _unique(data, kind):
+    # Trailing bytes after %%EOF / IEND are ignored by the readers but
+    # change the upload hash, so every request is a cache miss
+    marker = uuid.uuid4().hex.encode('ascii')
+    return data + (b'\n%' + marker + b'\n' if kind != 'image' else marker)
+
+
+class Client:
+    """One closed-loop virtual user: sends a request, waits, repeats"""
+
+    def __init__(self, base_url, documents, endpoint_mix, document_mix, download_form, rng):
+        self.base_url = base_url
+        self.documents = documents
+        self.endpoint_mix = endpoint_mix
+        self.document_mix = document_mix
+        self.download_form = download_form
+        self.rng = rng
+        self.session = requests.Session()
+
+    def _pick(self, weights):
+        names = list(weights)
+        return self.rng.choices(names, weights=[weights[n] for n in names])[0]
+
+    def _timed(self, samples, endpoint, fn):
+        start = time.perf_counter()
+        try:
+            response = fn()
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        samples.append((endpoint, time.perf_counter() - start, ok))
+        return response
+
+    def _read_stream(self, url):
+        with self.session.get(self.base_url + url, stream=True, timeout=180) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if line == 'event: done':
+                    break
+            return response
+
+    def step(self, samples):
+        endpoint = self._pick(self.endpoint_mix)
+        if endpoint == 'health':
+            self._timed(samples, 'health', lambda: self.session.get(self.base_url + '/health', timeout=60))
+        elif endpoint == 'download':
+            self._timed(samples, 'download', lambda: self.session.post(
+                self.base_url + '/download', data=self.download_form, timeout=180))
+        else:
+            kind = self._pick(self.document_mix)
+            filename, data, content_type = self.documents[kind]
+            start = time.perf_counter()
+            response = self._timed(samples, f'upload_{kind}', lambda: self.session.post(
+                self.base_url + '/', files={'report': (filename, _unique(data, kind), content_type)}, timeout=180))
+            match = _STREAM_URL_RE.search(response.text) if response is not None and response.ok else None
+            if match:
+                self._timed(samples, 'stream', lambda: self._read_stream(match.group(1)))
+                samples.append((f'upload_{kind}_total', time.perf_counter() - start, samples[-1][2]))
+
+
+def run_level(base_url, concurrency, duration, documents, endpoint_mix, document_mix, download_form, seed):
+    """Drive the server with `concurrency` clients for `duration` seconds; returns the samples"""
+    samples = []
+    stop = time.monotonic() + duration
+
+    def loop(index):
+        client = Client(base_url, documents, endpoint_mix, document_mix, download_form,
+                        random.Random(seed * 1000 + index))
+        local = []
+        while time.monotonic() < stop:
+            client.step(local)
+        samples.extend(local)
+
+    threads = [threading.Thread(target=loop, args=(i,)) for i in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.monotonic() - started
+
+
+def _percentile(ordered, fraction):
+    return ordered[max(0, int(round(fraction * len(ordered))) - 1)]
+
+
+def summarize(samples, elapsed):
+    """Throughput, error rate and per-endpoint latency percentiles for one level"""
+    # Totals and streams describe uploads already counted; leave them out of throughput
+    requests_done = [s for s in samples if not s[0].endswith('_total') and s[0] != 'stream']
+    failures = sum(1 for s in requests_done if not s[2])
+    endpoints = {}
+    for endpoint in sorted({s[0] for s in samples}):
+        ordered = sorted(s[1] for s in samples if s[0] == endpoint)
+        endpoints[endpoint] = {
+            'count': len(ordered),
+            'p50_s': statistics.median(ordered),
+            'p95_s': _percentile(ordered, 0.95),
+            'p99_s': _percentile(ordered, 0.99),
+        }
+    return {
+        'requests': len(requests_done),
+        'throughput_rps': len(requests_done) / elapsed if elapsed else 0.0,
+        'error_rate': failures / len(requests_done) if requests_done else 0.0,
+        'endpoints': endpoints,
+    }
+
+
+def saturation_point(levels):
+    """First concurrency whose extra clients stop paying off, or None if it kept scaling"""
+    previous = None
+    for level in levels:
+        if level['error_rate'] > MAX_ERROR_RATE:
+            return level['concurrency']
+        if previous and level['throughput_rps'] < previous['throughput_rps'] * (1 + SATURATION_GAIN):
+            return previous['concurrency']
+        previous = level
+    return None
+
+
+def _wait_ready(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        try:
+            if requests.get(base_url + '/health', timeout=5).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("gunicorn did not become ready")
+
+
+def start_server(worker_class, workers, threads, api_url, directory, extra_env=None):
+    """Start gunicorn for app:app; returns (process, base URL)"""
+    port = _free_port()
+    env = dict(
+        os.environ,
+        OPENROUTER_API_URL=api_url,
+        OPENROUTER_API_KEY='loadtest',
+        ANALYSIS_CACHE_PATH=os.path.join(directory, 'analysis.sqlite3'),
+        EXPLANATION_MEMO_PATH=os.path.join(directory, 'explanations.sqlite3'),
+        JOBS_DB_PATH=os.path.join(directory, 'jobs.sqlite3'),
+        LOG_LEVEL='WARNING',
+        **(extra_env or {})
+    )
+    command = [
+        sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers), '--worker-class', worker_class, '--timeout', '120',
+    ]
+    if worker_class == 'gthread':
+        command += ['--threads', str(threads)]
+    elif worker_class in ('gevent', 'eventlet'):
+        command += ['--worker-connections', '1000']
+    log_path = os.path.join(directory, 'gunicorn.log')
+    with open(log_path, 'wb') as log:
+        process = subprocess.Popen(command, cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        _wait_ready(base_url, process)
+    except RuntimeError as e:
+        process.kill()
+        process.wait()
+        with open(log_path, 'rb') as log:
+            tail = log.read()[-300:].decode('utf-8', 'replace').strip().splitlines()
+        raise RuntimeError(f"{e}: {tail[-1] if tail else 'no output'}") from None
+    return process, base_url
+
+
+def available_worker_class(worker_class):
+    """None if gunicorn can run this worker class here, else why not"""
+    if worker_class in ('gevent', 'eventlet') and importlib.util.find_spec(worker_class) is None:
+        return f"{worker_class} not installed"
+    return None
+
+
+def run(worker_classes, worker_counts, concurrency_levels, duration, threads=4, endpoint_mix=None,
+        document_mix=None, llm_options=None, seed=0, extra_env=None):
+    """Measure every (worker class, workers) configuration; returns a list of result dicts"""
+    endpoint_mix = endpoint_mix or {'upload': 8, 'download': 1, 'health': 1}
+    document_mix = document_mix or {'pdf': 6, 'scanned': 2, 'image': 2}
+    documents = build_documents(seed)
+    texts, _ = make_report(2, seed)
+    download_form = {
+        'summary': "<h3>Summary</h3><p>Load test report.</p>",
+        'tests': json.dumps(parse_tests(render_text(texts))),
+    }
+    results = []
+    with FakeOpenRouter(seed=seed, **(llm_options or {})) as fake:
+        for worker_class in worker_classes:
+            for workers in worker_counts:
+                row = {'worker_class': worker_class, 'workers': workers,
+                       'threads': threads if worker_class == 'gthread' else None}
+                unavailable = available_worker_class(worker_class)
+                if unavailable:
+                    results.append(dict(row, skipped=unavailable))
+                    continue
+                with tempfile.TemporaryDirectory(prefix='loadtest-') as directory:
+                    try:
+                        process, base_url = start_server(worker_class, workers, threads, fake.url, directory,
+                                                         extra_env)
+                    except RuntimeError as e:
+                        results.append(dict(row, skipped=str(e)))
+                        continue
+                    try:
+                        levels = []
+                        for concurrency in concurrency_levels:
+                            samples, elapsed = run_level(base_url, concurrency, duration, documents,
+                                                         endpoint_mix, document_mix, download_form, seed)
+                            levels.append(dict(summarize(samples, elapsed), concurrency=concurrency))
+                    finally:
+                        process.terminate()
+                        process.wait(timeout=30)
+                row['levels'] = levels
+                row['saturation_concurrency'] = saturation_point(levels)
+                row['peak_rps'] = max(level['throughput_rps'] for level in levels)
+                results.append(row)
+    return results
+
+
+def print_report(results):
+    for row in results:
+        label = f"{row['worker_class']} x{row['workers']}" + (f" ({row['threads']} threads)" if row['threads'] else '')
+        if 'skipped' in row:
+            print(f"{label}: skipped: {row['skipped']}")
+            continue
+        saturation = row['saturation_concurrency']
+        print(f"{label}: peak {row['peak_rps']:.2f} req/s, "
+              + (f"saturates at concurrency {saturation}" if saturation else "still scaling at the highest level"))
+        print(f"  {'conc':>4} {'req/s':>7} {'errors':>7}  {'endpoint':<20} {'n':>5} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7}")
+        for level in row['levels']:
+            first = True
+            for endpoint, stats in level['endpoints'].items():
+                prefix = (f"  {level['concurrency']:>4} {level['throughput_rps']:>7.2f} {level['error_rate']:>7.1%}"
+                          if first else ' ' * 22)
+                print(f"{prefix}  {endpoint:<20} {stats['count']:>5} {stats['p50_s']:>7.3f} "
+                      f"{stats['p95_s']:>7.3f} {stats['p99_s']:>7.3f}")
+                first = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test gunicorn configurations against a fake OpenRouter")
+    parser.add_argument('--worker-class', nargs='+', choices=WORKER_CLASSES, default=['sync', 'gthread'])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=4, help="threads per gthread worker")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--duration', type=float, default=20, help="seconds per concurrency level")
+    parser.add_argument('--endpoints', default='upload=8,download=1,health=1', help="request mix weights")
+    parser.add_argument('--documents', default='pdf=6,scanned=2,image=2', help="upload mix weights")
+    parser.add_argument('--llm-latency', type=float, default=1.5, help="fake AI seconds per completion")
+    parser.add_argument('--llm-slow-rate', type=float, default=0.05, help="fraction of fake AI calls in the slow tail")
+    parser.add_argument('--llm-slow-latency', type=float, default=10.0)
+    parser.add_argument('--llm-error-rate', type=float, default=0.0)
+    parser.add_argument('--no-stream', action='store_true', help="run the app with STREAM_SUMMARY=0")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help="also write the results as JSON")
+    args = parser.parse_args()
+
+    results = run(
+        args.worker_class, args.workers, args.concurrency, args.duration, args.threads,
+        _weights(args.endpoints), _weights(args.documents),
+        {'latency': args.llm_latency, 'slow_rate': args.llm_slow_rate,
+         'slow_latency': args.llm_slow_latency, 'error_rate': args.llm_error_rate},
+        args.seed, {'STREAM_SUMMARY': '0'} if args.no_stream else None,
+    )
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
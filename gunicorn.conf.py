@@ -0,0 +1,28 @@
+# gunicorn.conf.py
+"""Gunicorn settings; picked up automatically when gunicorn starts in this directory.
+
+Command-line flags still override these. With ``PRELOAD=1`` the app and
+its backends (see utils/startup.py) load once in the master and workers
+fork from it. Each worker starts its background job threads as soon as
+it boots.
+"""
+
+import gc
+import os
+
+preload_app = os.getenv('PRELOAD', '0') == '1'
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # Everything preloaded lives as long as the process. Freezing it
+        # keeps each worker's garbage collector from writing to those
+        # objects, which would copy their pages into every worker.
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    # Drain jobs left in the queue by a previous worker without waiting
+    # for the first request (see ensure_workers)
+    from utils.jobs import ensure_workers
+    ensure_workers()
@@ -0,0 +1,13 @@
+import pytest
+
+from utils import extract, llm, pipeline
+from utils.cache import AnalysisCache
+from utils.explanations import ExplanationMemo
+
+
+@pytest.fixture(autouse=True)
+def isolated_stores(tmp_path, monkeypatch):
+    """Keep the on-disk caches and AI circuit breaker of every test isolated"""
+    monkeypatch.setattr(pipeline, 'analysis_cache', AnalysisCache(str(tmp_path / "analysis.sqlite3")))
+    monkeypatch.setattr(extract, 'explanation_memo', ExplanationMemo(str(tmp_path / "explanations.sqlite3")))
+    monkeypatch.setattr(llm, 'breaker', llm.CircuitBreaker())
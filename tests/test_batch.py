@@ -0,0 +1,55 @@
+import csv
+import json
+
+import fitz
+
+from utils import batch
+
+REPORT = "Hemoglobin 10.5 g/dL 13.0-17.0\nGlucose 95 mg/dL 70-100\nPlatelet Count 250 10^3/uL 150-400"
+
+
+def _pdf(path, text):
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+
+
+def _archive(tmp_path, count):
+    root = tmp_path / "archive"
+    (root / "2023").mkdir(parents=True)
+    for i in range(count):
+        _pdf(root / "2023" / f"report{i}.pdf", REPORT)
+    (root / "notes.txt").write_text("not a report")
+    return root
+
+
+def test_iter_reports_is_sorted_and_filtered(tmp_path):
+    root = _archive(tmp_path, 3)
+    assert list(batch.iter_reports(str(root))) == [f"2023/report{i}.pdf" for i in range(3)]
+
+
+def test_run_batch_writes_ndjson_and_resumes_from_checkpoint(tmp_path):
+    root = _archive(tmp_path, 3)
+    output = str(tmp_path / "results.ndjson")
+
+    assert batch.run_batch(str(root), output, workers=2, use_llm=False) == (3, 0)
+    results = [json.loads(line) for line in open(output)]
+    assert sorted(r['path'] for r in results) == [f"2023/report{i}.pdf" for i in range(3)]
+    assert {t['test'] for t in results[0]['tests']} >= {"Hemoglobin", "Glucose"}
+
+    # A rerun only picks up files that were not checkpointed
+    _pdf(root / "2023" / "report9.pdf", REPORT)
+    assert batch.run_batch(str(root), output, workers=2, use_llm=False) == (1, 0)
+    assert len(open(output).readlines()) == 4
+
+
+def test_run_batch_writes_one_csv_row_per_test(tmp_path):
+    root = _archive(tmp_path, 1)
+    (root / "broken.pdf").write_bytes(b"not a pdf")
+    output = str(tmp_path / "results.csv")
+
+    assert batch.run_batch(str(root), output, fmt='csv', workers=1, use_llm=False) == (2, 1)
+    rows = list(csv.DictReader(open(output)))
+    assert [r['path'] for r in rows if r['error']] == ["broken.pdf"]
+    assert {r['test'] for r in rows if r['path'] == "2023/report0.pdf"} >= {"Hemoglobin", "Glucose"}
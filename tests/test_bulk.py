@@ -0,0 +1,99 @@
+import io
+import time
+import zipfile
+
+import pytest
+
+from utils import bulk, extract
+from utils.bulk import BulkError, analyze_documents, stage_documents
+
+REPORT = "Hemoglobin 10.5 g/dL 13.0-17.0\nGlucose 95 mg/dL 70-100\n"
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+
+def test_stage_documents_expands_zip_and_skips_unsupported(tmp_path):
+    archive = _zip({"a/report.pdf": b"one", "b/report.pdf": b"two", "notes.txt": b"x", "__MACOSX/._c.png": b"y"})
+    documents = stage_documents([("batch.zip", archive), ("scan.png", io.BytesIO(b"img"))], str(tmp_path))
+
+    assert [name for name, _ in documents] == ["a/report.pdf", "b/report.pdf", "scan.png"]
+    paths = [path for _, path in documents]
+    assert len(set(paths)) == 3
+    assert open(paths[1], 'rb').read() == b"two"
+
+
+def test_stage_documents_enforces_limits(tmp_path):
+    with pytest.raises(BulkError):
+        stage_documents([("a.pdf", io.BytesIO(b"1")), ("b.pdf", io.BytesIO(b"2"))], str(tmp_path), max_files=1)
+    with pytest.raises(BulkError):
+        stage_documents([("report.docx", io.BytesIO(b"1"))], str(tmp_path))
+
+
+def test_stage_documents_rejects_zip_bombs_before_extracting(tmp_path):
+    # Compresses to a few KB but declares 4 MB of members
+    archive = _zip({f"{i}.pdf": b"\0" * (1024 * 1024) for i in range(4)})
+    with pytest.raises(BulkError):
+        stage_documents([("bomb.zip", archive)], str(tmp_path), max_bytes=3 * 1024 * 1024)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_analyze_documents_batches_explanations_across_reports(tmp_path, monkeypatch):
+    documents = []
+    for i in range(3):
+        path = tmp_path / f"{i}.pdf"
+        path.write_bytes(f"report {i}".encode())
+        documents.append((f"{i}.pdf", str(path)))
+    documents.append(("blank.pdf", str(tmp_path / "blank.pdf")))
+    (tmp_path / "blank.pdf").write_bytes(b"blank")
+
+    monkeypatch.setattr(bulk, 'get_text', lambda digest, path: "" if path.endswith("blank.pdf") else REPORT)
+    calls = []
+
+    def fake_fetch(tests):
+        calls.append([t['test'] for t in tests])
+        return {t['test']: f"{t['test']} explained" for t in tests}
+
+    monkeypatch.setattr(extract, 'fetch_ai_explanations', fake_fetch)
+    results = list(analyze_documents(documents, summarize=False, workers=4))
+
+    ok = sorted((r for r in results if r['status'] == 'ok'), key=lambda r: r['index'])
+    assert [r['index'] for r in ok] == [0, 1, 2]
+    assert all(t['explanation'] == f"{t['test']} explained" for r in ok for t in r['tests'])
+    assert [r['filename'] for r in results if r['status'] == 'error'] == ["blank.pdf"]
+    # Identical tests across reports are only ever sent to the LLM once
+    sent = [name for call in calls for name in call]
+    assert len(sent) == len(set(sent))
+
+
+def test_analyze_documents_waits_to_fill_a_batch(tmp_path, monkeypatch):
+    reports = {
+        "0.pdf": "Ferritin 20 ng/mL 30-400\n",
+        "1.pdf": "Sodium 150 mmol/L 135-145\n",
+        "2.pdf": "Potassium 6.1 mmol/L 3.5-5.1\n",
+    }
+    documents = []
+    for name in reports:
+        (tmp_path / name).write_bytes(name.encode())
+        documents.append((name, str(tmp_path / name)))
+
+    def staggered(digest, path):
+        name = path.rsplit('/', 1)[-1]
+        time.sleep(0.05 * int(name[0]))
+        return reports[name]
+
+    monkeypatch.setattr(bulk, 'get_text', staggered)
+    calls = []
+    monkeypatch.setattr(extract, 'fetch_ai_explanations',
+                        lambda tests: calls.append(tests) or {t['test']: "explained" for t in tests})
+    results = list(analyze_documents(documents, summarize=False, workers=3, max_wait=5))
+
+    assert sorted(r['index'] for r in results if r['status'] == 'ok') == [0, 1, 2]
+    # Documents finishing apart are still explained in one call
+    assert len(calls) == 1
@@ -0,0 +1,88 @@
+from utils import extract, pipeline
+from utils.cache import AnalysisCache, content_hash
+
+
+def test_cache_round_trip_per_stage(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_bytes=1 << 20)
+    digest = content_hash(b"report")
+    cache.set(digest, 'text', "Hemoglobin 13.5")
+    cache.set(digest, 'tests', [{"test": "Hemoglobin", "value": 13.5}])
+    assert cache.get(digest, 'text') == "Hemoglobin 13.5"
+    assert cache.get(digest, 'tests') == [{"test": "Hemoglobin", "value": 13.5}]
+    assert cache.get(digest, 'summary') is None
+
+
+def test_cache_expires_entries_after_ttl(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite3"), ttl=-1, max_bytes=1 << 20)
+    cache.set("abc", 'text', "stale")
+    assert cache.get("abc", 'text') is None
+
+
+def test_cache_evicts_least_recently_used_over_size(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_bytes=250)
+    cache.set("old", 'text', "x" * 100)
+    cache.set("new", 'text', "y" * 100)
+    cache.get("old", 'text')
+    cache.set("newest", 'text', "z" * 100)
+    assert cache.get("new", 'text') is None
+    assert cache.get("old", 'text') == "x" * 100
+    assert cache.get("newest", 'text') == "z" * 100
+
+
+def test_repeat_upload_skips_ocr_and_llm(monkeypatch):
+    calls = []
+    monkeypatch.setattr(pipeline, 'extract_document',
+                        lambda source, filename=None: (calls.append('ocr') or "Hb 13.5 g/dL 12 - 16", None))
+    monkeypatch.setattr(extract, 'fetch_ai_explanations', lambda tests: calls.append('explain') or {"Hemoglobin": "ok"})
+    monkeypatch.setattr(pipeline, 'request_summary', lambda text, tests=None: calls.append('summary') or "<h3>Summary</h3>")
+
+    for _ in range(2):
+        text = pipeline.get_text("digest", "report.pdf")
+        tests = pipeline.get_tests("digest", text)
+        summary = pipeline.get_summary("digest", text)
+
+    assert calls == ['ocr', 'explain', 'summary']
+    assert tests[0]['explanation'] == "ok"
+    assert summary == "<h3>Summary</h3>"
+
+
+def test_failed_summary_is_not_cached(monkeypatch):
+    def fail(text, tests=None):
+        raise RuntimeError("AI API call failed: 503")
+
+    monkeypatch.setattr(pipeline, 'request_summary', fail)
+    try:
+        pipeline.get_summary("digest", "text")
+    except RuntimeError:
+        pass
+    assert pipeline.analysis_cache.get("digest", 'summary') is None
+
+
+def test_cache_stores_raw_bytes(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_bytes=1 << 20)
+    cache.set_bytes("report", 'pdf', b"%PDF-1.7\x00\xff")
+    assert cache.get_bytes("report", 'pdf') == b"%PDF-1.7\x00\xff"
+    assert cache.get_bytes("other", 'pdf') is None
+
+
+def test_saved_reports_are_addressed_by_content():
+    tests = [{"test": "Hemoglobin", "value": 13.5, "explanation": "Normal."}]
+    report_id = pipeline.save_report("<h3>Summary</h3>", tests)
+    assert pipeline.save_report("<h3>Summary</h3>", tests) == report_id
+    assert pipeline.save_report("<h3>Other</h3>", tests) != report_id
+    assert pipeline.get_report(report_id) == {'summary': "<h3>Summary</h3>", 'tests': tests}
+
+
+def test_text_budget_stops_reading_pages(monkeypatch):
+    read = []
+
+    def pages(source, layout, max_pages):
+        for i in range(100):
+            read.append(i)
+            yield f"Hemoglobin {10 + i}.0 g/dL 12 - 16 " + "x" * 80, None
+
+    monkeypatch.setattr(pipeline, 'iter_pdf_pages', pages)
+    monkeypatch.setattr(pipeline, 'TEXT_MAX_CHARS', 500)
+    text, tests = pipeline.extract_document(b"%PDF-1.7")
+    assert len(read) == 5 and text.count("Hemoglobin") == 4
+    assert [t['value'] for t in tests] == [10.0]
@@ -0,0 +1,17 @@
+from benchmarks.bench_pipeline import score
+from benchmarks.corpus import make_report, render_pdf, render_text
+from utils.extract import parse_tests
+from utils.ocr import extract_text_from_pdf
+
+
+def test_corpus_is_reproducible():
+    assert make_report(3, seed=7) == make_report(3, seed=7)
+    assert make_report(3, seed=7) != make_report(3, seed=8)
+
+
+def test_extraction_accuracy_on_synthetic_reports():
+    texts, truth = make_report(5, seed=1)
+    for text in (render_text(texts), extract_text_from_pdf(render_pdf(texts))):
+        result = score(parse_tests(text), truth)
+        assert result['precision'] == 1.0
+        assert result['exact'] >= 0.9
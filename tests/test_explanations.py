@@ -0,0 +1,75 @@
+from utils import extract
+from utils.explanations import ExplanationMemo
+
+
+def _test(name, status, unit="g/dL"):
+    return {"test": name, "value": 1.0, "unit": unit, "ref_range": "1 - 2", "status": status, "explanation": ""}
+
+
+def test_only_unseen_tests_reach_the_llm(monkeypatch):
+    prompts = []
+
+    def fake_fetch(tests):
+        prompts.append([t['test'] for t in tests])
+        return {t['test']: f"AI: {t['test']} {t['status']}" for t in tests}
+
+    monkeypatch.setattr(extract, 'fetch_ai_explanations', fake_fetch)
+    extract.get_ai_explanations([_test("Hemoglobin", "Low"), _test("Tsh", "Normal")])
+    second = extract.get_ai_explanations([_test("Hemoglobin", "Low"), _test("Hemoglobin", "High")])
+
+    assert prompts == [["Hemoglobin", "Tsh"], ["Hemoglobin"]]
+    assert second[0]['explanation'] == "AI: Hemoglobin Low"
+    assert second[1]['explanation'] == "AI: Hemoglobin High"
+    stats = extract.explanation_memo.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 3, 3)
+
+
+def test_fully_cached_report_skips_the_api(monkeypatch):
+    monkeypatch.setattr(extract, 'fetch_ai_explanations', lambda tests: {"Tsh": "AI text"})
+    extract.get_ai_explanations([_test("Tsh", "Normal")])
+
+    def fail(tests):
+        raise AssertionError("LLM should not be called")
+
+    monkeypatch.setattr(extract, 'fetch_ai_explanations', fail)
+    tests = extract.get_ai_explanations([_test("Tsh", "Normal")])
+    assert tests[0]['explanation'] == "AI text"
+
+
+def test_basic_fallbacks_expire_before_ai_answers(tmp_path):
+    memo = ExplanationMemo(str(tmp_path / "memo.sqlite3"), ttl=60, basic_ttl=-1)
+    memo.store([(_test("Iron", "Low"), "AI text", 'ai'), (_test("Urea", "High"), "basic text", 'basic')])
+    misses = memo.fill([_test("Iron", "Low"), _test("Urea", "High")])
+    assert [t['test'] for t in misses] == ["Urea"]
+
+
+def test_memo_evicts_least_recently_used(tmp_path):
+    memo = ExplanationMemo(str(tmp_path / "memo.sqlite3"), max_entries=2)
+    memo.store([(_test("Iron", "Low"), "a", 'ai')])
+    memo.store([(_test("Urea", "Low"), "b", 'ai')])
+    memo.store([(_test("Tsh", "Low"), "c", 'ai')])
+    assert memo.stats()['entries'] == 2
+    assert [t['test'] for t in memo.fill([_test("Iron", "Low")])] == ["Iron"]
+
+
+def test_unit_is_part_of_the_key_only_when_enabled(tmp_path):
+    by_name = ExplanationMemo(str(tmp_path / "a.sqlite3"))
+    by_unit = ExplanationMemo(str(tmp_path / "b.sqlite3"), by_unit=True)
+    assert by_name.key(_test("Glucose", "High", "mg/dL")) == by_name.key(_test("Glucose", "High", "mmol/L"))
+    assert by_unit.key(_test("Glucose", "High", "mg/dL")) != by_unit.key(_test("Glucose", "High", "mmol/L"))
+
+
+def test_prompt_carries_no_patient_values(monkeypatch):
+    prompts = []
+    monkeypatch.setattr(extract, 'routed_completion',
+                        lambda task, prompt, **kwargs: prompts.append(prompt) or '{"explanations": {}}')
+    test = dict(_test("Hemoglobin", "Low"), value=14.2, ref_range="14.5 - 17.5")
+    extract.fetch_ai_explanations([test, dict(test, value=13.9)])
+    assert "14.2" not in prompts[0] and "13.9" not in prompts[0] and "17.5" not in prompts[0]
+    assert prompts[0].count("- Hemoglobin: Low") == 1
+
+
+def test_explanations_match_whole_test_names():
+    explanations = {"MCHC": "about MCHC", "hemoglobin": "about hemoglobin"}
+    assert extract.match_explanation("Mch", explanations) is None
+    assert extract.match_explanation("Hemoglobin", explanations) == "about hemoglobin"
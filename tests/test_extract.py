@@ -0,0 +1,73 @@
+from utils.extract import iter_page_tests, parse_tests, resolve_test_name
+
+REPORT = """
+CITY LAB REPORT
+Patient Name: John Doe    Age: 45   Date: 12-05-2024
+Test            Result   Unit    Reference
+Hemoglobin      10.1     g/dL    12.0 - 16.0
+Hematocrit      38       %       36 - 46
+Mean Corpuscular Hemoglobin Concentration 33 g/dL 32 - 36
+Serum Creatinine 1.4 mg/dL 0.6 - 1.2
+Total Protein   7.0      g/dL    6.0 - 8.3
+TSH 2.5 uIU/mL (0.4 - 4.0)
+"""
+
+
+def test_parse_tests_finds_every_row():
+    tests = parse_tests(REPORT)
+    names = [t['test'] for t in tests]
+    assert names == ['Hemoglobin', 'Hematocrit', 'Mchc', 'Creatinine', 'Total Protein', 'Tsh']
+
+
+def test_parse_tests_result_fields():
+    hemoglobin = parse_tests(REPORT)[0]
+    assert hemoglobin == {
+        "test": "Hemoglobin",
+        "value": 10.1,
+        "unit": "g/dL",
+        "ref_range": "12.0 - 16.0",
+        "status": "Low",
+        "explanation": "",
+        "ref_low": 12.0,
+        "ref_high": 16.0
+    }
+
+
+def test_parse_tests_skips_duplicates_and_non_tests():
+    text = "Hb 13.0 g/dL 12 - 16\nHemoglobin 9.0 g/dL 12 - 16\nRoom 12 floor 3 - 4"
+    tests = parse_tests(text)
+    assert len(tests) == 1
+    assert tests[0]['value'] == 13.0
+
+
+def test_resolve_test_name_prefers_longest_closest_alias():
+    assert resolve_test_name("Mean Corpuscular Hemoglobin") == 'mch'
+    assert resolve_test_name("Serum Iron") == 'iron'
+    assert resolve_test_name("Alternative") is None
+    assert resolve_test_name("Patient Name") is None
+
+
+def test_page_iterator_matches_whole_text_and_carries_rows_over_page_breaks():
+    pages = ["Hemoglobin 10.1 g/dL 12.0 - 16.0\nSerum Creatinine", "1.4 mg/dL 0.6 - 1.2\nHb 9.0 g/dL 12 - 16"]
+    assert list(iter_page_tests(pages)) == parse_tests("\n".join(pages))
+    assert [t['test'] for t in iter_page_tests(pages)] == ['Hemoglobin', 'Creatinine']
+
+
+def test_page_iterator_yields_before_reading_later_pages():
+    def pages():
+        yield "Hemoglobin 10.1 g/dL 12.0 - 16.0"
+        raise AssertionError("second page read too early")
+
+    assert next(iter_page_tests(pages()))['test'] == 'Hemoglobin'
+
+
+def test_power_of_ten_units_are_not_read_as_values():
+    rows = {
+        "Platelet Count 250 x10^3/uL 150-400": ('Platelet', 250.0, 'x10^3/uL', 'Normal'),
+        "WBC 7.5 x10^9/L 4.0 - 11.0": ('Wbc', 7.5, 'x10^9/L', 'Normal'),
+        "RBC 4.8 x10^6/uL 4.5 - 5.5": ('Rbc', 4.8, 'x10^6/uL', 'Normal'),
+        "WBC 7.5 × 10^9/L 4.0 - 11.0": ('Wbc', 7.5, '× 10^9/L', 'Normal'),
+    }
+    for text, expected in rows.items():
+        assert [(t['test'], t['value'], t['unit'], t['status']) for t in parse_tests(text)] == [expected]
+    assert [(t['value'], t['unit']) for t in parse_tests("WBC 7.5 x10^9 per litre 4.0 - 11.0")] == [(7.5, 'x10^9')]
@@ -0,0 +1,118 @@
+import sqlite3
+import threading
+
+from utils import jobs
+from utils.jobs import JobQueue
+
+
+def _queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "uploads"))
+
+
+def test_jobs_are_claimed_in_fifo_order(tmp_path):
+    queue = _queue(tmp_path)
+    first = queue.enqueue("a.pdf", b"one")
+    second = queue.enqueue("b.png", b"two")
+
+    assert queue.claim()['id'] == first
+    assert queue.claim()['id'] == second
+    assert queue.claim() is None
+    assert queue.get(first)['status'] == 'running'
+
+
+def test_run_job_records_stages_and_result(tmp_path, monkeypatch):
+    queue = _queue(tmp_path)
+    job_id = queue.enqueue("report.pdf", b"%PDF")
+    stages = []
+
+    def fake_process(path, on_stage):
+        assert path.endswith(".pdf")
+        on_stage('ocr')
+        stages.append(queue.get(job_id)['stage'])
+        return {'tests': [], 'summary': '<h3>Summary</h3>'}
+
+    monkeypatch.setattr(jobs, 'process_upload', fake_process)
+    job = queue.claim()
+    jobs.run_job(queue, job)
+
+    done = queue.get(job_id)
+    assert stages == ['ocr']
+    assert done['status'] == 'done'
+    assert done['result'] == {'tests': [], 'summary': '<h3>Summary</h3>'}
+    assert not (tmp_path / "uploads" / f"{job_id}.pdf").exists()
+
+
+def test_failed_job_keeps_error(tmp_path, monkeypatch):
+    queue = _queue(tmp_path)
+    job_id = queue.enqueue("report.png", b"img")
+
+    def broken(path, on_stage):
+        raise ValueError("Could not extract readable text from the document")
+
+    monkeypatch.setattr(jobs, 'process_upload', broken)
+    jobs.run_job(queue, queue.claim())
+    job = queue.get(job_id)
+    assert job['status'] == 'failed'
+    assert "readable text" in job['error']
+
+
+def test_stale_running_jobs_are_requeued(tmp_path, monkeypatch):
+    queue = _queue(tmp_path)
+    job_id = queue.enqueue("report.pdf", b"%PDF")
+    queue.claim()
+    monkeypatch.setattr(jobs, 'JOB_STALE_SECONDS', -1)
+    assert queue.claim()['id'] == job_id
+
+
+def test_reclaimed_job_keeps_its_upload_and_new_outcome(tmp_path, monkeypatch):
+    queue = _queue(tmp_path)
+    job_id = queue.enqueue("report.pdf", b"%PDF")
+    stale = queue.claim()
+    monkeypatch.setattr(jobs, 'JOB_STALE_SECONDS', -1)
+    current = queue.claim()
+    assert current['attempt'] == stale['attempt'] + 1
+
+    monkeypatch.setattr(jobs, 'process_upload', lambda path, on_stage: {'run': 'stale'})
+    jobs.run_job(queue, stale)
+    assert queue.get(job_id)['status'] == 'running'
+    assert (tmp_path / "uploads" / f"{job_id}.pdf").exists()
+
+    monkeypatch.setattr(jobs, 'process_upload', lambda path, on_stage: {'run': 'current'})
+    jobs.run_job(queue, current)
+    assert queue.get(job_id)['result'] == {'run': 'current'}
+    assert not (tmp_path / "uploads" / f"{job_id}.pdf").exists()
+
+
+def test_worker_survives_database_errors(tmp_path, monkeypatch):
+    queue = _queue(tmp_path)
+    job_id = queue.enqueue("report.pdf", b"%PDF")
+    stop = threading.Event()
+    claim = queue.claim
+    calls = []
+
+    def flaky_claim():
+        calls.append(1)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return claim()
+
+    def process(path, on_stage):
+        stop.set()
+        return {'tests': []}
+
+    monkeypatch.setattr(queue, 'claim', flaky_claim)
+    monkeypatch.setattr(jobs, 'process_upload', process)
+    monkeypatch.setattr(jobs, 'POLL_INTERVAL', 0.01)
+    jobs.worker_loop(queue, stop)
+    assert queue.get(job_id)['status'] == 'done'
+
+
+def test_finished_jobs_expire(tmp_path, monkeypatch):
+    queue = _queue(tmp_path)
+    done = queue.enqueue("a.pdf", b"one")
+    waiting = queue.enqueue("b.pdf", b"two")
+    monkeypatch.setattr(jobs, 'process_upload', lambda path, on_stage: {'tests': []})
+    jobs.run_job(queue, queue.claim())
+    assert queue.prune(ttl=3600) == 0
+    assert queue.prune(ttl=-1) == 1
+    assert queue.get(done) is None and queue.get(waiting)['status'] == 'queued'
@@ -0,0 +1,87 @@
+import fitz
+
+from utils import layout, ocr, pipeline
+from utils.extract import parse_tests
+
+ROWS = [
+    ("Hemoglobin", "11.2", "g/dL", "13.0 - 17.0"),
+    ("Fasting Glucose", "92", "mg/dL", "70-100"),
+    ("Platelet Count", "250", "10^3/uL", "(150-400)"),
+    ("Serum Creatinine", "1.5", "mg/dL", "0.6 - 1.2"),
+]
+
+
+def _side_by_side_pdf():
+    """Two tables next to each other, each drawn one column at a time"""
+    doc = fitz.open()
+    page = doc.new_page()
+    for table, x in ((ROWS[:2], 30), (ROWS[2:], 300)):
+        for cell, offset in enumerate((0, 100, 135, 185)):
+            for i, row in enumerate(table):
+                page.insert_text((x + offset, 60 + 14 * i), row[cell], fontsize=8)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _word(x0, text, y=100.0, height=10.0):
+    return (x0, y, x0 + 6 * len(text), y + height, text)
+
+
+def test_side_by_side_tables_keep_rows_together():
+    texts, rows = ocr.read_pdf(_side_by_side_pdf(), layout=True)
+    tests = {t['test']: t for t in layout.iter_document_tests(zip(texts, rows))}
+    assert set(tests) == {"Hemoglobin", "Glucose", "Platelet", "Creatinine"}
+    assert tests["Hemoglobin"]['value'] == 11.2 and tests["Hemoglobin"]['status'] == "Low"
+    assert tests["Platelet"]['unit'] == "10^3/uL" and tests["Platelet"]['ref_high'] == 400.0
+    assert tests["Creatinine"]['ref_range'] == "0.6 - 1.2" and tests["Creatinine"]['status'] == "Very High"
+    # The flattened text reads column by column, so the row scanner cannot pair them
+    assert len(parse_tests("\n".join(texts))) < 4
+
+
+def test_line_rows_match_parse_tests():
+    line = [_word(10, "Hemoglobin"), _word(100, "13.5"), _word(140, "g/dL"), _word(180, "H"),
+            _word(200, "12.0"), _word(230, "-"), _word(240, "15.5")]
+    assert layout.line_rows(line) == parse_tests("Hemoglobin 13.5 g/dL H 12.0 - 15.5")
+
+
+def test_name_comes_from_the_cell_before_the_value():
+    line = [_word(10, "Patient:"), _word(60, "Glucose"), _word(200, "Sodium"), _word(300, "140"),
+            _word(330, "mmol/L"), _word(400, "135-145")]
+    rows = layout.line_rows(line)
+    assert [r['test'] for r in rows] == ["Sodium"]
+
+
+def test_value_without_range_is_not_a_row():
+    line = [_word(10, "Glucose"), _word(100, "92"), _word(130, "mg/dL"),
+            _word(250, "Hemoglobin"), _word(340, "13.5"), _word(370, "g/dL"), _word(410, "12-15")]
+    rows = layout.line_rows(line)
+    assert [(r['test'], r['value']) for r in rows] == [("Hemoglobin", 13.5)]
+
+
+def test_pages_without_layout_rows_fall_back_to_text():
+    pages = [("Hb 13.5 g/dL 12 - 16", None), ("Hemoglobin 9 g/dL 12 - 16", [])]
+    tests = list(layout.iter_document_tests(pages))
+    assert [(t['test'], t['value']) for t in tests] == [("Hemoglobin", 13.5)]
+
+
+def test_extract_document_returns_layout_tests_for_pdfs():
+    text, tests = pipeline.extract_document(_side_by_side_pdf())
+    assert "Hemoglobin" in text and len(tests) == 4
+
+
+def test_rows_the_layout_misses_are_still_scanned_from_the_text():
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((30, 60), "Hemoglobin   11.2   g/dL   13.0 - 17.0", fontsize=8)
+    # The range wraps onto the next line, so the word boxes give no row
+    page.insert_text((30, 74), "Creatinine   1.5   mg/dL   0.6 -", fontsize=8)
+    page.insert_text((30, 88), "1.2", fontsize=8)
+    data = doc.tobytes()
+    doc.close()
+
+    texts, rows = ocr.read_pdf(data, layout=True)
+    assert [r['test'] for r in rows[0]] == ["Hemoglobin"]
+    tests = list(layout.iter_document_tests(zip(texts, rows)))
+    assert [(t['test'], t['value']) for t in tests] == [("Hemoglobin", 11.2), ("Creatinine", 1.5)]
+    assert tests == parse_tests("\n".join(texts))
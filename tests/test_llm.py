@@ -0,0 +1,161 @@
+import time
+
+import pytest
+import requests
+
+from utils import extract, llm, pipeline
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload, lines=()):
+        self.status_code = status_code
+        self._payload = payload
+        self._lines = lines
+
+    def json(self):
+        return self._payload
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self._lines)
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.calls = []
+
+    def post(self, url, **kwargs):
+        self.calls.append(kwargs)
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+def _use_session(monkeypatch, response):
+    session = FakeSession(response)
+    monkeypatch.setattr(llm, 'get_session', lambda: session)
+    return session
+
+
+def test_chat_completion_returns_content(monkeypatch):
+    session = _use_session(monkeypatch, FakeResponse(200, {"choices": [{"message": {"content": "hi"}}]}))
+    assert llm.chat_completion("some/model", "hello", max_tokens=5) == "hi"
+    assert session.calls[0]['json']['model'] == "some/model"
+    assert session.calls[0]['timeout'] == (llm.CONNECT_TIMEOUT, llm.LLM_TIMEOUT)
+
+
+@pytest.mark.parametrize("response", [
+    FakeResponse(503, {}),
+    FakeResponse(200, {"choices": []}),
+    requests.ConnectionError("refused"),
+])
+def test_chat_completion_raises_llm_error(monkeypatch, response):
+    _use_session(monkeypatch, response)
+    with pytest.raises(llm.LLMError):
+        llm.chat_completion("some/model", "hello", max_tokens=5)
+
+
+def test_chat_completion_respects_deadline(monkeypatch):
+    session = _use_session(monkeypatch, FakeResponse(200, {}))
+    with pytest.raises(llm.LLMError):
+        llm.chat_completion("some/model", "hello", max_tokens=5, deadline=time.monotonic() - 1)
+    assert session.calls == []
+
+
+def test_stream_chat_completion_yields_deltas(monkeypatch):
+    lines = [
+        ": OPENROUTER PROCESSING",
+        "",
+        'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+        'data: {"choices": [{"delta": {"content": "<h3>Key"}}]}',
+        'data: {"choices": [{"delta": {"content": " Findings</h3>"}}]}',
+        "data: [DONE]",
+        'data: {"choices": [{"delta": {"content": "ignored"}}]}',
+    ]
+    session = _use_session(monkeypatch, FakeResponse(200, {}, lines))
+    chunks = list(llm.stream_chat_completion("some/model", "hello", max_tokens=5))
+    assert chunks == ["<h3>Key", " Findings</h3>"]
+    assert session.calls[0]['json']['stream'] is True
+
+
+def test_stream_summary_caches_completed_stream(monkeypatch):
+    monkeypatch.setattr(pipeline, 'stream_ai_summary', lambda text, tests=None: iter(["<h3>Key Findings</h3>", "<ul><li>" + "x" * 40 + "</li></ul>"]))
+
+    chunks = list(pipeline.stream_summary("digest", "text"))
+    assert len(chunks) == 2
+    assert list(pipeline.stream_summary("digest", "text")) == ["".join(chunks)]
+
+
+def test_session_is_reused():
+    assert llm.get_session() is llm.get_session()
+
+
+def test_summary_and_explanations_run_concurrently(monkeypatch):
+    def slow_explanations(tests):
+        time.sleep(0.3)
+        return {}
+
+    def slow_summary(text, tests=None):
+        time.sleep(0.3)
+        return "<h3>Summary</h3>"
+
+    monkeypatch.setattr(extract, 'fetch_ai_explanations', slow_explanations)
+    monkeypatch.setattr(pipeline, 'request_summary', slow_summary)
+
+    start = time.monotonic()
+    future = pipeline.start_summary("digest", "Hb 13.5 g/dL 12 - 16")
+    pipeline.get_tests("digest", "Hb 13.5 g/dL 12 - 16")
+    assert future.result() == "<h3>Summary</h3>"
+    assert time.monotonic() - start < 0.55
+
+
+def test_breaker_opens_after_consecutive_failures_and_fails_fast(monkeypatch):
+    monkeypatch.setattr(llm, 'breaker', llm.CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    session = _use_session(monkeypatch, FakeResponse(503, {}))
+
+    for _ in range(2):
+        with pytest.raises(llm.LLMError):
+            llm.chat_completion("some/model", "hello", max_tokens=5)
+    with pytest.raises(llm.CircuitOpenError):
+        llm.chat_completion("some/model", "hello", max_tokens=5)
+    assert len(session.calls) == 2
+
+
+def test_breaker_half_opens_and_recovers(monkeypatch):
+    breaker = llm.CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    monkeypatch.setattr(llm, 'breaker', breaker)
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    _use_session(monkeypatch, FakeResponse(200, {"choices": [{"message": {"content": "ok"}}]}))
+    assert llm.chat_completion("some/model", "hello", max_tokens=5) == "ok"
+    assert breaker.state == 'closed'
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = llm.CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    breaker.opened_at -= 60
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+
+def test_health_probe_feeds_the_breaker(monkeypatch):
+    breaker = llm.CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    monkeypatch.setattr(llm, 'breaker', breaker)
+    monkeypatch.setenv('OPENROUTER_API_KEY', 'sk-test')
+    prober = llm.HealthProber(interval=0)
+
+    _use_session(monkeypatch, FakeResponse(500, {}))
+    assert prober.probe() is False
+    assert breaker.state == 'open'
+
+    _use_session(monkeypatch, FakeResponse(200, {"choices": [{"message": {"content": "."}}]}))
+    assert prober.probe() is True
+    assert breaker.state == 'closed'
+    assert not prober.is_stale()
@@ -0,0 +1,48 @@
+import pytest
+
+from benchmarks.fake_openrouter import FakeOpenRouter
+from benchmarks.loadtest import saturation_point, summarize
+from utils import llm
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    with FakeOpenRouter(latency=0.0, jitter=0.0, chunks=3) as server:
+        monkeypatch.setattr(llm, 'API_URL', server.url)
+        yield server
+
+
+def test_fake_openrouter_answers_completions_and_streams(fake):
+    assert llm.chat_completion("any/model", "Summarize this", max_tokens=500).startswith("<h3>Key Findings")
+    streamed = list(llm.stream_chat_completion("any/model", "Summarize this", max_tokens=500))
+    assert len(streamed) == 3 and ''.join(streamed).startswith("<h3>Key Findings")
+    assert fake.requests == 2
+
+
+def test_fake_openrouter_explains_listed_tests(fake):
+    prompt = '"explanations"\n- Hemoglobin: Low'
+    assert '"Hemoglobin"' in llm.chat_completion("any/model", prompt, max_tokens=500)
+
+
+def test_fake_openrouter_error_rate(fake):
+    fake.error_rate = 1.0
+    with pytest.raises(llm.LLMError):
+        llm.chat_completion("any/model", "hello", max_tokens=5)
+
+
+def test_summary_and_saturation_point():
+    samples = [('upload_pdf', 0.2, True), ('stream', 1.0, True), ('upload_pdf_total', 1.2, True),
+               ('health', 0.01, False)]
+    level = summarize(samples, elapsed=2.0)
+    assert level['requests'] == 2 and level['throughput_rps'] == 1.0 and level['error_rate'] == 0.5
+    assert level['endpoints']['stream']['p95_s'] == 1.0
+
+    levels = [
+        {'concurrency': 1, 'throughput_rps': 2.0, 'error_rate': 0.0},
+        {'concurrency': 2, 'throughput_rps': 3.9, 'error_rate': 0.0},
+        {'concurrency': 4, 'throughput_rps': 4.0, 'error_rate': 0.0},
+    ]
+    assert saturation_point(levels) == 2
+    assert saturation_point(levels[:2]) is None
+    levels[1]['error_rate'] = 0.05
+    assert saturation_point(levels) == 2
@@ -0,0 +1,75 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import metrics
+from utils.metrics import Counter, Histogram
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram('test_seconds', "Test durations", ['stage'], buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage='ocr')
+    histogram.observe(0.5, stage='ocr')
+    histogram.observe(5.0, stage='ocr')
+    lines = histogram.render()
+
+    assert 'test_seconds_bucket{stage="ocr",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="ocr",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{stage="ocr",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="ocr"} 3' in lines
+    assert "# TYPE test_seconds histogram" in lines
+
+
+def test_counter_escapes_label_values():
+    counter = Counter('test_total', "Test events", ['kind'])
+    counter.inc(kind='say "hi"')
+    counter.inc(2, kind='say "hi"')
+    assert 'test_total{kind="say \\"hi\\""} 3' in counter.render()
+
+
+def test_stage_timings_reach_the_request_from_pool_threads():
+    timings = metrics.start_request()
+    try:
+        with metrics.timed('extract'):
+            pass
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            metrics.submit_with_context(pool, metrics.record, 'summary_llm', 0.25).result()
+            # Plain submits run outside the request and are not attributed to it
+            pool.submit(metrics.record, 'other', 1.0).result()
+    finally:
+        metrics.end_request()
+
+    assert [stage for stage, _ in timings] == ['extract', 'summary_llm']
+    header = metrics.server_timing(timings + [('extract', 0.5)], total=1.0)
+    assert "summary_llm;dur=250.0" in header
+    assert header.endswith("total;dur=1000.0")
+    assert metrics.stage_seconds.count(stage='summary_llm') >= 1
+
+
+def test_render_metrics_includes_every_metric():
+    text = metrics.render_metrics()
+    for metric in metrics.REGISTRY:
+        assert f"# TYPE {metric.name}" in text
+
+
+def test_parts_of_a_stage_are_recorded_under_their_own_stage():
+    timings = metrics.start_request()
+    try:
+        with metrics.timed('ocr'):
+            time.sleep(0.02)
+            for _ in range(2):
+                with metrics.timed_part('extract'):
+                    time.sleep(0.03)
+        with metrics.timed('extract'):
+            with metrics.timed_part('extract'):
+                pass
+        with metrics.timed_part('extract'):
+            pass
+    finally:
+        metrics.end_request()
+
+    stages = [stage for stage, _ in timings]
+    assert stages == ['extract', 'ocr', 'extract', 'extract']
+    # Both parts add up to one extract run, taken out of the ocr run
+    extract_part, ocr = timings[0][1], timings[1][1]
+    assert extract_part >= 0.06
+    assert 0.02 <= ocr < 0.06
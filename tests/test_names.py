@@ -0,0 +1,55 @@
+import random
+
+from utils.extract import MEDICAL_TESTS, NEAR_MISSES, parse_tests
+from utils.names import GramIndex, NameIndex, levenshtein
+
+
+def test_ocr_typos_resolve():
+    index = NameIndex(MEDICAL_TESTS)
+    assert index.lookup("Hemog1obin") == 'hemoglobin'
+    assert index.lookup("Serum Creatlnine") == 'creatinine'
+    assert index.lookup("Mean Corpuscu1ar Hemoglobin") == 'mch'
+    assert index.lookup("Trig1ycerdes") == 'triglycerides'
+
+
+def test_short_aliases_match_whole_tokens_only():
+    index = NameIndex(MEDICAL_TESTS)
+    assert index.lookup("Hb") == 'hemoglobin'
+    for name in ("Salt", "Mortgage", "Alternative", "Thought", "Hbx", "Tablet"):
+        assert index.lookup(name) is None
+
+
+def test_exact_index_ignores_typos():
+    assert NameIndex(MEDICAL_TESTS, fuzzy=False).lookup("Hemog1obin") is None
+
+
+def test_find_reports_offset_and_edits():
+    assert NameIndex(MEDICAL_TESTS).find("Result: Creatlnine") == ('creatinine', 8, 1)
+
+
+def test_gram_index_matches_brute_force():
+    words = sorted({token for aliases in MEDICAL_TESTS.values() for alias in aliases for token in alias.split()})
+    grams = GramIndex(words)
+    rng = random.Random(0)
+    for _ in range(200):
+        word = rng.choice(words)
+        i = rng.randrange(len(word))
+        query = word[:i] + rng.choice('abcdefghijklmnopqrstuvwxyz01') + word[i + 1:]
+        expected = sorted((levenshtein(query, w, 2), w) for w in words if levenshtein(query, w, 2) <= 2)
+        assert grams.search(query, 2) == expected
+
+
+def test_parse_tests_reads_typoed_names():
+    tests = parse_tests("Creatlnine 1.4 mg/dL 0.6 - 1.2\nCholestrol 180 mg/dL 125 - 200")
+    assert [t['test'] for t in tests] == ['Creatinine', 'Cholesterol']
+
+
+def test_neighbouring_tests_are_not_fuzzy_matched():
+    assert parse_tests("Creatine Kinase 150 U/L 30 - 200") == []
+    index = NameIndex(MEDICAL_TESTS)
+    # Two edits are too many for the eight letters left
+    for name in ("Creatine", "CPK Creatine"):
+        assert index.lookup(name) is None
+    assert index.lookup("Creatinne") == 'creatinine'
+    assert index.lookup("Eosinophilia") == 'eosinophils'
+    assert NameIndex(MEDICAL_TESTS, near_misses=NEAR_MISSES).lookup("Eosinophilia") is None
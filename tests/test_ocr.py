@@ -0,0 +1,164 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz
+import pytest
+from PIL import Image
+
+from utils import ocr
+
+
+def _make_pdf(tmp_path, layout):
+    """Write a PDF whose pages are text ('t') or image-only ('s').
+
+    Page i is (100 + i) points wide so fake OCR output identifies it.
+    """
+    doc = fitz.open()
+    for i, kind in enumerate(layout):
+        page = doc.new_page(width=100 + i, height=200)
+        if kind == 't':
+            page.insert_text((10, 20), f"Hemoglobin 13.5 g/dL page {i}", fontsize=6)
+        else:
+            page.draw_rect(fitz.Rect(10, 10, 50, 50), fill=(0, 0, 0))
+    path = tmp_path / "report.pdf"
+    doc.save(str(path))
+    return str(path)
+
+
+def _fake_ocr(width, height, samples):
+    assert len(samples) == width * height
+    return f"OCR page {width - 100}"
+
+
+def _fail(*args):
+    pytest.fail("unexpected OCR call")
+
+
+def test_text_layer_pages_skip_ocr(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr, '_ocr_page', _fail)
+    text = ocr.extract_text_from_pdf(_make_pdf(tmp_path, 'tt'))
+    assert "page 0" in text and "page 1" in text
+
+
+def test_scanned_pages_are_ocred_in_page_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr, '_ocr_page', _fake_ocr)
+    monkeypatch.setattr(ocr, '_get_pool', lambda: ThreadPoolExecutor(max_workers=2))
+    text = ocr.extract_text_from_pdf(_make_pdf(tmp_path, 'tssts'), dpi=72)
+    pages = [line for line in text.split("\n") if "page" in line]
+    assert [line.split()[-1] for line in pages] == ['0', '1', '2', '3', '4']
+    assert pages[1] == "OCR page 1"
+
+
+class _BrokenPool:
+    """A pool whose worker processes have died"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool("a worker died"))
+        return future
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+def test_pages_lost_to_a_broken_pool_are_ocred_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr, '_ocr_page', _fake_ocr)
+    pools = [_BrokenPool(), ThreadPoolExecutor(max_workers=2)]
+    # Both pages go to the broken pool, then are retried on the fresh one
+    monkeypatch.setattr(ocr, '_get_pool', lambda: pools[0])
+    monkeypatch.setattr(ocr, '_discard_pool', lambda pool: pool in pools and pools.remove(pool))
+    text = ocr.extract_text_from_pdf(_make_pdf(tmp_path, 'ss'), dpi=72)
+    assert text == "OCR page 0\nOCR page 1"
+
+
+def test_pool_that_keeps_breaking_falls_back_to_inline_ocr(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr, '_ocr_page', _fake_ocr)
+    monkeypatch.setattr(ocr, '_get_pool', _BrokenPool)
+    text = ocr.extract_text_from_pdf(_make_pdf(tmp_path, 'tss'), dpi=72)
+    assert text.endswith("OCR page 1\nOCR page 2")
+
+
+def test_ocr_processes_are_not_plain_forks():
+    assert ocr._mp_context().get_start_method() in ('forkserver', 'spawn')
+
+
+def test_single_scanned_page_is_ocred_inline(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr, '_ocr_page', _fake_ocr)
+    monkeypatch.setattr(ocr, '_get_pool', _fail)
+    text = ocr.extract_text_from_pdf(_make_pdf(tmp_path, 's'), dpi=72)
+    assert text == "OCR page 0"
+
+
+def test_pdf_bytes_are_read_without_a_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr, '_ocr_page', _fail)
+    with open(_make_pdf(tmp_path, 't'), 'rb') as fh:
+        data = fh.read()
+    assert "page 0" in ocr.extract_text_from_pdf(data)
+
+
+class _FakeEngine:
+    started = 0
+
+    def __init__(self, psm):
+        _FakeEngine.started += 1
+        self.variables = {'psm': psm}
+
+    def SetVariable(self, name, value):
+        self.variables[name] = value
+
+    def SetImage(self, image):
+        self.size = image.size
+
+    def GetUTF8Text(self):
+        return f"engine {self.size[0]}x{self.size[1]}"
+
+
+class _FakeTesserocr:
+    PyTessBaseAPI = _FakeEngine
+
+
+def test_auto_backend_without_tesserocr_uses_pytesseract(monkeypatch):
+    monkeypatch.setattr(ocr, 'tesserocr', None)
+    assert ocr.resolve_backend('auto') == 'pytesseract'
+    assert ocr.resolve_backend('tesserocr') == 'pytesseract'
+    with pytest.raises(ValueError):
+        ocr.resolve_backend('easyocr')
+
+
+def test_tesserocr_engine_is_reused_per_thread(monkeypatch):
+    monkeypatch.setattr(ocr, 'tesserocr', _FakeTesserocr)
+    monkeypatch.setattr(ocr, '_engines', threading.local())
+    monkeypatch.setattr(ocr.pytesseract, 'image_to_string', _fail)
+    _FakeEngine.started = 0
+    assert ocr.ocr_image(Image.new('L', (30, 20)), 'auto') == "engine 30x20"
+    assert ocr.ocr_image(Image.new('L', (40, 20)), 'auto') == "engine 40x20"
+    assert _FakeEngine.started == 1
+    assert ocr._engines.api.variables['tessedit_char_whitelist'] == ocr.LAB_CHARACTERS
+
+
+def test_broken_tesserocr_falls_back_to_pytesseract(monkeypatch):
+    class Broken:
+        def PyTessBaseAPI(self, psm):
+            raise RuntimeError("Failed to init API, possibly an invalid tessdata path")
+
+    monkeypatch.setattr(ocr, 'tesserocr', Broken())
+    monkeypatch.setattr(ocr, '_engines', threading.local())
+    monkeypatch.setattr(ocr, '_tesserocr_broken', False)
+    monkeypatch.setattr(ocr.pytesseract, 'image_to_string', lambda image, **kwargs: "cli")
+    assert ocr.ocr_image(Image.new('L', (10, 10))) == "cli"
+    assert ocr.resolve_backend() == 'pytesseract'
+
+
+def test_page_budget_stops_reading(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr, '_ocr_page', _fake_ocr)
+    pages = list(ocr.iter_pdf_pages(_make_pdf(tmp_path, 'tsts'), dpi=72, max_pages=2))
+    assert [text.split()[-1] for text, _ in pages] == ['0', '1']
+
+
+def test_stopping_early_skips_remaining_pages(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr, '_get_pool', _fail)
+    monkeypatch.setattr(ocr, 'OCR_WORKERS', 2)
+    pages = ocr.iter_pdf_pages(_make_pdf(tmp_path, 'tssss'), dpi=72)
+    assert "page 0" in next(pages)[0]
+    pages.close()
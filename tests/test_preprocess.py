@@ -0,0 +1,67 @@
+import pytest
+from PIL import Image
+
+from benchmarks.corpus import make_report, render_page_image
+from utils import preprocess
+
+
+@pytest.fixture(scope='module')
+def page_text():
+    return make_report(1)[0][0]
+
+
+@pytest.mark.parametrize('rotation', [-3.0, 2.0])
+def test_estimate_skew_undoes_rotation(page_text, rotation):
+    image = render_page_image(page_text, noise=0.01, rotation=rotation)
+    assert preprocess.estimate_skew(image) == pytest.approx(-rotation, abs=0.5)
+
+
+def test_binarize_outputs_only_black_and_white(page_text):
+    image = preprocess.binarize(render_page_image(page_text, noise=0.02))
+    assert set(image.getdata()) <= {0, 255}
+
+
+def test_crop_trims_borders(page_text):
+    image = render_page_image(page_text, noise=0)
+    cropped = preprocess.crop(image)
+    assert cropped.width < image.width and cropped.height < image.height
+
+
+def test_rescale_targets_text_height(page_text, monkeypatch):
+    monkeypatch.setattr(preprocess, 'OCR_TEXT_HEIGHT', 40)
+    image = preprocess.crop(render_page_image(page_text, noise=0))
+    height = preprocess.estimate_text_height(image)
+    assert 15 < height < 25
+    rescaled = preprocess.rescale(image)
+    assert rescaled.width == pytest.approx(image.width * 40 / height, rel=0.01)
+
+
+def test_unknown_step_rejected():
+    with pytest.raises(ValueError):
+        preprocess.preprocess_image(Image.new('L', (10, 10), 255), ['sharpen'])
+
+
+def test_no_steps_only_caps_size():
+    image = Image.new('RGB', (4000, 1000), 'white')
+    result = preprocess.preprocess_image(image, [])
+    assert result.mode == 'RGB' and result.size == (2000, 500)
+
+
+def test_large_photo_is_shrunk_before_binarize_and_deskew(page_text, monkeypatch):
+    image = render_page_image(page_text, noise=0.01, rotation=3.0)
+    image = image.resize((image.width * 3, image.height * 3))
+    sizes = {}
+
+    def recording(step):
+        def run(img):
+            sizes[step] = img.size
+            return getattr(preprocess, step)(img)
+        return run
+
+    for step in ('binarize', 'deskew'):
+        monkeypatch.setitem(preprocess._STEP_FUNCTIONS, step, recording(step))
+    result = preprocess.preprocess_image(image)
+    assert sizes['binarize'][0] < image.width / 2
+    assert sizes['deskew'] == sizes['binarize']
+    # Already at the target size, so the final rescale leaves it alone
+    assert result.width < image.width / 2
@@ -0,0 +1,99 @@
+import pytest
+
+from utils import summarizer
+from utils.prompt import estimate_tokens, format_rows, prepare_content, split_chunks, strip_boilerplate
+
+PAGE = """CITY DIAGNOSTICS - 12 Main Street - Accredited Laboratory
+Hemoglobin 10.1 g/dL 12.0 - 16.0
+Note {n}: patient reports fatigue.
+Page {n} of 3
+This is a computer generated report and does not require a signature.
+"""
+
+
+def test_strip_boilerplate_drops_page_furniture():
+    text = "".join(PAGE.format(n=n) for n in (1, 2, 3))
+    cleaned = strip_boilerplate(text)
+    assert "Page" not in cleaned
+    assert "computer generated" not in cleaned
+    assert "CITY DIAGNOSTICS" not in cleaned
+    assert cleaned.count("patient reports fatigue") == 3
+
+
+def test_prepare_content_replaces_rows_with_compact_lines():
+    rows, narrative = prepare_content("Hemoglobin 10.1 g/dL 12.0 - 16.0\nMild pallor noted on exam.")
+    assert rows == "- Hemoglobin: 10.1 g/dL (reference 12.0 - 16.0) - Low"
+    assert narrative == "Mild pallor noted on exam."
+
+
+def test_split_chunks_is_bounded_and_breaks_on_sentences():
+    text = "Finding number one is stable. " * 400
+    chunks = split_chunks(text, chunk_tokens=500, max_chunks=3)
+    assert len(chunks) == 3
+    assert all(chunk.endswith(".") for chunk in chunks)
+    assert all(estimate_tokens(chunk) <= 501 for chunk in chunks)
+
+
+def test_short_documents_are_sent_whole(monkeypatch):
+    monkeypatch.setattr(summarizer, '_summarize_chunk', lambda chunk: 1 / 0)
+    content = summarizer.summary_content("Hemoglobin 10.1 g/dL 12.0 - 16.0\nMild pallor noted.")
+    assert "Structured lab results" in content
+    assert "Report text:\nMild pallor noted." in content
+
+
+def test_long_documents_are_map_reduced(monkeypatch):
+    seen = []
+    monkeypatch.setattr(summarizer, 'SUMMARY_TOKEN_BUDGET', 200)
+    monkeypatch.setattr(summarizer, 'split_chunks', lambda text: split_chunks(text, chunk_tokens=100, max_chunks=4))
+    monkeypatch.setattr(summarizer, '_summarize_chunk', lambda chunk: seen.append(chunk) or "- stable")
+
+    content = summarizer.summary_content("Discharge note sentence here. " * 200)
+    assert len(seen) == 4
+    assert content.startswith("Findings from each section of the report:")
+    assert "Section 4:\n- stable" in content
+    assert estimate_tokens(content) < 200
+
+
+def test_given_tests_are_used_instead_of_parsing_the_text(monkeypatch):
+    monkeypatch.setattr('utils.prompt.parse_tests', lambda text: pytest.fail("text parsed again"))
+    tests = [{'test': "TSH", 'value': 6.2, 'unit': "uIU/mL", 'ref_range': "0.4 - 4.0", 'status': "High"}]
+    rows, _ = prepare_content("TSH 6.2 uIU/mL 0.4 - 4.0", tests)
+    assert rows == "- TSH: 6.2 uIU/mL (reference 0.4 - 4.0) - High"
+
+
+def test_rows_block_keeps_abnormal_results_within_its_budget():
+    tests = [
+        {'test': f"Test {i}", 'value': i, 'unit': "mg/dL", 'ref_range': "0 - 100",
+         'status': "High" if i % 50 == 7 else "Normal"}
+        for i in range(300)
+    ]
+    rows = format_rows(tests, max_tokens=100)
+    assert estimate_tokens(rows) <= 120
+    assert all(f"Test {i}:" in rows for i in range(7, 300, 50))
+    assert rows.splitlines()[-1].endswith("more results not listed (%d within their reference range)"
+                                          % (300 - len(rows.splitlines()) + 1))
+    assert format_rows(tests, max_tokens=100_000).count("\n") == 299
+
+
+def test_chunk_summaries_keep_the_request_deadline(monkeypatch):
+    from utils import router
+
+    seen = []
+    monkeypatch.setattr(summarizer, 'SUMMARY_TOKEN_BUDGET', 200)
+    monkeypatch.setattr(summarizer, 'split_chunks', lambda text: split_chunks(text, chunk_tokens=100, max_chunks=2))
+    monkeypatch.setattr(summarizer, 'routed_completion',
+                        lambda *args, **kwargs: seen.append(router._deadline.get()) or "- stable")
+    router.start_deadline(30)
+    try:
+        summarizer.summary_content("Discharge note sentence here. " * 200)
+    finally:
+        router.end_deadline()
+    assert len(seen) == 2 and None not in seen
+
+
+def test_only_date_footers_are_dropped():
+    text = ("Printed on: 12/03/2024 10:22 AM\nReport generated on 2024-03-12\nReported on 12 Mar 2024, 9:05\n"
+            "Sample reported on 12/03, repeat advised\nResults generated on admission were normal.")
+    assert strip_boilerplate(text).splitlines() == [
+        "Sample reported on 12/03, repeat advised", "Results generated on admission were normal."
+    ]
@@ -0,0 +1,68 @@
+from utils.results import ResultStore
+
+
+def _tests(hemoglobin, glucose=95.0):
+    return [
+        {'test': 'Hemoglobin', 'value': hemoglobin, 'unit': 'g/dL', 'ref_low': 13.0, 'ref_high': 17.0,
+         'status': 'Normal' if hemoglobin >= 13 else 'Low'},
+        {'test': 'Glucose', 'value': glucose, 'unit': 'mg/dL', 'ref_low': 70.0, 'ref_high': 100.0,
+         'status': 'Normal'},
+    ]
+
+
+def test_trend_is_ordered_by_time_and_filtered(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"))
+    added = store.record_many([
+        ('alice', 'd2', _tests(12.1), 2000.0, 'feb.pdf'),
+        ('alice', 'd1', _tests(13.4), 1000.0, 'jan.pdf'),
+        ('alice', 'd3', _tests(14.0), 3000.0, 'mar.pdf'),
+        ('bob', 'd1', _tests(16.0), 1500.0, 'jan.pdf'),
+    ])
+    assert added == 4
+
+    points = store.trend('alice', 'hemoglobin')
+    assert [p['value'] for p in points] == [13.4, 12.1, 14.0]
+    assert points[1]['status'] == 'Low' and points[1]['ref_low'] == 13.0
+
+    assert [p['taken'] for p in store.trend('alice', 'Hemoglobin', since=1500.0, until=2500.0)] == [2000.0]
+    assert [p['value'] for p in store.trend('alice', 'Hemoglobin', limit=2)] == [12.1, 14.0]
+    assert store.trend('carol', 'Hemoglobin') == []
+
+
+def test_same_upload_is_recorded_once_per_profile(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"))
+    assert store.record('alice', 'd1', _tests(13.4), taken=1000.0)
+    assert not store.record('alice', 'd1', _tests(13.4), taken=1000.0)
+    assert store.tests('alice') == [
+        {'test': 'Glucose', 'count': 1, 'latest': 1000.0},
+        {'test': 'Hemoglobin', 'count': 1, 'latest': 1000.0},
+    ]
+
+
+def test_failed_batch_is_rolled_back(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"))
+    try:
+        store.record_many([('alice', 'd1', _tests(13.4), 1000.0, None), ('alice', 'd2', [{}], 2000.0, None)])
+    except KeyError:
+        pass
+    assert store.tests('alice') == []
+
+
+def test_trend_query_uses_the_primary_key(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"))
+    plan = store._connect().execute(
+        "EXPLAIN QUERY PLAN SELECT taken, value FROM results"
+        " WHERE profile = ? AND test = ? AND taken >= ? AND taken <= ? ORDER BY taken DESC",
+        ('alice', 'Hemoglobin', 0, 1)
+    ).fetchall()
+    detail = ' '.join(row[-1] for row in plan)
+    assert 'USING PRIMARY KEY' in detail and 'TEMP B-TREE' not in detail
+
+
+def test_profiles_are_issued_keys(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"))
+    key = store.new_profile()
+    assert len(key) == 32 and key != store.new_profile()
+    assert store.has_profile(key)
+    for guess in ('alice', 'alice@example.com', key[:-1] + ('A' if key[-1] != 'A' else 'B'), '', None):
+        assert not store.has_profile(guess)
@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+from utils import router as router_module
+from utils.llm import CircuitOpenError, LLMError
+from utils.metrics import llm_hedges
+from utils.router import MIN_SAMPLES, ModelRouter
+
+TIERS = {'summary': {'models': ['primary', 'fallback'], 'budget': 5.0}}
+
+
+def _fake_models(monkeypatch, behaviour):
+    """Route chat_completion to behaviour[model](deadline); record the calls"""
+    calls = []
+    lock = threading.Lock()
+
+    def fake(model, prompt, max_tokens, temperature=0.3, timeout=None, deadline=None):
+        with lock:
+            calls.append((model, deadline))
+        return behaviour[model](deadline)
+
+    monkeypatch.setattr(router_module, 'chat_completion', fake)
+    return calls
+
+
+def _answer(text, delay=0.0):
+    def run(deadline):
+        time.sleep(delay)
+        return text
+    return run
+
+
+def _fail(deadline):
+    raise LLMError("boom")
+
+
+def test_fast_primary_is_not_hedged(monkeypatch):
+    calls = _fake_models(monkeypatch, {'primary': _answer("p"), 'fallback': _answer("f")})
+    router = ModelRouter(TIERS, hedge_after=1.0)
+    assert router.complete('summary', "prompt", 10) == "p"
+    assert [model for model, _ in calls] == ['primary']
+
+
+def test_slow_primary_is_hedged_and_fallback_wins(monkeypatch):
+    calls = _fake_models(monkeypatch, {'primary': _answer("p", delay=0.5), 'fallback': _answer("f")})
+    router = ModelRouter(TIERS, hedge_after=0.05)
+    before = llm_hedges.value(task='summary')
+    start = time.monotonic()
+    assert router.complete('summary', "prompt", 10) == "f"
+    assert time.monotonic() - start < 0.4
+    assert [model for model, _ in calls] == ['primary', 'fallback']
+    assert llm_hedges.value(task='summary') == before + 1
+
+
+def test_fast_failure_fails_over_without_waiting(monkeypatch):
+    _fake_models(monkeypatch, {'primary': _fail, 'fallback': _answer("f")})
+    router = ModelRouter(TIERS, hedge_after=10.0)
+    start = time.monotonic()
+    assert router.complete('summary', "prompt", 10) == "f"
+    assert time.monotonic() - start < 1.0
+
+
+def test_all_models_failing_raises(monkeypatch):
+    _fake_models(monkeypatch, {'primary': _fail, 'fallback': _fail})
+    with pytest.raises(LLMError):
+        ModelRouter(TIERS).complete('summary', "prompt", 10)
+
+
+def test_open_circuit_is_not_counted_against_the_model(monkeypatch):
+    def circuit_open(deadline):
+        raise CircuitOpenError("open")
+
+    _fake_models(monkeypatch, {'primary': circuit_open, 'fallback': circuit_open})
+    router = ModelRouter({'summary': {'models': ['primary'], 'budget': 5.0}})
+    with pytest.raises(CircuitOpenError):
+        router.complete('summary', "prompt", 10)
+    assert router.stats('summary', 'primary').snapshot()['calls'] == 0
+
+
+def test_request_deadline_caps_the_task_budget(monkeypatch):
+    calls = _fake_models(monkeypatch, {'primary': _answer("p"), 'fallback': _answer("f")})
+    router = ModelRouter(TIERS)
+    router_module.start_deadline(0.5)
+    try:
+        router.complete('summary', "prompt", 10)
+    finally:
+        router_module.end_deadline()
+    router.complete('summary', "prompt", 10)
+    assert calls[0][1] - time.monotonic() < 0.5
+    assert calls[1][1] - time.monotonic() > 4.0
+
+
+def test_erroring_model_is_tried_last(monkeypatch):
+    router = ModelRouter(TIERS)
+    for _ in range(MIN_SAMPLES):
+        router.stats('summary', 'primary').record(1.0, ok=False)
+    assert router.candidates('summary', time.monotonic() + 5) == ['fallback', 'primary']
+
+
+def test_hedge_delay_follows_observed_p95():
+    router = ModelRouter(TIERS, hedge_after=8.0)
+    assert router.hedge_delay('summary', 'primary') == 8.0
+    for i in range(100):
+        router.stats('summary', 'primary').record(i / 100, ok=True)
+    assert router.hedge_delay('summary', 'primary') == pytest.approx(0.95)
+
+
+def test_hedge_refused_by_the_breaker_keeps_waiting_for_the_trial_call(monkeypatch):
+    def circuit_open(deadline):
+        raise CircuitOpenError("open")
+
+    _fake_models(monkeypatch, {'primary': _answer("p", delay=0.3), 'fallback': circuit_open})
+    router = ModelRouter(TIERS, hedge_after=0.05)
+    assert router.complete('summary', "prompt", 10) == "p"
+
+
+def test_open_circuit_does_not_fail_over(monkeypatch):
+    def circuit_open(deadline):
+        raise CircuitOpenError("open")
+
+    calls = _fake_models(monkeypatch, {'primary': circuit_open, 'fallback': _answer("f")})
+    with pytest.raises(CircuitOpenError):
+        ModelRouter(TIERS).complete('summary', "prompt", 10)
+    assert [model for model, _ in calls] == ['primary']
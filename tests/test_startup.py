@@ -0,0 +1,42 @@
+import subprocess
+import sys
+
+from utils import lazy, startup
+
+
+def test_lazy_module_imports_on_first_use():
+    calls = []
+    module = lazy.lazy_import('colorsys', on_load=calls.append)
+    assert not module.loaded
+    assert module.rgb_to_hsv(1, 0, 0) == (0.0, 1.0, 1)
+    assert module.loaded and len(calls) == 1
+    module.load()
+    assert len(calls) == 1
+
+
+def test_lazy_module_forwards_attribute_writes(monkeypatch):
+    module = lazy.lazy_import('colorsys')
+    monkeypatch.setattr(module, 'ONE_THIRD', 0.5)
+    assert sys.modules['colorsys'].ONE_THIRD == 0.5
+
+
+def test_optional_import_of_missing_module():
+    assert lazy.optional_import('no_such_module_here') is None
+
+
+def test_importing_backends_loads_nothing_heavy():
+    code = (
+        "import sys, utils.ocr, utils.pdf_export, utils.startup;"
+        "print(sorted(m for m in ('fitz', 'PIL.Image', 'pytesseract', 'tesserocr', 'weasyprint') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    assert out.strip() == '[]'
+
+
+def test_preload_reports_failed_steps(monkeypatch):
+    def broken():
+        raise ImportError("no pango")
+
+    monkeypatch.setattr(startup, 'STEPS', (('pdf_export', broken), ('parsers', startup._warm_parsers)))
+    timings = startup.preload()
+    assert timings['pdf_export'] is None and timings['parsers'] >= 0
@@ -0,0 +1,96 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.corpus import render_pdf
+from utils import extract, templates
+from utils.extract import parse_tests
+from utils.ocr import read_pdf
+
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), 'golden')
+
+# Layouts of the hand-written samples in tests/golden. They are fixtures,
+# not shipped templates: the registry only ships layouts checked against
+# real reports.
+CITY = templates.LabTemplate(
+    'city_diagnostic', header='CITY DIAGNOSTIC LABORATORY',
+    columns=('name', 'value', 'unit', 'low', '-', 'high'), page_size=(595.0, 842.0),
+)
+NORTHSIDE = templates.LabTemplate(
+    'northside_pathology', header='NORTHSIDE PATHOLOGY SERVICES',
+    columns=('name', 'value', 'unit', 'range', 'flag'), separator='|',
+)
+
+
+@pytest.fixture
+def samples(monkeypatch):
+    registry = templates.TemplateRegistry([CITY, NORTHSIDE], enabled=True)
+    monkeypatch.setattr(extract, 'lab_templates', registry)
+    return registry
+
+
+def _golden(name):
+    with open(os.path.join(GOLDEN_DIR, f'{name}.txt'), encoding='utf-8') as fh:
+        text = fh.read()
+    with open(os.path.join(GOLDEN_DIR, f'{name}.json'), encoding='utf-8') as fh:
+        return text, json.load(fh)
+
+
+def test_every_shipped_template_has_a_golden_file():
+    for template in templates.registry:
+        assert os.path.exists(os.path.join(GOLDEN_DIR, f'{template.name}.txt')), template.name
+        assert os.path.exists(os.path.join(GOLDEN_DIR, f'{template.name}.json')), template.name
+
+
+@pytest.mark.parametrize('name', [CITY.name, NORTHSIDE.name])
+def test_golden_reports(samples, name):
+    text, expected = _golden(name)
+    assert samples.match(text).name == name
+    assert parse_tests(text) == expected
+
+
+def test_unknown_layouts_use_the_row_scanner(samples):
+    text = "GENERAL HOSPITAL\nHemoglobin 10.1 g/dL 12.0 - 16.0\nTSH 2.5 uIU/mL (0.4 - 4.0)"
+    assert samples.match(text) is None
+    tests = parse_tests(text)
+    samples.enabled = False
+    assert parse_tests(text) == tests and len(tests) == 2
+
+
+def test_template_without_rows_falls_back_to_the_row_scanner(samples):
+    text = "CITY DIAGNOSTIC LABORATORY\nHemoglobin: 10.1 g/dL (12.0-16.0)"
+    assert extract.lab_rows(text) is None
+    assert [t['value'] for t in parse_tests(text)] == [10.1]
+
+
+def test_page_size_is_part_of_the_fingerprint(samples):
+    text = "CITY DIAGNOSTIC LABORATORY\nHemoglobin 10.1 g/dL 12.0 - 16.0"
+    assert samples.match(text, (595.3, 841.9)) is CITY
+    assert samples.match(text, (612.0, 792.0)) is None
+    assert samples.match(text) is CITY
+
+
+def test_columns_compile_into_row_reader():
+    template = templates.LabTemplate('t', 'T', ('name', 'value', 'unit', 'range', 'flag'), separator=';')
+    assert template.read_row("Serum Iron; 80 ; ug/dL ; (60-170) ; ") == ("Serum Iron", 80.0, "ug/dL", 60.0, 170.0)
+    assert template.read_row("Serum Iron; 80 ; ug/dL ; 60-170") is None
+    assert template.read_row("Serum Iron; high ; ug/dL ; 60-170 ;") is None
+    with pytest.raises(ValueError):
+        templates.LabTemplate('t', 'T', ('value', 'name', 'low', 'high'))
+
+
+def test_registry_rejects_duplicate_names():
+    registry = templates.TemplateRegistry([CITY])
+    with pytest.raises(ValueError):
+        registry.register(CITY)
+
+
+def test_pdf_pages_are_read_by_their_template(samples, monkeypatch):
+    text, expected = _golden(NORTHSIDE.name)
+    # Templates alone: the word-box parser is never reached
+    monkeypatch.setattr('utils.ocr.page_rows', lambda *args: pytest.fail("word boxes read"))
+    _, rows = read_pdf(render_pdf([text]), layout=True)
+    assert [(t['test'], t['value'], t['unit']) for t in rows[0]] == [
+        (t['test'], t['value'], t['unit']) for t in expected
+    ]
@@ -0,0 +1,30 @@
+import hashlib
+import io
+import os
+
+from werkzeug.datastructures import FileStorage
+
+from utils.uploads import receive_upload
+
+
+def _storage(data, filename="report.pdf"):
+    return FileStorage(stream=io.BytesIO(data), filename=filename)
+
+
+def test_small_upload_stays_in_memory():
+    data = b"%PDF-1.7 small"
+    with receive_upload(_storage(data), spool_bytes=1024) as upload:
+        assert upload.source == data
+        assert upload.path is None
+        assert upload.digest == hashlib.sha256(data).hexdigest()
+
+
+def test_large_upload_spills_to_a_temp_file_that_is_removed():
+    data = os.urandom(200 * 1024)
+    with receive_upload(_storage(data, "scan.PNG"), spool_bytes=64 * 1024) as upload:
+        path = upload.source
+        assert path.endswith(".png")
+        with open(path, 'rb') as fh:
+            assert fh.read() == data
+        assert upload.digest == hashlib.sha256(data).hexdigest()
+    assert not os.path.exists(path)
@@ -0,0 +1,170 @@
+# utils/batch.py
+"""Offline batch extraction for backfilling archives of lab reports.
+
+Walks a directory, OCRs and parses every report on a process pool and
+appends one result per file to an NDJSON or CSV output as files finish::
+
+    python -m utils.batch archive/ results.ndjson --workers 8
+    python -m utils.batch archive/ results.csv --no-llm
+
+Finished files are recorded in a checkpoint next to the output
+(``results.ndjson.done``), so rerunning the same command after a crash
+resumes where it stopped. A file is checkpointed only after its result
+is flushed, so a crash can at worst repeat the last few results; it
+never loses one. Only a bounded number of files is in flight at a time,
+so memory stays flat however large the archive is.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from utils import ocr
+from utils.bulk import SUPPORTED_EXTENSIONS
+from utils.cache import file_hash
+from utils.extract import parse_tests, get_ai_explanations
+from utils.pipeline import extract_document
+
+CSV_FIELDS = ['path', 'digest', 'test', 'value', 'unit', 'ref_range', 'status', 'explanation', 'error']
+
+
+def iter_reports(root):
+    """Yield paths of supported reports under root, relative to it, in a stable order"""
+    for directory, subdirs, files in os.walk(root):
+        subdirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS and not name.startswith('.'):
+                yield os.path.relpath(os.path.join(directory, name), root)
+
+
+def _init_batch_worker():
+    # Files are the unit of parallelism: OCR each file's pages inline, single-threaded
+    ocr._init_ocr_worker()
+    ocr.OCR_WORKERS = 1
+
+
+def process_report(root, relpath, use_llm=True):
+    """OCR and parse one report; runs inside a pool worker"""
+    path = os.path.join(root, relpath)
+    try:
+        text, tests = extract_document(path)
+        if tests is None:
+            tests = parse_tests(text)
+        if tests:
+            get_ai_explanations(tests, fetch=use_llm)
+        return {'path': relpath, 'status': 'ok', 'digest': file_hash(path), 'tests': tests}
+    except Exception as e:
+        return {'path': relpath, 'status': 'error', 'error': str(e)}
+
+
+class ResultWriter:
+    """Appends results to NDJSON or CSV, flushing after every file"""
+
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._fh = open(path, 'a', newline='', encoding='utf-8')
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(self._fh, fieldnames=CSV_FIELDS, extrasaction='ignore')
+            if new:
+                self._csv.writeheader()
+
+    def write(self, result):
+        if self.fmt == 'ndjson':
+            self._fh.write(json.dumps(result) + '\n')
+        elif result['status'] != 'ok' or not result['tests']:
+            # One row per file without tests, so every file appears in the output
+            self._csv.writerow({'path': result['path'], 'digest': result.get('digest'), 'error': result.get('error')})
+        else:
+            for test in result['tests']:
+                self._csv.writerow({'path': result['path'], 'digest': result['digest'], **test})
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def close(self):
+        self._fh.close()
+
+
+class Checkpoint:
+    """Append-only list of finished report paths"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as fh:
+                self.done = {line.rstrip('\n') for line in fh if line.strip()}
+        self._fh = open(path, 'a', encoding='utf-8')
+
+    def mark(self, relpath):
+        self._fh.write(relpath + '\n')
+        self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+
+
+def run_batch(root, output, fmt='ndjson', workers=None, use_llm=True, progress=None):
+    """Process every pending report under root; returns (processed, failed)"""
+    workers = workers or os.cpu_count() or 1
+    checkpoint = Checkpoint(output + '.done')
+    writer = ResultWriter(output, fmt)
+    processed = failed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker) as pool:
+            reports = (relpath for relpath in iter_reports(root) if relpath not in checkpoint.done)
+            pending = set()
+            window = 2 * workers
+            exhausted = False
+            while pending or not exhausted:
+                # Top the window up from the (lazy) directory walk
+                while not exhausted and len(pending) < window:
+                    relpath = next(reports, None)
+                    if relpath is None:
+                        exhausted = True
+                    else:
+                        pending.add(pool.submit(process_report, root, relpath, use_llm))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    writer.write(result)
+                    checkpoint.mark(result['path'])
+                    processed += 1
+                    failed += result['status'] != 'ok'
+                    if progress:
+                        progress(processed, failed)
+    finally:
+        writer.close()
+        checkpoint.close()
+    return processed, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-extract lab results from a directory of reports")
+    parser.add_argument('root', help="directory to scan for PDFs and images")
+    parser.add_argument('output', help="results file (.ndjson or .csv); appended to when resuming")
+    parser.add_argument('--format', choices=['ndjson', 'csv'], help="output format (default: from the file extension)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument('--no-llm', action='store_true', help="skip AI explanations; use memoized or basic ones")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('csv' if args.output.lower().endswith('.csv') else 'ndjson')
+    started = time.monotonic()
+
+    def progress(processed, failed):
+        if processed % 100 == 0:
+            rate = processed / (time.monotonic() - started)
+            print(f"{processed} files ({failed} failed), {rate:.1f} files/s", file=sys.stderr)
+
+    processed, failed = run_batch(args.root, args.output, fmt, args.workers, not args.no_llm, progress)
+    print(f"Done: {processed} files processed, {failed} failed -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
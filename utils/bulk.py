@@ -0,0 +1,201 @@
+# utils/bulk.py
+"""Bulk analysis of many reports in one request.
+
+Documents (individual uploads or the members of a ZIP archive) are OCRed
+and parsed in parallel on a worker pool. Finished documents are gathered
+into batches of up to ``BULK_EXPLAIN_BATCH``, waiting at most
+``BULK_EXPLAIN_WAIT`` seconds after the first one, and the tests of a
+batch are explained together with one memo lookup and at most one LLM
+call. Each document's result is yielded as soon as its batch is
+explained and its summary is ready, so the caller can stream results
+back as NDJSON. ZIP archives are checked against ``BULK_MAX_TOTAL_BYTES``
+from their declared sizes before anything is extracted.
+"""
+
+import logging
+import os
+import shutil
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from werkzeug.utils import secure_filename
+
+from utils.cache import file_hash
+from utils.extract import explain_batch
+from utils.pipeline import get_text, get_parsed_tests, start_summary
+from utils.summarizer import fallback_summary
+
+# Documents OCRed and parsed at the same time per bulk request
+BULK_WORKERS = int(os.getenv('BULK_WORKERS', '4'))
+# Most documents accepted in one bulk request (ZIP members included)
+BULK_MAX_FILES = int(os.getenv('BULK_MAX_FILES', '500'))
+# Most finished documents whose explanations are fetched in one LLM call
+BULK_EXPLAIN_BATCH = int(os.getenv('BULK_EXPLAIN_BATCH', '16'))
+# Longest wait, in seconds, for more finished documents before explaining a batch
+BULK_EXPLAIN_WAIT = float(os.getenv('BULK_EXPLAIN_WAIT', '2'))
+# Largest uncompressed ZIP member accepted, in bytes
+BULK_MAX_MEMBER_BYTES = int(os.getenv('BULK_MAX_MEMBER_BYTES', str(32 * 1024 * 1024)))
+# Most bytes written for one bulk request, uploads and uncompressed ZIP members together
+BULK_MAX_TOTAL_BYTES = int(os.getenv('BULK_MAX_TOTAL_BYTES', str(256 * 1024 * 1024)))
+
+SUPPORTED_EXTENSIONS = {'.pdf', '.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp', '.gif', '.webp'}
+
+logger = logging.getLogger(__name__)
+
+
+class BulkError(ValueError):
+    """Raised for a bulk upload that cannot be processed at all"""
+
+
+def _supported(name):
+    return os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS
+
+
+def _zip_members(archive):
+    """The supported files inside a ZIP archive, as ZipInfo entries"""
+    members = []
+    for info in archive.infolist():
+        name = info.filename
+        base = os.path.basename(name)
+        if info.is_dir() or name.startswith('__MACOSX/') or base.startswith('.') or not _supported(base):
+            continue
+        if info.file_size > BULK_MAX_MEMBER_BYTES:
+            raise BulkError(f"{name} is larger than {BULK_MAX_MEMBER_BYTES} bytes")
+        members.append(info)
+    return members
+
+
+def stage_documents(uploads, directory, max_files=BULK_MAX_FILES, max_bytes=BULK_MAX_TOTAL_BYTES):
+    """Write uploads (expanding ZIP archives) into directory.
+
+    ``uploads`` is a list of (filename, file object) pairs. Returns a
+    list of (document name, stored path) in upload order. Raises
+    BulkError before writing more than ``max_files`` documents or
+    ``max_bytes`` bytes; an archive's members are checked against the
+    limits from their declared sizes before any is extracted.
+    """
+    documents = []
+    total = 0
+
+    def reserve(count, size):
+        nonlocal total
+        if len(documents) + count > max_files:
+            raise BulkError(f"Too many documents; the limit is {max_files}")
+        if total + size > max_bytes:
+            raise BulkError(f"Documents are larger than {max_bytes} bytes in total")
+        total += size
+
+    def add(name, source):
+        # Prefix with the position so equal names inside archives do not collide
+        stored = f"{len(documents):05d}_{secure_filename(os.path.basename(name)) or 'document'}"
+        path = os.path.join(directory, stored)
+        with open(path, 'wb') as fh:
+            shutil.copyfileobj(source, fh)
+        documents.append((name, path))
+
+    for filename, stream in uploads:
+        if filename.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(stream) as archive:
+                    members = _zip_members(archive)
+                    reserve(len(members), sum(info.file_size for info in members))
+                    for info in members:
+                        # Decompression stops at the declared size
+                        with archive.open(info) as member:
+                            add(info.filename, member)
+            except zipfile.BadZipFile as e:
+                raise BulkError(f"{filename} is not a valid ZIP archive") from e
+        elif _supported(filename):
+            stream.seek(0, os.SEEK_END)
+            size = stream.tell()
+            stream.seek(0)
+            reserve(1, size)
+            add(filename, stream)
+        else:
+            raise BulkError(f"Unsupported file type: {filename}")
+
+    if not documents:
+        raise BulkError("No supported documents found")
+    return documents
+
+
+def _prepare(name, path, summarize):
+    """OCR and parse one document; start its summary in the background"""
+    digest = file_hash(path)
+    text = get_text(digest, path)
+    if not text or len(text.strip()) < 10:
+        raise ValueError("Could not extract readable text from the document")
+    tests = [dict(test) for test in get_parsed_tests(digest, text)]
+    summary_future = start_summary(digest, text) if summarize else None
+    return {'digest': digest, 'text': text, 'tests': tests, 'summary_future': summary_future}
+
+
+def _finish(index, name, prepared, include_text):
+    result = {
+        'index': index,
+        'filename': name,
+        'status': 'ok',
+        'digest': prepared['digest'],
+        'tests': prepared['tests']
+    }
+    future = prepared['summary_future']
+    if future is not None:
+        try:
+            result['summary'] = future.result()
+            result['ai_summary'] = True
+        except Exception as e:
+            logger.warning("AI summary generation failed for %s: %s", name, e)
+            result['summary'] = fallback_summary(prepared['text'], e)
+            result['ai_summary'] = False
+    if include_text:
+        result['text'] = prepared['text']
+    return result
+
+
+def analyze_documents(documents, summarize=True, include_text=False,
+                      workers=BULK_WORKERS, batch_size=BULK_EXPLAIN_BATCH, max_wait=BULK_EXPLAIN_WAIT):
+    """Analyze (name, path) documents in parallel, yielding results as they finish.
+
+    Finished documents are explained in batches of ``batch_size``, or
+    of whatever finished within ``max_wait`` seconds of the oldest one
+    waiting, or of the rest once nothing is left running. Every yielded
+    dict carries the document's ``index`` in the upload and a ``status``
+    of ``ok`` or ``error``.
+    """
+    batch_size = max(batch_size, 1)
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='bulk') as pool:
+        pending = {
+            pool.submit(_prepare, name, path, summarize): (index, name)
+            for index, (name, path) in enumerate(documents)
+        }
+        ready = []
+        deadline = None
+        try:
+            while pending or ready:
+                done = ()
+                if pending:
+                    timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                    done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=lambda f: pending[f][0]):
+                    index, name = pending.pop(future)
+                    try:
+                        ready.append((index, name, future.result()))
+                    except Exception as e:
+                        logger.warning("Bulk analysis failed for %s: %s", name, e)
+                        yield {'index': index, 'filename': name, 'status': 'error', 'error': str(e)}
+                        continue
+                    if deadline is None:
+                        deadline = time.monotonic() + max_wait
+
+                while ready and (len(ready) >= batch_size or not pending or time.monotonic() >= deadline):
+                    batch, ready = ready[:batch_size], ready[batch_size:]
+                    explain_batch([prepared['tests'] for _, _, prepared in batch])
+                    for index, name, prepared in batch:
+                        yield _finish(index, name, prepared, include_text)
+                    deadline = time.monotonic() + max_wait if ready else None
+        finally:
+            # The client went away: drop documents that have not started
+            for future in pending:
+                future.cancel()
+
@@ -0,0 +1,142 @@
+# utils/cache.py
+"""Content-addressed analysis cache shared by every worker process.
+
+Entries are keyed by the SHA-256 of the uploaded bytes plus a stage name
+("text", "tests", "summary") so a partial hit still saves
+work. Finished reports and their rendered PDFs are stored the same way,
+keyed by a report ID. Values are stored as JSON in SQLite (WAL mode) and evicted by TTL and
+by total size, least recently used first.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from utils.metrics import cache_lookups
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = os.getenv('ANALYSIS_CACHE_PATH', os.path.join('cache', 'analysis.sqlite3'))
+CACHE_TTL = int(os.getenv('ANALYSIS_CACHE_TTL', str(7 * 24 * 3600)))
+CACHE_MAX_BYTES = int(os.getenv('ANALYSIS_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+
+def content_hash(data):
+    """Return the hex SHA-256 digest of some bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path):
+    """Return the hex SHA-256 digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """SQLite-backed stage cache; safe to share between threads and processes"""
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _connect(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " digest TEXT NOT NULL, stage TEXT NOT NULL, value TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL,"
+            " PRIMARY KEY (digest, stage))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _read(self, digest, stage):
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, created FROM entries WHERE digest = ? AND stage = ?",
+                (digest, stage)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                cache_lookups.inc(cache='analysis', stage=stage, result='miss')
+                return None
+            cache_lookups.inc(cache='analysis', stage=stage, result='hit')
+            conn.execute(
+                "UPDATE entries SET accessed = ? WHERE digest = ? AND stage = ?",
+                (now, digest, stage)
+            )
+            return row[0]
+        except sqlite3.Error as e:
+            logger.warning("Analysis cache read failed: %s", e)
+            return None
+
+    def _write(self, digest, stage, payload):
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (digest, stage, value, size, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, stage, payload, len(payload), now, now)
+            )
+            self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning("Analysis cache write failed: %s", e)
+
+    def get(self, digest, stage):
+        """Return the cached value for (digest, stage), or None on a miss"""
+        value = self._read(digest, stage)
+        return json.loads(value) if value is not None else None
+
+    def set(self, digest, stage, value):
+        """Store a JSON-serializable value, then evict expired and excess entries"""
+        self._write(digest, stage, json.dumps(value))
+
+    def get_bytes(self, digest, stage):
+        """Return cached raw bytes (such as a rendered PDF), or None on a miss"""
+        value = self._read(digest, stage)
+        return bytes(value) if value is not None else None
+
+    def set_bytes(self, digest, stage, data):
+        """Store raw bytes as a BLOB, counted against the same size cap"""
+        self._write(digest, stage, sqlite3.Binary(data))
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for rowid, size in conn.execute("SELECT rowid, size FROM entries ORDER BY accessed"):
+            doomed.append((rowid,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        conn.executemany("DELETE FROM entries WHERE rowid = ?", doomed)
+
+    def clear(self):
+        self._connect().execute("DELETE FROM entries")
+
+
+analysis_cache = AnalysisCache()
@@ -0,0 +1,165 @@
+# utils/explanations.py
+"""Persistent memo of test explanations keyed by (test, status band[, unit]).
+
+Explanations for "Hemoglobin / Low" barely change between patients, so
+get_ai_explanations only asks the LLM about tests missing from this memo.
+Because an entry is shown to every patient with that key, the LLM is
+only ever given the key's fields, never a patient's value or range.
+Entries come from LLM answers (long TTL) and from the basic fallback text
+(short TTL, so they are refreshed by the LLM once it is reachable again).
+Expired entries count as misses, and the least recently used entries are
+evicted above a size cap.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from utils.metrics import cache_lookups
+
+logger = logging.getLogger(__name__)
+
+MEMO_PATH = os.getenv('EXPLANATION_MEMO_PATH', os.path.join('cache', 'explanations.sqlite3'))
+EXPLANATION_TTL = int(os.getenv('EXPLANATION_TTL', str(30 * 24 * 3600)))
+EXPLANATION_BASIC_TTL = int(os.getenv('EXPLANATION_BASIC_TTL', '3600'))
+MEMO_MAX_ENTRIES = int(os.getenv('EXPLANATION_MEMO_MAX_ENTRIES', '50000'))
+MEMO_BY_UNIT = os.getenv('EXPLANATION_MEMO_BY_UNIT', '0') == '1'
+
+_NORMALIZE_RE = re.compile(r'[^a-z0-9%/]+')
+# Prefix of every key; changed when older entries must no longer be served
+# (v2: entries from prompts that included patient values are dropped)
+_KEY_VERSION = 'v2'
+
+
+def normalize(value):
+    """Lower-cased words of a test name, status or unit, as compared in keys"""
+    return _NORMALIZE_RE.sub(' ', (value or '').lower()).strip()
+
+
+class ExplanationMemo:
+    """SQLite-backed explanation store with hit-rate counters"""
+
+    def __init__(self, path=MEMO_PATH, ttl=EXPLANATION_TTL, basic_ttl=EXPLANATION_BASIC_TTL,
+                 max_entries=MEMO_MAX_ENTRIES, by_unit=MEMO_BY_UNIT):
+        self.path = path
+        self.ttls = {'ai': ttl, 'basic': basic_ttl}
+        self.max_entries = max_entries
+        self.by_unit = by_unit
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS explanations ("
+            " key TEXT PRIMARY KEY, explanation TEXT NOT NULL, source TEXT NOT NULL,"
+            " expires REAL NOT NULL, last_used REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS explanations_last_used ON explanations (last_used)")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def key(self, test):
+        parts = [_KEY_VERSION, normalize(test['test']), normalize(test['status'])]
+        if self.by_unit:
+            parts.append(normalize(test.get('unit')))
+        return '|'.join(parts)
+
+    def fill(self, test_results):
+        """Set explanations for memoized tests; return the tests that missed"""
+        keys = [self.key(test) for test in test_results]
+        now = time.time()
+        found = {}
+        try:
+            conn = self._connect()
+            unique = sorted(set(keys))
+            placeholders = ','.join('?' * len(unique))
+            rows = conn.execute(
+                f"SELECT key, explanation FROM explanations WHERE key IN ({placeholders}) AND expires > ?",
+                (*unique, now)
+            ).fetchall() if unique else []
+            found = dict(rows)
+            if found:
+                conn.executemany(
+                    "UPDATE explanations SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+        except sqlite3.Error as e:
+            logger.warning("Explanation memo read failed: %s", e)
+
+        misses = []
+        for test, key in zip(test_results, keys):
+            if key in found:
+                test['explanation'] = found[key]
+            else:
+                misses.append(test)
+        with self._lock:
+            self.hits += len(test_results) - len(misses)
+            self.misses += len(misses)
+        cache_lookups.inc(len(test_results) - len(misses), cache='explanations', stage='explanation', result='hit')
+        cache_lookups.inc(len(misses), cache='explanations', stage='explanation', result='miss')
+        return misses
+
+    def store(self, entries):
+        """Store (test, explanation, source) triples; source is 'ai' or 'basic'"""
+        now = time.time()
+        rows = [
+            (self.key(test), explanation, source, now + self.ttls[source], now)
+            for test, explanation, source in entries
+        ]
+        if not rows:
+            return
+        conn = None
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO explanations (key, explanation, source, expires, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute("DELETE FROM explanations WHERE expires <= ?", (now,))
+            excess = conn.execute("SELECT COUNT(*) FROM explanations").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM explanations WHERE key IN"
+                    " (SELECT key FROM explanations ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            logger.warning("Explanation memo write failed: %s", e)
+            if conn is not None and conn.in_transaction:
+                conn.execute("ROLLBACK")
+
+    def stats(self):
+        """Process-local hit/miss counters plus the stored entry count"""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        try:
+            entries = self._connect().execute("SELECT COUNT(*) FROM explanations").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'entries': entries
+        }
+
+
+explanation_memo = ExplanationMemo()
@@ -1,280 +1,390 @@
 # utils/extract.py
 
 import re
-import requests
-import os
 import json
+import logging
+
+from utils.router import routed_completion
+from utils.explanations import explanation_memo, normalize
+from utils.metrics import fallbacks, timed, timed_part
+from utils.names import NameIndex
+from utils.templates import registry as lab_templates
+
+logger = logging.getLogger(__name__)
+
+# Actual medical test names that we want to extract, with the aliases
+# they appear under in lab reports
+MEDICAL_TESTS = {
+    'hemoglobin': ['hemoglobin', 'hb', 'hgb'],
+    'hematocrit': ['hematocrit', 'hct', 'packed cell volume', 'pcv'],
+    'rbc': ['rbc', 'red blood cell count', 'erythrocyte count'],
+    'wbc': ['wbc', 'white blood cell count', 'total leucocyte count', 'tlc', 'leukocyte count'],
+    'platelet': ['platelet count', 'platelets', 'plt'],
+    'mcv': ['mcv', 'mean corpuscular volume'],
+    'mch': ['mch', 'mean corpuscular hemoglobin'],
+    'mchc': ['mchc', 'mean corpuscular hemoglobin concentration'],
+    'rdw': ['rdw', 'red cell distribution width'],
+    'neutrophils': ['neutrophils', 'neutrophil', 'pmn'],
+    'lymphocytes': ['lymphocytes', 'lymphocyte'],
+    'monocytes': ['monocytes', 'monocyte'],
+    'eosinophils': ['eosinophils', 'eosinophil'],
+    'basophils': ['basophils', 'basophil'],
+    'esr': ['esr', 'erythrocyte sedimentation rate'],
+    'glucose': ['glucose', 'blood glucose', 'fasting glucose'],
+    'urea': ['urea', 'blood urea'],
+    'creatinine': ['creatinine', 'serum creatinine'],
+    'bilirubin': ['bilirubin', 'total bilirubin'],
+    'sgpt': ['sgpt', 'alt', 'alanine transaminase'],
+    'sgot': ['sgot', 'ast', 'aspartate transaminase'],
+    'cholesterol': ['cholesterol', 'total cholesterol'],
+    'triglycerides': ['triglycerides', 'tg'],
+    'hdl': ['hdl', 'hdl cholesterol'],
+    'ldl': ['ldl', 'ldl cholesterol'],
+    'iron': ['iron', 'serum iron'],
+    'ferritin': ['ferritin'],
+    'transferrin': ['transferrin'],
+    'tibc': ['tibc', 'total iron binding capacity'],
+    'vitamin_b12': ['vitamin b12', 'b12', 'cobalamin'],
+    'vitamin_d': ['vitamin d', '25-oh vitamin d', '25(oh)d'],
+    'folate': ['folate', 'folic acid'],
+    'tsh': ['tsh', 'thyroid stimulating hormone'],
+    't3': ['t3', 'triiodothyronine'],
+    't4': ['t4', 'thyroxine']
+}
+
+# Keywords that mark an unlisted name as a medical test
+MEDICAL_KEYWORDS = ('vitamin', 'hemoglobin', 'glucose', 'cholesterol', 'protein', 'iron', 'calcium', 'sodium', 'potassium', 'urea', 'creatinine')
+
+# One result row: value, optional unit, a short non-numeric gap (flags,
+# "Ref:", brackets) and a low-high range. Units may carry a power of ten
+# ("x10^9/L", "× 10^3/uL"), and a value never starts right after "^", so
+# an exponent is not read as the value. Every quantifier is bounded, so
+# each match attempt does constant work and a scan is linear in the text.
+_NUMBER = r'\d{1,7}(?:\.\d{1,4})?'
+_ROW_RE = re.compile(
+    rf'(?<![\w.^])(?P<value>{_NUMBER})\s?'
+    r'(?P<unit>(?:[x×]\s?)?10\^\d{1,2}(?:\s?/[a-zA-Zµ%]{1,10})?|[a-zA-Zµ%/]{1,12})?'
+    rf'[^\d]{{0,20}}?(?P<low>{_NUMBER})\s?[-–—]\s?(?P<high>{_NUMBER})(?!\d)'
+)
+_WORD_RE = re.compile(r'[A-Za-z][A-Za-z0-9]*')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# How far back from a value we look for its test name
+_NAME_WINDOW = 48
+# Unmatched text carried from the end of one page into the next: a name
+# window plus the longest value, unit, gap and range a row can have
+_CARRY_CHARS = _NAME_WINDOW + 96
+
+
+# Words within a few edits of an alias that name other tests or findings
+NEAR_MISSES = ('creatine', 'eosinophilia', 'neutrophilia', 'basophilia')
+
+name_index = NameIndex(MEDICAL_TESTS, near_misses=NEAR_MISSES)
+
+
+def _find_alias(name):
+    """Return (standard name, offset where the alias starts in name), or (None, None)"""
+    return name_index.find(name)[:2]
+
+
+def resolve_test_name(name):
+    """Map a raw test name to its standard name via the alias index.
+
+    Aliases match on whole tokens, with OCR typos tolerated in longer
+    ones (see utils/names.py). When several aliases occur, the one
+    ending closest to the value wins, then the longest one, so
+    "Mean Corpuscular Hemoglobin Concentration" resolves to MCHC rather
+    than Hemoglobin. Returns None when no alias occurs in the name.
+    """
+    return name_index.lookup(name)
+
+
+def determine_status(value, low, high):
+    """Determine if a test result is normal, low, or high"""
+    if value < low:
+        return "Low" if value >= low * 0.8 else "Very Low"
+    elif value > high:
+        return "High" if value <= high * 1.2 else "Very High"
+    else:
+        return "Normal"
+
+
+def build_result(name_window, value, unit, low, high):
+    """Turn one row into (result dict, offset of the name in name_window).
+
+    ``name_window`` is the text just before the value. Returns (None, None)
+    if the row is not a medical test.
+    """
+    standard_name, name_offset = _find_alias(name_window)
+    if standard_name:
+        clean_test_name = standard_name.replace('_', ' ').title()
+    else:
+        # If not found in predefined tests, check for medical keywords
+        words = list(_WORD_RE.finditer(name_window))[-4:]
+        raw_name = ' '.join(word.group() for word in words)
+        lowered = raw_name.lower()
+        if len(lowered) <= 3 or not any(keyword in lowered for keyword in MEDICAL_KEYWORDS):
+            return None, None
+        clean_test_name = raw_name.title()
+        name_offset = words[0].start()
+
+    # Sanity checks
+    if value <= 0 or low <= 0 or high <= 0 or low >= high or value > 100000:
+        return None, None
+
+    return {
+        "test": clean_test_name,
+        "value": value,
+        "unit": unit.strip() if unit else "",
+        "ref_range": f"{low} - {high}",
+        "status": determine_status(value, low, high),
+        "explanation": "",  # Will be filled by AI
+        "ref_low": low,
+        "ref_high": high
+    }, name_offset
+
+
+def _row_from_match(match, name_window):
+    return build_result(
+        name_window, float(match.group('value')), match.group('unit'),
+        float(match.group('low')), float(match.group('high'))
+    )
+
+
+def collapse_whitespace(text):
+    """Collapse all whitespace runs to single spaces, as the row scanner expects"""
+    return _WHITESPACE_RE.sub(' ', text)
+
+
+def iter_test_rows(text):
+    """Yield (result, start, end) for every test row in collapsed text.
+
+    ``start`` is where the row's test name begins and ``end`` where its
+    reference range ends. Duplicate tests are yielded each time they occur.
+    """
+    pos = 0
+    name_floor = 0
+    while True:
+        match = _ROW_RE.search(text, pos)
+        if match is None:
+            return
+        start = match.start()
+        window_start = max(name_floor, start - _NAME_WINDOW)
+        result, name_offset = _row_from_match(match, text[window_start:start])
+        if result is None:
+            # Retry from the next number so a rejected candidate cannot swallow a real row
+            pos = start + 1
+            continue
+
+        pos = name_floor = match.end()
+        yield result, window_start + name_offset, match.end()
+
+
+def lab_rows(text, page_size=None):
+    """Rows of a page in a registered lab layout, or None.
+
+    None means the layout is unknown (see utils/templates.py) or its
+    template read no rows, and the page is left to the row scanner.
+    """
+    template = lab_templates.match(text, page_size)
+    if template is None:
+        return None
+    rows = []
+    for row in template.rows(text):
+        result, _ = build_result(*row)
+        if result is not None:
+            rows.append(result)
+    return rows or None
+
+
+def _row_numbers(row):
+    return row['value'], row['ref_low'], row['ref_high']
+
+
+def iter_page_tests(pages):
+    """Yield test rows page by page, as each page of an iterable arrives.
+
+    A page is its text, or a (text, rows) pair whose rows were already
+    read from its layout (see utils/layout.py). Text in a registered lab
+    layout is first read by its template (see lab_rows). Those rows come
+    first; the text is then collapsed and scanned as well, so rows the
+    layout or template reader missed are still found. Scanned rows with
+    the same value and range as a layout row are taken to be that row. The unmatched end
+    of a scanned page is carried into the next one, so a row split by a
+    page break is still found. A test already yielded, for this page or
+    an earlier one, is skipped, as in parse_tests.
+    """
+    processed_tests = set()
+    carry = ''
+    for page in pages:
+        with timed_part('extract'):
+            if isinstance(page, str):
+                text, layout_rows = page, lab_rows(page)
+            else:
+                text, layout_rows = page
+            rows = list(layout_rows or ())
+            # A scanned row with a layout row's numbers is that row, perhaps under a garbled name
+            covered = {_row_numbers(row) for row in rows}
+            # Table cells often land on separate lines, so scan the page as one line
+            scanned = carry + collapse_whitespace(text)
+            end = 0
+            for result, _, end in iter_test_rows(scanned):
+                if _row_numbers(result) not in covered:
+                    rows.append(result)
+            carry = scanned[max(end, len(scanned) - _CARRY_CHARS):] + ' '
+        for result in rows:
+            test_key = result['test'].lower()
+            if test_key in processed_tests:
+                continue
+            processed_tests.add(test_key)
+            yield result
+
+
+def parse_tests(text):
+    """Extract structured test rows from text in a single linear scan.
+
+    Returns the same dicts as extract_tests, with empty explanations.
+    """
+    return list(iter_page_tests([text]))
+
 
 def extract_tests(text):
     """Extract medical test results with strict medical test validation"""
-    
-    # Define actual medical test names that we want to extract
-    medical_tests = {
-        'hemoglobin': ['hemoglobin', 'hb', 'hgb'],
-        'hematocrit': ['hematocrit', 'hct', 'packed cell volume', 'pcv'],
-        'rbc': ['rbc', 'red blood cell count', 'erythrocyte count'],
-        'wbc': ['wbc', 'white blood cell count', 'total leucocyte count', 'tlc', 'leukocyte count'],
-        'platelet': ['platelet count', 'platelets', 'plt'],
-        'mcv': ['mcv', 'mean corpuscular volume'],
-        'mch': ['mch', 'mean corpuscular hemoglobin'],
-        'mchc': ['mchc', 'mean corpuscular hemoglobin concentration'],
-        'rdw': ['rdw', 'red cell distribution width'],
-        'neutrophils': ['neutrophils', 'neutrophil', 'pmn'],
-        'lymphocytes': ['lymphocytes', 'lymphocyte'],
-        'monocytes': ['monocytes', 'monocyte'],
-        'eosinophils': ['eosinophils', 'eosinophil'],
-        'basophils': ['basophils', 'basophil'],
-        'esr': ['esr', 'erythrocyte sedimentation rate'],
-        'glucose': ['glucose', 'blood glucose', 'fasting glucose'],
-        'urea': ['urea', 'blood urea'],
-        'creatinine': ['creatinine', 'serum creatinine'],
-        'bilirubin': ['bilirubin', 'total bilirubin'],
-        'sgpt': ['sgpt', 'alt', 'alanine transaminase'],
-        'sgot': ['sgot', 'ast', 'aspartate transaminase'],
-        'cholesterol': ['cholesterol', 'total cholesterol'],
-        'triglycerides': ['triglycerides', 'tg'],
-        'hdl': ['hdl', 'hdl cholesterol'],
-        'ldl': ['ldl', 'ldl cholesterol'],
-        'iron': ['iron', 'serum iron'],
-        'ferritin': ['ferritin'],
-        'transferrin': ['transferrin'],
-        'tibc': ['tibc', 'total iron binding capacity'],
-        'vitamin_b12': ['vitamin b12', 'b12', 'cobalamin'],
-        'vitamin_d': ['vitamin d', '25-oh vitamin d', '25(oh)d'],
-        'folate': ['folate', 'folic acid'],
-        'tsh': ['tsh', 'thyroid stimulating hormone'],
-        't3': ['t3', 'triiodothyronine'],
-        't4': ['t4', 'thyroxine']
-    }
-    
-    results = []
-    processed_tests = set()
-    
-    print("="*50)
-    print("MEDICAL TEST EXTRACTION")
-    print("="*50)
-    
-    # Clean the text first
-    text = re.sub(r'\s+', ' ', text)
-    lines = text.split('\n')
-    
-    for line_num, line in enumerate(lines):
-        line = line.strip()
-        if len(line) < 10:
-            continue
-            
-        if re.search(r'\d', line) and re.search(r'[-–—]', line):
-            patterns = [
-                r'([A-Za-z][A-Za-z\s]{2,30}?)[\s:]+([0-9]+\.?[0-9]*)\s*([a-zA-Z/%µ/]+)\s+([0-9]+\.?[0-9]*)\s*[-–—]\s*([0-9]+\.?[0-9]*)',
-                r'([A-Za-z][A-Za-z\s]{2,30}?)\s+([0-9]+\.?[0-9]*)\s+([a-zA-Z/%µ/]+)\s*\(?([0-9]+\.?[0-9]*)\s*[-–—]\s*([0-9]+\.?[0-9]*)\)?',
-                r'([A-Za-z][A-Za-z\s]{2,30}?)\s+([0-9]+\.?[0-9]*)\s+([a-zA-Z/%µ/]+)\s+([0-9]+\.?[0-9]*)\s*[-–—]\s*([0-9]+\.?[0-9]*)',
-                r'([A-Za-z][^\d]*?)\s+([0-9]+\.?[0-9]*)\s*([a-zA-Z/%µ/]*)\s*[^\d]*([0-9]+\.?[0-9]*)\s*[-–—]\s*([0-9]+\.?[0-9]*)'
-            ]
-            
-            for pattern in patterns:
-                matches = re.findall(pattern, line, re.IGNORECASE)
-                
-                if matches:
-                    for match in matches:
-                        try:
-                            if len(match) != 5:
-                                continue
-                                
-                            test_name, value_str, unit, low_str, high_str = match
-                            
-                            # Clean test name
-                            original_test_name = test_name.strip()
-                            test_name = test_name.strip().lower()
-                            test_name = re.sub(r'[^\w\s]', ' ', test_name)
-                            test_name = re.sub(r'\s+', ' ', test_name).strip()
-                            
-                            # Check if this is actually a medical test
-                            is_medical_test = False
-                            clean_test_name = ""
-                            
-                            for standard_name, variations in medical_tests.items():
-                                for variation in variations:
-                                    if variation in test_name or test_name in variation:
-                                        is_medical_test = True
-                                        clean_test_name = standard_name.replace('_', ' ').title()
-                                        break
-                                if is_medical_test:
-                                    break
-                            
-                            # If not found in predefined tests, check for medical keywords
-                            if not is_medical_test and len(test_name) > 3:
-                                medical_keywords = ['vitamin', 'hemoglobin', 'glucose', 'cholesterol', 'protein', 'iron', 'calcium', 'sodium', 'potassium', 'urea', 'creatinine']
-                                for keyword in medical_keywords:
-                                    if keyword in test_name:
-                                        is_medical_test = True
-                                        clean_test_name = original_test_name.title().strip()
-                                        break
-                            
-                            if not is_medical_test:
-                                continue
-                            
-                            test_key = clean_test_name.lower().strip()
-                            if test_key in processed_tests:
-                                continue
-                            
-                            # Parse values
-                            try:
-                                value = float(value_str)
-                                low = float(low_str)
-                                high = float(high_str)
-                            except ValueError:
-                                continue
-                            
-                            # Sanity checks
-                            if value <= 0 or low <= 0 or high <= 0 or low >= high or value > 100000:
-                                continue
-                            
-                            # Determine status
-                            if value < low:
-                                status = "Low" if value >= low * 0.8 else "Very Low"
-                            elif value > high:
-                                status = "High" if value <= high * 1.2 else "Very High"
-                            else:
-                                status = "Normal"
-                            
-                            # Create result - we'll get AI explanation later
-                            result = {
-                                "test": clean_test_name,
-                                "value": value,
-                                "unit": unit.strip() if unit else "",
-                                "ref_range": f"{low} - {high}",
-                                "status": status,
-                                "explanation": "",  # Will be filled by AI
-                                "ref_low": low,
-                                "ref_high": high
-                            }
-                            
-                            results.append(result)
-                            processed_tests.add(test_key)
-                            break
-                            
-                        except Exception as e:
-                            continue
-    
+    results = parse_tests(text)
+
     # Now get AI-powered explanations for all results
     if results:
         results = get_ai_explanations(results)
-    
-    print(f"\nTotal medical tests found: {len(results)}")
+
+    logger.debug("Total medical tests found: %d", len(results))
     return results
 
-def get_ai_explanations(test_results):
-    """Get AI-powered explanations for test results"""
-    
-    try:
-        # Prepare the test data for AI analysis
-        test_summary = []
-        abnormal_tests = []
-        
-        for test in test_results:
-            test_info = f"{test['test']}: {test['value']} {test['unit']} (Reference: {test['ref_range']}) - Status: {test['status']}"
-            test_summary.append(test_info)
-            
-            if test['status'] != 'Normal':
-                abnormal_tests.append(test_info)
-        
-        # Create prompt for AI analysis
-        prompt = f"""
-As a medical expert, please provide detailed explanations for these lab test results. For each test, provide:
+def fetch_ai_explanations(test_results):
+    """Ask the LLM to explain each test result.
+
+    Only the fields of each test's memo key (name, status and, when the
+    memo keys by unit, unit) are sent: the answers are memoized and shown
+    to other patients, so they must not depend on anyone's value or range.
+    Returns a dict mapping test names (as the model wrote them) to
+    explanations. Raises on API errors or an unparseable response so
+    callers can tell a real answer from a fallback.
+    """
+    lines = {}
+    for test in test_results:
+        line = f"- {test['test']}: {test['status']}"
+        if explanation_memo.by_unit and test.get('unit'):
+            line += f" (measured in {test['unit']})"
+        lines.setdefault(explanation_memo.key(test), line)
+
+    prompt = f"""
+As a medical expert, please explain what each of these lab test results generally means. Each line gives a test name and whether the result was Normal, Low, High, Very Low or Very High. For each test, provide:
 1. A brief explanation of what the test measures
-2. Clinical significance of the abnormal values (if any)
-3. Possible causes or implications
-4. Recommendations for follow-up (if needed)
+2. What a result in that range generally indicates
+3. Common possible causes or implications
+4. Typical recommendations for follow-up (if needed)
+
+Write explanations that apply to anyone with that result. Do not mention specific values, numbers or reference ranges, and do not address a particular patient.
 
 Test Results:
-{chr(10).join(test_summary)}
+{chr(10).join(lines.values())}
 
-Please respond in JSON format with this structure:
+Please respond in JSON format with this structure, using each test name exactly as given:
 {{
     "explanations": {{
         "Test Name": "Detailed explanation here",
         "Another Test": "Another explanation here"
     }}
 }}
-
-Focus especially on abnormal results: {chr(10).join(abnormal_tests) if abnormal_tests else "All results are normal"}
 """
 
-        # Make API call
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "anthropic/claude-3-sonnet",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "max_tokens": 2000,
-                "temperature": 0.3
-            },
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            ai_response = response.json()
-            content = ai_response['choices'][0]['message']['content']
-            
-            # Try to parse JSON response
-            try:
-                # Extract JSON from response
-                json_start = content.find('{')
-                json_end = content.rfind('}') + 1
-                if json_start != -1 and json_end != -1:
-                    json_content = content[json_start:json_end]
-                    explanations = json.loads(json_content)
-                    
-                    # Update test results with AI explanations
-                    for test in test_results:
-                        test_name = test['test']
-                        
-                        # Try to find matching explanation
-                        explanation = None
-                        for key, value in explanations.get('explanations', {}).items():
-                            if test_name.lower() in key.lower() or key.lower() in test_name.lower():
-                                explanation = value
-                                break
-                        
-                        if explanation:
-                            test['explanation'] = explanation
-                        else:
-                            # Fallback to basic explanation
-                            test['explanation'] = generate_basic_explanation(test['test'], test['status'])
-                
-                else:
-                    # Fallback if JSON parsing fails
-                    for test in test_results:
-                        test['explanation'] = generate_basic_explanation(test['test'], test['status'])
-                        
-            except json.JSONDecodeError:
-                # Fallback if JSON parsing fails
-                for test in test_results:
-                    test['explanation'] = generate_basic_explanation(test['test'], test['status'])
-        
+    # Make API call
+    content = routed_completion('explanation', prompt, max_tokens=2000, temperature=0.3)
+
+    # Extract JSON from response
+    json_start = content.find('{')
+    json_end = content.rfind('}') + 1
+    if json_start == -1 or json_end == 0:
+        raise ValueError("AI response contained no JSON")
+    return json.loads(content[json_start:json_end]).get('explanations', {})
+
+
+def match_explanation(test_name, explanations):
+    """The AI explanation whose key is the test name, ignoring case and punctuation, or None.
+
+    Names are compared whole, so an answer for MCHC is never taken for MCH.
+    """
+    name = normalize(test_name)
+    for key, value in explanations.items():
+        if normalize(key) == name:
+            return value
+    return None
+
+
+def apply_explanations(test_results, explanations):
+    """Fill each test's explanation from the AI answers, falling back to a basic one"""
+    for test in test_results:
+        explanation = match_explanation(test['test'], explanations)
+        if explanation:
+            test['explanation'] = explanation
         else:
-            print(f"AI API call failed: {response.status_code}")
-            # Fallback to basic explanations
-            for test in test_results:
-                test['explanation'] = generate_basic_explanation(test['test'], test['status'])
-    
-    except Exception as e:
-        print(f"Error getting AI explanations: {str(e)}")
-        # Fallback to basic explanations
-        for test in test_results:
+            # Fallback to basic explanation
             test['explanation'] = generate_basic_explanation(test['test'], test['status'])
-    
+
+    return test_results
+
+
+def get_ai_explanations(test_results, fetch=True):
+    """Get AI-powered explanations for test results.
+
+    Tests already in the explanation memo are filled from it; only the
+    misses go to the LLM (or, with ``fetch=False``, get basic explanations
+    without being memoized).
+    """
+    misses = explanation_memo.fill(test_results)
+    if not misses:
+        return test_results
+    if not fetch:
+        return apply_explanations(misses, {})
+
+    try:
+        with timed('explain_llm'):
+            explanations = fetch_ai_explanations(misses)
+    except Exception as e:
+        logger.warning("Error getting AI explanations: %s", e)
+        explanations = {}
+
+    entries = []
+    for test in misses:
+        explanation = match_explanation(test['test'], explanations)
+        if explanation:
+            entries.append((test, explanation, 'ai'))
+        else:
+            # Fallback to basic explanation, memoized briefly so the LLM is retried soon
+            explanation = generate_basic_explanation(test['test'], test['status'])
+            entries.append((test, explanation, 'basic'))
+            fallbacks.inc(kind='explanation')
+        test['explanation'] = explanation
+    explanation_memo.store(entries)
+
     return test_results
 
+def explain_batch(reports, fetch=True):
+    """Explain the tests of several reports with one memo lookup and LLM call.
+
+    ``reports`` is a list of test lists. Tests sharing a memo key (same
+    test and status) are explained once and the result copied to all.
+    """
+    unique = {}
+    for tests in reports:
+        for test in tests:
+            unique.setdefault(explanation_memo.key(test), dict(test))
+    if unique:
+        get_ai_explanations(list(unique.values()), fetch=fetch)
+    for tests in reports:
+        for test in tests:
+            test['explanation'] = unique[explanation_memo.key(test)]['explanation']
+    return reports
+
 def generate_basic_explanation(test_name, status):
     """Generate basic explanations as fallback"""
     
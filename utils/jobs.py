@@ -0,0 +1,307 @@
+# utils/jobs.py
+"""Background processing of uploads through a SQLite-backed job queue.
+
+The web process stores the upload, enqueues a job and returns its ID right
+away. Jobs are claimed by worker threads, either inside the web process
+(``JOB_WORKERS`` > 0) or in a separate worker started with::
+
+    python -m utils.jobs --workers 4
+
+Job state lives in SQLite, so any gunicorn worker can answer a status
+poll for any job and no external broker is needed. A running job is
+kept alive by a heartbeat. Each claim of a job is numbered, so a worker
+whose job was requeued after going stale cannot overwrite the new run or
+delete its upload. Finished jobs are deleted after ``JOB_RESULT_TTL``.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from utils.cache import file_hash
+from utils.pipeline import get_text, get_tests, start_summary, save_report
+from utils.summarizer import fallback_summary
+
+JOBS_DB_PATH = os.getenv('JOBS_DB_PATH', os.path.join('cache', 'jobs.sqlite3'))
+JOBS_UPLOAD_DIR = os.getenv('JOBS_UPLOAD_DIR', os.path.join('uploads', 'jobs'))
+# Worker threads started inside each web process; 0 means use `python -m utils.jobs`
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+# Running jobs not updated for this long are assumed lost and requeued
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '600'))
+# Seconds finished and failed jobs (and their results) are kept for polling
+JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', '86400'))
+POLL_INTERVAL = 0.5
+# Longest wait after a database error before claiming again
+MAX_BACKOFF = 30.0
+# Seconds between sweeps of expired jobs
+PRUNE_INTERVAL = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """Persistent FIFO of analysis jobs shared by web and worker processes"""
+
+    def __init__(self, path=JOBS_DB_PATH, upload_dir=JOBS_UPLOAD_DIR):
+        self.path = path
+        self.upload_dir = upload_dir
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, stage TEXT NOT NULL,"
+            " filename TEXT NOT NULL, upload_path TEXT NOT NULL,"
+            " result TEXT, error TEXT, created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if 'attempt' not in columns:
+            # Queues created before claims were numbered
+            conn.execute("ALTER TABLE jobs ADD COLUMN attempt INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_updated ON jobs (status, updated)")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def enqueue(self, filename, data):
+        """Store the upload and queue a job for it; returns the job ID"""
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.upload_dir, exist_ok=True)
+        # Keep the extension, which decides between PDF and image OCR
+        upload_path = os.path.join(self.upload_dir, job_id + os.path.splitext(filename)[1].lower())
+        with open(upload_path, 'wb') as fh:
+            fh.write(data)
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO jobs (id, status, stage, filename, upload_path, created, updated)"
+            " VALUES (?, 'queued', 'queued', ?, ?, ?, ?)",
+            (job_id, filename, upload_path, now, now)
+        )
+        return job_id
+
+    def claim(self):
+        """Take the oldest queued job, or return None if there is none.
+
+        The returned job's ``attempt`` identifies this claim; updates made
+        with it are ignored once the job has been claimed again.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', stage = 'queued'"
+                " WHERE status = 'running' AND updated < ?",
+                (now - JOB_STALE_SECONDS,)
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempt = attempt + 1, updated = ? WHERE id = ?",
+                    (now, row['id'])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        job = dict(row)
+        job['attempt'] += 1
+        return job
+
+    def _update(self, job, assignments, params):
+        """Apply an update if this claim still owns the job; returns whether it did"""
+        cursor = self._connect().execute(
+            f"UPDATE jobs SET {assignments}, updated = ? WHERE id = ? AND attempt = ? AND status = 'running'",
+            (*params, time.time(), job['id'], job['attempt'])
+        )
+        return cursor.rowcount == 1
+
+    def heartbeat(self, job):
+        """Mark a running job as alive; False once it was requeued or finished"""
+        return self._update(job, "stage = stage", ())
+
+    def set_stage(self, job, stage):
+        return self._update(job, "stage = ?", (stage,))
+
+    def finish(self, job, result):
+        return self._update(job, "status = 'done', stage = 'done', result = ?", (json.dumps(result),))
+
+    def fail(self, job, error):
+        return self._update(job, "status = 'failed', error = ?", (str(error),))
+
+    def prune(self, ttl=None):
+        """Delete finished and failed jobs older than ttl seconds; returns how many"""
+        ttl = JOB_RESULT_TTL if ttl is None else ttl
+        conn = self._connect()
+        cutoff = time.time() - ttl
+        rows = conn.execute(
+            "SELECT id, upload_path FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+            (cutoff,)
+        ).fetchall()
+        for row in rows:
+            if os.path.exists(row['upload_path']):
+                os.remove(row['upload_path'])
+        conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?", (cutoff,))
+        return len(rows)
+
+    def get(self, job_id):
+        """Return the job as a dict (with a decoded result), or None"""
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+
+job_queue = JobQueue()
+
+
+def process_upload(path, on_stage=lambda stage: None):
+    """Run the full analysis for one stored upload and return a JSON-ready result"""
+    digest = file_hash(path)
+
+    on_stage('ocr')
+    text = get_text(digest, path)
+    if not text or len(text.strip()) < 10:
+        raise ValueError("Could not extract readable text from the document")
+
+    on_stage('tests')
+    summary_future = start_summary(digest, text)
+    tests = get_tests(digest, text)
+
+    on_stage('summary')
+    try:
+        summary = summary_future.result()
+        ai_summary = True
+    except Exception as e:
+        logger.warning("AI summary generation failed: %s", e)
+        summary = fallback_summary(text, e)
+        ai_summary = False
+
+    return {
+        'digest': digest,
+        'report_id': save_report(summary, tests),
+        'tests': tests,
+        'summary': summary,
+        'ai_summary': ai_summary,
+    }
+
+
+def _heartbeat(queue, job, stop):
+    """Keep a running job from going stale until stop is set or the job is lost"""
+    interval = max(JOB_STALE_SECONDS / 4, POLL_INTERVAL)
+    while not stop.wait(interval):
+        try:
+            if not queue.heartbeat(job):
+                return
+        except sqlite3.Error as e:
+            logger.warning("Heartbeat for job %s failed: %s", job['id'], e)
+
+
+def run_job(queue, job):
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(queue, job, stop), name=f"job-heartbeat-{job['id'][:8]}", daemon=True).start()
+    owned = True
+    try:
+        result = process_upload(job['upload_path'], lambda stage: queue.set_stage(job, stage))
+        owned = queue.finish(job, result)
+    except Exception as e:
+        logger.error("Job %s failed: %s", job['id'], e)
+        owned = queue.fail(job, e)
+    finally:
+        stop.set()
+        if not owned:
+            # Requeued while this run was stuck; the new run needs the upload
+            logger.warning("Job %s was reclaimed; discarding this run's outcome", job['id'])
+        elif os.path.exists(job['upload_path']):
+            os.remove(job['upload_path'])
+
+
+def worker_loop(queue, stop_event=None):
+    """Claim and run jobs until stop_event is set.
+
+    Database errors (a locked database, a full disk) are logged and
+    retried with backoff, so they never end the thread.
+    """
+    backoff = POLL_INTERVAL
+    next_prune = 0.0
+    while stop_event is None or not stop_event.is_set():
+        try:
+            if time.monotonic() >= next_prune:
+                queue.prune()
+                next_prune = time.monotonic() + PRUNE_INTERVAL
+            job = queue.claim()
+            if job is not None:
+                run_job(queue, job)
+        except Exception as e:
+            logger.warning("Job worker error, retrying in %.1f s: %s", backoff, e)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+            continue
+        backoff = POLL_INTERVAL
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+
+
+_workers = []
+_workers_pid = None
+_workers_lock = threading.Lock()
+
+
+def ensure_workers(queue=job_queue, count=JOB_WORKERS):
+    """Start the in-process worker threads once per process, replacing any that died"""
+    global _workers, _workers_pid
+    with _workers_lock:
+        if count <= 0:
+            return
+        if _workers_pid != os.getpid():
+            _workers = [None] * count
+            _workers_pid = os.getpid()
+        for i, thread in enumerate(_workers):
+            if thread is None or not thread.is_alive():
+                _workers[i] = threading.Thread(target=worker_loop, args=(queue,), name=f'job-worker-{i}', daemon=True)
+                _workers[i].start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run DiagonWise background job workers")
+    parser.add_argument('--workers', type=int, default=max(JOB_WORKERS, 1), help="number of worker threads")
+    args = parser.parse_args()
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(), format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    threads = [
+        threading.Thread(target=worker_loop, args=(job_queue,), name=f'job-worker-{i}', daemon=True)
+        for i in range(args.workers)
+    ]
+    for thread in threads:
+        thread.start()
+    logger.info("Job workers running: %d (queue: %s)", args.workers, job_queue.path)
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# utils/layout.py
+"""Test rows read from word positions on PDF pages that have a text layer.
+
+``page.get_text()`` flattens a page in content-stream order. When a
+table is drawn column by column, or two tables sit side by side, that
+order separates a test name from its value, and the row scanner in
+utils/extract.py either misses the row or pairs the wrong numbers.
+
+Here the page's words and their bounding boxes are grouped into visual
+lines by vertical position. Each line is split into cells at wide
+horizontal gaps and read left to right. A name cell, a numeric value,
+an optional unit and flags, and a low-high reference range make one
+row, so side-by-side tables give several rows per line. Numbers are
+parsed with ``float()`` rather than matched by the row regex. Names go
+through the same alias index as ``parse_tests``, and both paths build
+rows with ``build_result``, so they return identical dicts.
+"""
+
+import os
+import statistics
+
+from utils.extract import build_result, iter_page_tests
+from utils.templates import parse_number as _number, parse_range as _range
+
+# Set to 0 to parse digital PDFs from their flattened text like scans
+PDF_LAYOUT = os.getenv('PDF_LAYOUT', '1') == '1'
+
+# Words whose vertical centres are within this fraction of a line height
+# of the line's first word belong to that line
+_LINE_TOLERANCE = 0.5
+# A horizontal gap wider than this many line heights starts a new cell
+_CELL_GAP = 1.0
+# Non-numeric tokens allowed between a value (and its unit) and its range
+_MAX_FLAGS = 2
+# Tokens in the name, as in parse_tests' name window
+_MAX_NAME_TOKENS = 8
+# Abnormal-result markers that sit where a unit would
+_FLAGS = {'h', 'l', 'hh', 'll', 'high', 'low', '*', 'ref', 'ref:'}
+
+
+def _is_unit(token):
+    return (
+        len(token) <= 16 and token.lower() not in _FLAGS
+        and _number(token) is None and _range(token) is None
+        and any(c.isalpha() or c in '%µ' for c in token)
+    )
+
+
+def _lines(words):
+    """Group (x0, y0, x1, y1, text, ...) words into visual lines, each left to right"""
+    lines = []
+    anchor = height = None
+    for word in sorted(words, key=lambda w: (w[1] + w[3]) / 2):
+        centre = (word[1] + word[3]) / 2
+        word_height = word[3] - word[1]
+        if lines and abs(centre - anchor) <= _LINE_TOLERANCE * max(height, word_height):
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+            anchor, height = centre, word_height
+    return [sorted(line, key=lambda w: w[0]) for line in lines]
+
+
+def _tokens(line):
+    """(text, cell index) per word, cells split at wide horizontal gaps"""
+    gap = _CELL_GAP * statistics.median(w[3] - w[1] for w in line)
+    cell = 0
+    tokens = [(line[0][4], cell)]
+    for previous, word in zip(line, line[1:]):
+        if word[0] - previous[2] > gap:
+            cell += 1
+        tokens.append((word[4], cell))
+    return tokens
+
+
+def _match_row(tokens, i):
+    """(unit, low, high, end) for a row whose value is tokens[i], or None"""
+    j = i + 1
+    unit = ''
+    if j < len(tokens) and _is_unit(tokens[j][0]):
+        unit = tokens[j][0]
+        j += 1
+    for _ in range(_MAX_FLAGS + 1):
+        # The range may be one token or split around its dash
+        for width in (1, 2, 3):
+            if j + width <= len(tokens):
+                bounds = _range(''.join(text for text, _ in tokens[j:j + width]))
+                if bounds:
+                    return unit, bounds[0], bounds[1], j + width
+        if j < len(tokens) and not any(c.isdigit() for c in tokens[j][0]):
+            j += 1
+        else:
+            break
+    return None
+
+
+def line_rows(line):
+    """Test rows on one visual line of words, left to right"""
+    tokens = _tokens(line)
+    rows = []
+    floor = 0
+    i = 0
+    while i < len(tokens):
+        value = _number(tokens[i][0]) if i > floor else None
+        match = _match_row(tokens, i) if value is not None else None
+        if match is None:
+            i += 1
+            continue
+        # The name is the text of the cell just before the value
+        name_cell = tokens[i - 1][1]
+        name = [text for text, cell in tokens[floor:i] if cell == name_cell][-_MAX_NAME_TOKENS:]
+        unit, low, high, end = match
+        result, _ = build_result(' '.join(name), value, unit, low, high)
+        if result is None:
+            i += 1
+            continue
+        rows.append(result)
+        floor = i = end
+    return rows
+
+
+def page_rows(page, textpage=None):
+    """Test rows of a PyMuPDF page, top to bottom"""
+    words = page.get_text('words', textpage=textpage)
+    rows = []
+    for line in _lines(words):
+        rows.extend(line_rows(line))
+    return rows
+
+
+def iter_document_tests(pages):
+    """Tests of a document from its (text, rows) pages, as each page arrives.
+
+    Layout rows come first. Every page's text is scanned as well, which
+    adds the tests the layout missed and reads OCRed pages, which have
+    no rows. The first occurrence of each test wins, as in parse_tests.
+    """
+    return iter_page_tests(pages)
@@ -0,0 +1,69 @@
+# utils/lazy.py
+"""Deferred imports for the heavy OCR and PDF backends.
+
+``fitz = lazy_import('fitz')`` binds a stand-in that imports the real
+module the first time one of its attributes is used. Importing the app
+then costs nothing for PyMuPDF, Pillow, the tesseract bindings or
+WeasyPrint; a worker that only serves ``/health`` or the upload page
+never loads them. ``load()`` forces the import, which is what the
+preload mode does in the gunicorn master.
+"""
+
+import importlib
+import importlib.util
+import threading
+
+_lock = threading.RLock()
+
+
+class LazyModule:
+    """Module stand-in that imports on first attribute access"""
+
+    def __init__(self, name, on_load=None):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_on_load', on_load)
+        object.__setattr__(self, '_module', None)
+
+    def load(self):
+        """Import the module (once) and return it"""
+        module = self._module
+        if module is None:
+            with _lock:
+                module = self._module
+                if module is None:
+                    module = importlib.import_module(self._name)
+                    if self._on_load is not None:
+                        self._on_load(module)
+                    object.__setattr__(self, '_module', module)
+        return module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self.load(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self.load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name, on_load=None):
+    """A LazyModule for ``name``; ``on_load(module)`` runs once after the import"""
+    return LazyModule(name, on_load)
+
+
+def optional_import(name, on_load=None):
+    """Like lazy_import, but None when the module is not installed"""
+    try:
+        found = importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        found = False
+    return LazyModule(name, on_load) if found else None
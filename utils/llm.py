@@ -0,0 +1,276 @@
+# utils/llm.py
+"""Shared OpenRouter client used by the explanation and summary calls.
+
+A single keep-alive ``requests.Session`` per process pools TLS connections
+across calls, and every call runs under a deadline instead of blocking
+indefinitely. A circuit breaker shared by all call sites fails calls fast
+while the service is down, and a background prober keeps a cached health
+state that also lets the breaker recover early.
+"""
+
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.metrics import llm_errors
+
+# Overridable so load tests can point at a local stand-in
+API_URL = os.getenv('OPENROUTER_API_URL', "https://openrouter.ai/api/v1/chat/completions")
+# Default wall-clock budget for one completion, in seconds
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '30'))
+CONNECT_TIMEOUT = 5
+# Consecutive failures that open the circuit
+AI_BREAKER_FAILURES = int(os.getenv('AI_BREAKER_FAILURES', '3'))
+# Seconds the circuit stays open before letting one trial call through
+AI_BREAKER_RESET = float(os.getenv('AI_BREAKER_RESET', '30'))
+# Seconds between background health probes (0 disables the prober)
+AI_HEALTH_INTERVAL = float(os.getenv('AI_HEALTH_INTERVAL', '60'))
+# Model the health probe calls; defaults to the primary summary model
+HEALTH_MODEL = os.getenv('LLM_HEALTH_MODEL') or os.getenv(
+    'LLM_SUMMARY_MODELS', 'mistralai/mixtral-8x7b-instruct'
+).split(',')[0].strip()
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+class LLMError(Exception):
+    """Raised when a completion fails, times out or returns no content"""
+
+
+class CircuitOpenError(LLMError):
+    """Raised without calling the API while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open trial -> closed"""
+
+    def __init__(self, failure_threshold=AI_BREAKER_FAILURES, reset_timeout=AI_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may go ahead"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if now - self.opened_at >= self.reset_timeout:
+                # Let one trial call through per reset period
+                self.state = 'half-open'
+                self.opened_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half-open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {'state': self.state, 'failures': self.failures}
+
+
+breaker = CircuitBreaker()
+
+
+def get_session():
+    """Return this process's pooled session, creating it after any fork"""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+            _session_pid = os.getpid()
+    return _session
+
+
+def _headers():
+    return {
+        "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
+        "Content-Type": "application/json"
+    }
+
+
+def _remaining(timeout, deadline):
+    if deadline is not None:
+        timeout = min(timeout, deadline - time.monotonic())
+        if timeout <= 0:
+            raise LLMError("Deadline exceeded before AI call")
+    return timeout
+
+
+def _post(model, prompt, max_tokens, temperature, timeout, stream=False):
+    payload = {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": max_tokens,
+        "temperature": temperature
+    }
+    if stream:
+        payload["stream"] = True
+
+    try:
+        response = get_session().post(
+            API_URL,
+            headers=_headers(),
+            json=payload,
+            timeout=(min(CONNECT_TIMEOUT, timeout), timeout),
+            stream=stream
+        )
+    except requests.RequestException as e:
+        raise LLMError(f"AI API request failed: {e}") from e
+
+    if response.status_code != 200:
+        response.close()
+        raise LLMError(f"AI API call failed: {response.status_code}")
+    return response
+
+
+def _complete(model, prompt, max_tokens, temperature, timeout):
+    response = _post(model, prompt, max_tokens, temperature, timeout)
+    try:
+        return response.json()["choices"][0]["message"]["content"]
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        raise LLMError(f"Malformed AI response: {e}") from e
+
+
+def chat_completion(model, prompt, max_tokens, temperature=0.3, timeout=LLM_TIMEOUT, deadline=None):
+    """Run one chat completion and return the message content.
+
+    ``deadline`` is an absolute ``time.monotonic()`` value; when given, the
+    call gets whatever time is left before it (capped at ``timeout``).
+    Raises CircuitOpenError immediately while the breaker is open.
+    """
+    timeout = _remaining(timeout, deadline)
+    if not breaker.allow():
+        llm_errors.inc(reason='circuit_open')
+        raise CircuitOpenError("AI service unavailable (circuit open)")
+    try:
+        content = _complete(model, prompt, max_tokens, temperature, timeout)
+    except LLMError:
+        llm_errors.inc(reason='failed')
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return content
+
+
+def stream_chat_completion(model, prompt, max_tokens, temperature=0.3, timeout=LLM_TIMEOUT, deadline=None):
+    """Run a streaming chat completion, yielding content deltas as they arrive.
+
+    ``timeout`` bounds the whole stream, not just the wait between chunks.
+    """
+    timeout = _remaining(timeout, deadline)
+    if not breaker.allow():
+        llm_errors.inc(reason='circuit_open')
+        raise CircuitOpenError("AI service unavailable (circuit open)")
+    stream_deadline = time.monotonic() + timeout
+    try:
+        response = _post(model, prompt, max_tokens, temperature, timeout, stream=True)
+    except LLMError:
+        llm_errors.inc(reason='failed')
+        breaker.record_failure()
+        raise
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            if time.monotonic() > stream_deadline:
+                raise LLMError("AI stream exceeded its deadline")
+            # Skip keep-alive comments and blank separators
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+            try:
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                raise LLMError(f"Malformed AI stream chunk: {e}") from e
+            if delta:
+                yield delta
+    except requests.RequestException as e:
+        llm_errors.inc(reason='stream_failed')
+        breaker.record_failure()
+        raise LLMError(f"AI stream failed: {e}") from e
+    except LLMError:
+        llm_errors.inc(reason='stream_failed')
+        breaker.record_failure()
+        raise
+    finally:
+        response.close()
+    breaker.record_success()
+
+
+class HealthProber:
+    """Cached AI health state, refreshed by a background thread every interval"""
+
+    def __init__(self, interval=AI_HEALTH_INTERVAL):
+        self.interval = interval
+        self.ok = None
+        self.error = None
+        self.checked_at = None
+        self._thread_pid = None
+        self._lock = threading.Lock()
+
+    def probe(self):
+        """Run one minimal completion, bypassing the breaker but feeding it the result"""
+        try:
+            if not os.getenv('OPENROUTER_API_KEY'):
+                raise LLMError("OPENROUTER_API_KEY not set in environment")
+            _complete(HEALTH_MODEL, "auth check", max_tokens=1, temperature=0, timeout=5)
+        except LLMError as e:
+            breaker.record_failure()
+            self.ok, self.error = False, str(e)
+        else:
+            # A healthy probe closes an open circuit without waiting for a trial call
+            breaker.record_success()
+            self.ok, self.error = True, None
+        self.checked_at = time.time()
+        return self.ok
+
+    def is_stale(self):
+        return self.checked_at is None or time.time() - self.checked_at > max(self.interval, 5) * 2
+
+    def _run(self):
+        while True:
+            self.probe()
+            time.sleep(self.interval)
+
+    def start(self):
+        """Start the background probe thread once per process"""
+        with self._lock:
+            if self.interval <= 0 or self._thread_pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name='ai-health-prober', daemon=True).start()
+            self._thread_pid = os.getpid()
+
+    def snapshot(self):
+        return {
+            'ok': self.ok,
+            'error': self.error,
+            'checked_at': self.checked_at,
+            'circuit': breaker.snapshot()['state']
+        }
+
+
+ai_health = HealthProber()
@@ -0,0 +1,211 @@
+# utils/metrics.py
+"""Stage timings and event counters in Prometheus text format.
+
+Code wraps each analysis stage in ``timed('ocr')``. That records the
+duration in a per-stage histogram and, during a web request, in the
+request's timing list, which app.py turns into a ``Server-Timing``
+header. Work interleaved with a stage, such as parsing pages while a
+document is still being OCRed, is wrapped in ``timed_part('extract')``
+and recorded under its own stage. Metrics are kept per process, so with several gunicorn workers
+each scrape sees the worker that answered it; aggregate by instance in
+Prometheus as usual.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds; OCR and LLM calls need the long tail
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Timings of the current web request, or None outside one
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+# Seconds per stage of the timed_part blocks inside the current timed block
+_parts = contextvars.ContextVar('stage_parts', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, '') for name in self.labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(self, name, help_text, labels=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def count(self, **labels):
+        series = self._series.get(tuple(labels.get(name, '') for name in self.labels))
+        return series['count'] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, dict(series, counts=list(series['counts']))) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series['counts']):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(self.labels + ('le',), key + (le,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {series['sum']}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+stage_seconds = Histogram(
+    'diagonwise_stage_seconds', "Time spent in each analysis stage", ['stage']
+)
+cache_lookups = Counter(
+    'diagonwise_cache_lookups_total', "Cache lookups by cache, stage and result", ['cache', 'stage', 'result']
+)
+fallbacks = Counter(
+    'diagonwise_fallbacks_total', "Basic output served because the AI result was unavailable", ['kind']
+)
+llm_errors = Counter(
+    'diagonwise_llm_errors_total', "Failed AI calls by reason", ['reason']
+)
+llm_seconds = Histogram(
+    'diagonwise_llm_seconds', "Latency of successful AI calls by task and model", ['task', 'model']
+)
+llm_hedges = Counter(
+    'diagonwise_llm_hedges_total', "AI calls raced against a second model after a slow first answer", ['task']
+)
+
+REGISTRY = [stage_seconds, cache_lookups, fallbacks, llm_errors, llm_seconds, llm_hedges]
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def record(stage, seconds):
+    """Record a stage duration in the histogram and the current request's timings"""
+    stage_seconds.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage):
+    """Time the enclosed block as one run of ``stage``.
+
+    Time spent in ``timed_part`` blocks of other stages inside it is
+    taken out, and recorded as one run of each of those stages.
+    """
+    parts = {}
+    token = _parts.set(parts)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        _parts.reset(token)
+        for part, part_seconds in parts.items():
+            if part != stage:
+                seconds -= part_seconds
+                record(part, part_seconds)
+        record(stage, seconds)
+
+
+@contextmanager
+def timed_part(stage):
+    """Time the enclosed block as part of ``stage`` within the enclosing ``timed`` block.
+
+    Outside a ``timed`` block it is a run of its own.
+    """
+    parts = _parts.get()
+    if parts is None:
+        with timed(stage):
+            yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        parts[stage] = parts.get(stage, 0.0) + time.perf_counter() - start
+
+
+def start_request():
+    """Begin collecting stage timings for the current request"""
+    timings = []
+    _request_timings.set(timings)
+    return timings
+
+
+def end_request():
+    _request_timings.set(None)
+
+
+def server_timing(timings, total=None):
+    """Format timings as a Server-Timing header value (durations in ms)"""
+    totals = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(parts)
+
+
+def submit_with_context(pool, fn, *args):
+    """Submit to a thread pool so stage timings still reach the submitting request"""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
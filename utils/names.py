@@ -0,0 +1,190 @@
+# utils/names.py
+"""Test-name resolution that tolerates OCR typos.
+
+Aliases match on whole tokens, so a short alias such as "hb", "tg" or
+"alt" never matches inside another word. Tokens that are not alias
+tokens themselves and are long enough (``MIN_FUZZY_LENGTH``) are also
+looked up among the alias tokens within a small Levenshtein distance:
+one edit up to 7 characters, two beyond. Candidates come from a
+letter-pair index and only those are checked with the edit distance. "Hemog1obin" and
+"Creatlnine" then still resolve. Short tokens are only matched exactly,
+because at two or three letters one edit reaches half the dictionary.
+
+Beyond one edit, ``MAX_EDIT_RATIO`` also applies per token, measured
+against the shorter of the token and the alias token. Dropping letters
+from a long alias mostly gives another word ("creatine" for
+"creatinine"), so those count against the word that is left. Known
+neighbours that still pass, such as "eosinophilia", are given as
+``near_misses`` and never matched with edits.
+
+Among the aliases found in a name, the one ending closest to the end
+wins, then the one with the most tokens, then the fewest edits. A fuzzy
+match must also stay under ``MAX_EDIT_RATIO`` edits per alias character.
+"""
+
+import os
+import re
+
+FUZZY_NAMES = os.getenv('FUZZY_NAMES', '1') == '1'
+# Shortest token that may be matched with edits
+MIN_FUZZY_LENGTH = 5
+# Most edits per character of the matched alias
+MAX_EDIT_RATIO = 0.2
+# Tokens of a name that are considered, counted back from its end
+MAX_NAME_TOKENS = 8
+
+_TOKEN_RE = re.compile(r'\w+')
+_TERMINAL = ''
+# Entries in each lookup memo; report vocabularies are small
+_CACHE_SIZE = 4096
+
+
+def max_edits(token):
+    """Edits allowed when matching a token of this length"""
+    if len(token) < MIN_FUZZY_LENGTH:
+        return 0
+    return 1 if len(token) <= 7 else 2
+
+
+def levenshtein(a, b, limit):
+    """Edit distance between a and b, or limit + 1 once it is known to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+def _bigrams(word):
+    padded = f'^{word}$'
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+class GramIndex:
+    """Words indexed by their letter pairs, for lookups within a bounded edit distance.
+
+    One edit changes at most two of a word's (padded) letter pairs, so a
+    word within ``limit`` edits shares at least ``pairs - 2 * limit`` of
+    them with the query. Only words passing that count are checked with
+    ``levenshtein``.
+    """
+
+    def __init__(self, words=()):
+        self.pairs = {}
+        self.sizes = {}
+        for word in words:
+            grams = _bigrams(word)
+            self.sizes[word] = len(grams)
+            for gram in grams:
+                self.pairs.setdefault(gram, []).append(word)
+
+    def search(self, word, limit):
+        """[(distance, word)] within limit, closest first"""
+        grams = _bigrams(word)
+        if len(grams) <= 2 * limit:
+            # Too short for the pair count to rule anything out
+            shared = dict.fromkeys(self.sizes, len(grams))
+        else:
+            shared = {}
+            for gram in grams:
+                for candidate in self.pairs.get(gram, ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+        found = []
+        for candidate, count in shared.items():
+            if count >= max(len(grams), self.sizes[candidate]) - 2 * limit:
+                distance = levenshtein(word, candidate, limit)
+                if distance <= limit:
+                    found.append((distance, candidate))
+        return sorted(found)
+
+
+class NameIndex:
+    """Maps free-text test names to standard names via a token trie of aliases"""
+
+    def __init__(self, aliases, fuzzy=FUZZY_NAMES, near_misses=()):
+        """``aliases`` maps each standard name to the aliases it appears under.
+
+        ``near_misses`` are words close to an alias that name something
+        else; they only match an alias spelled exactly like them.
+        """
+        self.fuzzy = fuzzy
+        self.near_misses = frozenset(word.lower() for word in near_misses)
+        self.trie = {}
+        vocabulary = set()
+        for standard_name, variations in aliases.items():
+            for variation in variations:
+                node = self.trie
+                for token in _TOKEN_RE.findall(variation.lower()):
+                    node = node.setdefault(token, {})
+                    vocabulary.add(token)
+                node.setdefault(_TERMINAL, (standard_name, len(variation)))
+        self.vocabulary = frozenset(vocabulary)
+        self.grams = GramIndex(sorted(t for t in vocabulary if len(t) >= MIN_FUZZY_LENGTH))
+        # Bounded memos of fuzzy token lookups and of whole names
+        self._tokens = {}
+        self._names = {}
+
+    def candidates(self, token):
+        """Alias tokens a name token may stand for, as [(edits, alias token)]"""
+        if token in self.vocabulary:
+            return [(0, token)]
+        limit = max_edits(token) if self.fuzzy else 0
+        if not limit or token in self.near_misses:
+            return []
+        found = self._tokens.get(token)
+        if found is None:
+            if len(self._tokens) >= _CACHE_SIZE:
+                self._tokens.clear()
+            found = self._tokens[token] = [
+                (edits, alias_token) for edits, alias_token in self.grams.search(token, limit)
+                if edits <= 1 or edits <= MAX_EDIT_RATIO * min(len(token), len(alias_token))
+            ]
+        return found
+
+    def find(self, name):
+        """(standard name, offset where the alias starts in name, edits), or (None, None, None)"""
+        # Report rows repeat the same names, so most lookups are cache hits
+        found = self._names.get(name)
+        if found is None:
+            if len(self._names) >= _CACHE_SIZE:
+                self._names.clear()
+            found = self._names[name] = self._find(name)
+        return found
+
+    def _find(self, name):
+        tokens = list(_TOKEN_RE.finditer(name.lower()))[-MAX_NAME_TOKENS:]
+        options = [self.candidates(token.group()) for token in tokens]
+        best_key = None
+        best = (None, None, None)
+        for start in range(len(tokens)):
+            # Walk the trie along every combination of candidate tokens;
+            # usually each token has at most one, so this is a single path
+            frontier = [(self.trie, 0)]
+            for pos in range(start, len(tokens)):
+                advanced = []
+                for node, edits in frontier:
+                    for cost, alias_token in options[pos]:
+                        child = node.get(alias_token)
+                        if child is None:
+                            continue
+                        total = edits + cost
+                        terminal = child.get(_TERMINAL)
+                        if terminal and total <= MAX_EDIT_RATIO * terminal[1]:
+                            key = (pos + 1, pos + 1 - start, -total)
+                            if best_key is None or key > best_key:
+                                best_key, best = key, (terminal[0], tokens[start].start(), total)
+                        advanced.append((child, total))
+                if not advanced:
+                    break
+                frontier = advanced
+        return best
+
+    def lookup(self, name):
+        """Standard name for a raw test name, or None"""
+        return self.find(name)[0]
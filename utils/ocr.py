@@ -1,19 +1,305 @@
-import fitz  # PyMuPDF
-from PIL import Image
-import pytesseract
-
-# Configure tesseract path for pytesseract
-pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'
-
-def extract_text_from_pdf(path):
-    doc = fitz.open(path)
-    text = "\n".join([page.get_text() for page in doc])
-    return text
-
-def extract_text_from_image(path):
-    image = Image.open(path)
-    # Resize if too large to speed up OCR
-    max_size = (2000, 2000)
-    if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
-    return pytesseract.image_to_string(image, timeout=60)
+import glob
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.extract import lab_rows
+from utils.layout import page_rows
+from utils.lazy import lazy_import, optional_import
+from utils.metrics import timed_part
+from utils.preprocess import preprocess_image, warm_up as preprocess_warm_up
+
+
+def _configure_pytesseract(module):
+    # Configure tesseract path for pytesseract
+    module.pytesseract.tesseract_cmd = '/usr/bin/tesseract'
+
+
+# Imported on first use (or by warm_up), so a worker that never OCRs
+# never loads them
+fitz = lazy_import('fitz')  # PyMuPDF
+Image = lazy_import('PIL.Image')
+pytesseract = lazy_import('pytesseract', on_load=_configure_pytesseract)
+# Optional: binds libtesseract directly, so needs its headers to build
+tesserocr = optional_import('tesserocr')
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('auto', 'tesserocr', 'pytesseract')
+# 'tesserocr' keeps a loaded engine per thread and OCR process; 'pytesseract'
+# starts the tesseract CLI for every page; 'auto' prefers tesserocr if installed
+OCR_BACKEND = os.getenv('OCR_BACKEND', 'auto')
+
+# Resolution scanned PDF pages are rendered at before OCR
+OCR_DPI = int(os.getenv('OCR_DPI', '300'))
+# Upper bound on OCR worker processes per web worker
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', str(os.cpu_count() or 1)))
+# How OCR processes are started: 'forkserver' or 'spawn'. A plain fork of a
+# web worker copies the locks its other threads hold, and can deadlock.
+OCR_START_METHOD = os.getenv('OCR_START_METHOD', 'forkserver')
+# Pages with fewer extractable characters than this are treated as scans
+MIN_TEXT_LAYER_CHARS = 25
+# Tesseract page segmentation mode; 6 reads the page as one uniform block,
+# which keeps table rows on one line
+OCR_PSM = int(os.getenv('OCR_PSM', '6'))
+# Restrict recognition to characters that occur in lab reports
+OCR_WHITELIST = os.getenv('OCR_WHITELIST', '1') == '1'
+LAB_CHARACTERS = (
+    'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789'
+    '.,:;-+/()[]%<>=^*#&' "'" 'µ'
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+# Loaded tesserocr engines, one per thread (the API is not thread-safe)
+_engines = threading.local()
+# Set when a tesserocr engine failed to start, so later pages skip it
+_tesserocr_broken = False
+
+
+def _init_ocr_worker():
+    # One tesseract thread per process; the pool provides the parallelism
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+
+def _mp_context():
+    method = OCR_START_METHOD if OCR_START_METHOD in multiprocessing.get_all_start_methods() else 'spawn'
+    context = multiprocessing.get_context(method)
+    if method == 'forkserver':
+        # Workers fork from a server that has imported the OCR code once
+        context.set_forkserver_preload([__name__])
+    return context
+
+
+def _get_pool():
+    """Create the OCR process pool on first use (after any gunicorn fork)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=_mp_context(),
+                                        initializer=_init_ocr_worker)
+        return _pool
+
+
+def _discard_pool(pool):
+    """Drop a broken pool, so the next page starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def has_text_layer(text):
+    """Return True if a page's extracted text is usable without OCR"""
+    return len(text.strip()) >= MIN_TEXT_LAYER_CHARS
+
+
+def tesseract_config(psm=OCR_PSM, whitelist=OCR_WHITELIST):
+    """Tesseract flags tuned for tabular lab data"""
+    config = f'--psm {psm} -c preserve_interword_spaces=1'
+    if whitelist:
+        config += f' -c tessedit_char_whitelist="{LAB_CHARACTERS}"'
+    return config
+
+
+def resolve_backend(backend=None):
+    """The backend that will actually run: tesserocr or pytesseract"""
+    backend = backend or OCR_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown OCR backend: {backend}")
+    if backend == 'pytesseract' or tesserocr is None or _tesserocr_broken:
+        if backend == 'tesserocr' and tesserocr is None:
+            logger.warning("OCR_BACKEND=tesserocr but tesserocr is not installed; using pytesseract")
+        return 'pytesseract'
+    return 'tesserocr'
+
+
+def _tesserocr_engine():
+    """This thread's engine, loading the language model on first use"""
+    api = getattr(_engines, 'api', None)
+    if api is None:
+        api = tesserocr.PyTessBaseAPI(psm=OCR_PSM)
+        api.SetVariable('preserve_interword_spaces', '1')
+        if OCR_WHITELIST:
+            api.SetVariable('tessedit_char_whitelist', LAB_CHARACTERS)
+        _engines.api = api
+    return api
+
+
+def ocr_image(image, backend=None):
+    """OCR a PIL image in memory with the configured backend"""
+    global _tesserocr_broken
+    if resolve_backend(backend) == 'tesserocr':
+        try:
+            api = _tesserocr_engine()
+        except RuntimeError as e:
+            # Typically missing tessdata for the build tesserocr links against
+            logger.warning("tesserocr engine failed to start (%s); using pytesseract", e)
+            _tesserocr_broken = True
+        else:
+            api.SetImage(image)
+            return api.GetUTF8Text()
+    return pytesseract.image_to_string(image, config=tesseract_config(), timeout=60)
+
+
+def _ocr_page(width, height, samples):
+    """OCR one rendered grayscale page; runs inside a pool worker"""
+    return ocr_image(Image.frombytes('L', (width, height), samples))
+
+
+def _render_page(page, dpi):
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    return pix.width, pix.height, pix.samples
+
+
+def _submit(page, dpi):
+    """(future, pool) OCRing a page on the pool, replacing the pool if it is broken"""
+    args = _render_page(page, dpi)
+    pool = _get_pool()
+    try:
+        return pool.submit(_ocr_page, *args), pool
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        pool = _get_pool()
+        return pool.submit(_ocr_page, *args), pool
+
+
+def _done(text):
+    return isinstance(text, str) or text.done()
+
+
+def _result(doc, page_number, text, pool, dpi):
+    """A page's text, OCRing it again if its pool broke.
+
+    A pool breaks when one of its processes dies (killed, or out of
+    memory), failing every page in flight on it. The page is retried
+    once on a fresh pool, then OCRed in this process.
+    """
+    if isinstance(text, str):
+        return text
+    try:
+        return text.result()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+    logger.warning("OCR process pool broke; retrying page %d", page_number + 1)
+    future, pool = _submit(doc[page_number], dpi)
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        _discard_pool(pool)
+    logger.warning("OCR process pool broke again; reading page %d inline", page_number + 1)
+    return _ocr_page(*_render_page(doc[page_number], dpi))
+
+
+def iter_pdf_pages(source, dpi=OCR_DPI, layout=False, max_pages=None):
+    """Yield (text, rows) for each page of a PDF (a path or bytes), in page order.
+
+    Pages with a text layer are read directly. Scanned pages are rendered
+    at ``dpi`` and OCRed on a bounded process pool, with at most
+    ``2 * OCR_WORKERS`` pages in flight, so memory stays bounded by page
+    size however long the document is. Pages lost to a broken pool are
+    OCRed again (see ``_result``). With ``layout``, ``rows`` holds the
+    test rows of a text-layer page: read by its lab template when its
+    header and page size match one (see utils/templates.py), otherwise
+    from its word positions (see utils/layout.py). It is None for OCRed
+    pages, and for every page without ``layout``. Reading stops after ``max_pages`` pages, or
+    when the caller stops iterating.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        doc = fitz.open(stream=source, filetype='pdf')
+    else:
+        doc = fitz.open(source)
+    page_count = doc.page_count
+    if max_pages and page_count > max_pages:
+        logger.warning("Reading the first %d of %d pages (page budget)", max_pages, page_count)
+        page_count = max_pages
+    # Not worth a pool round trip for one page, or the caller parallelizes across files
+    inline = page_count == 1 or OCR_WORKERS <= 1
+    window = 2 * OCR_WORKERS
+    # (page number, text or OCR future, its pool, rows) per page, oldest first
+    pending = deque()
+    try:
+        for page_number in range(page_count):
+            page = doc[page_number]
+            # Parse the page's text once for both the plain text and the word boxes
+            textpage = page.get_textpage() if layout else None
+            text = page.get_text(textpage=textpage)
+            if has_text_layer(text):
+                rows = None
+                if layout:
+                    with timed_part('extract'):
+                        # Known lab layouts skip the word boxes entirely
+                        rows = lab_rows(text, (page.rect.width, page.rect.height)) or page_rows(page, textpage)
+                pending.append((page_number, text, None, rows))
+            elif inline:
+                pending.append((page_number, _ocr_page(*_render_page(page, dpi)), None, None))
+            else:
+                pending.append((page_number, *_submit(page, dpi), None))
+            # Hand pages on as soon as they are done, and wait once the window is full
+            while pending and (len(pending) > window or _done(pending[0][1])):
+                page_number, text, pool, rows = pending.popleft()
+                yield _result(doc, page_number, text, pool, dpi), rows
+        while pending:
+            page_number, text, pool, rows = pending.popleft()
+            yield _result(doc, page_number, text, pool, dpi), rows
+    finally:
+        for _, text, _, _ in pending:
+            if not isinstance(text, str):
+                # Pages not started yet are dropped when the caller stops early
+                text.cancel()
+        doc.close()
+
+
+def read_pdf(source, dpi=OCR_DPI, layout=False):
+    """Per-page (texts, rows) of a whole PDF; see iter_pdf_pages"""
+    texts, rows = [], []
+    for text, found in iter_pdf_pages(source, dpi, layout):
+        texts.append(text)
+        rows.append(found)
+    return texts, rows
+
+
+def extract_text_from_pdf(source, dpi=OCR_DPI):
+    """Extract text from a PDF (a path or bytes), OCRing only the pages without a text layer"""
+    return "\n".join(text for text, _ in iter_pdf_pages(source, dpi))
+
+
+def extract_text_from_image(source, steps=None):
+    """OCR an image given as a path or bytes, after the OCR_PREPROCESS clean-up steps"""
+    image = Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+    return ocr_image(preprocess_image(image, steps))
+
+
+def _tessdata_files(language='eng'):
+    """Candidate paths of the tesseract language model"""
+    roots = [os.getenv('TESSDATA_PREFIX', '')]
+    roots += glob.glob('/usr/share/tesseract-ocr/*/tessdata') + ['/usr/share/tessdata', '/usr/local/share/tessdata']
+    return [os.path.join(root, f'{language}.traineddata') for root in roots if root]
+
+
+def warm_up():
+    """Import the OCR backends and read the language model into the page cache.
+
+    No tesseract engine is created: engines start OpenMP threads, which
+    do not survive a fork, so each OCR process still builds its own, but
+    from a file already in memory.
+    """
+    for module in (fitz, Image, pytesseract, tesserocr):
+        if module is not None:
+            module.load()
+    preprocess_warm_up()
+    for path in _tessdata_files():
+        try:
+            with open(path, 'rb') as fh:
+                while fh.read(1 << 20):
+                    pass
+        except OSError:
+            continue
+        return path
+    return None
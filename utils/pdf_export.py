@@ -1,27 +1,88 @@
-from weasyprint import HTML
-import tempfile
-import os
+import html
+import threading
+
+from utils.lazy import lazy_import
+
+# WeasyPrint pulls in Pango, Cairo and fontconfig; load it on the first
+# export (or in warm_up) rather than at import
+weasyprint = lazy_import('weasyprint')
+fonts = lazy_import('weasyprint.text.fonts')
+
+REPORT_CSS = """
+body { font-family: 'Arial', sans-serif; font-size: 12px; padding: 20px; }
+h3 { color: #1f4e79; }
+span[style*='color: red'] { color: red; font-weight: bold; }
+ul { margin-bottom: 20px; }
+"""
+
+_font_config = None
+_stylesheet = None
+_setup_lock = threading.Lock()
+
+
+def _get_styles():
+    """Build the font configuration and stylesheet once per process"""
+    global _font_config, _stylesheet
+    with _setup_lock:
+        if _stylesheet is None:
+            _font_config = fonts.FontConfiguration()
+            _stylesheet = weasyprint.CSS(string=REPORT_CSS, font_config=_font_config)
+    return _font_config, _stylesheet
+
+
+def build_report_html(summary_html, tests):
+    """HTML body of the downloadable report: AI summary plus the test table"""
+    rows = "".join(
+        f"<tr><td>{html.escape(str(test.get('test', '')))}</td>"
+        f"<td>{html.escape(str(test.get('value', '')))} {html.escape(str(test.get('unit', '')))}</td>"
+        f"<td>{html.escape(str(test.get('ref_range', '')))}</td>"
+        f"<td>{html.escape(str(test.get('status', '')))}</td>"
+        f"<td>{html.escape(str(test.get('explanation', '')))}</td></tr>"
+        for test in tests
+    )
+    table = f"""
+    <h2>Structured Test Results</h2>
+    <table border="1" style="border-collapse: collapse; width: 100%;">
+        <tr>
+            <th>Test</th>
+            <th>Value</th>
+            <th>Reference Range</th>
+            <th>Status</th>
+            <th>Explanation</th>
+        </tr>
+        {rows}
+    </table>
+    """ if tests else ''
+
+    return f"""
+    <h1>Medical Report Analysis</h1>
+
+    <h2>AI Analysis Summary</h2>
+    {summary_html}
+
+    {table}
+
+    <p><small>Generated by Medical Report Analyzer - For informational purposes only. Consult healthcare provider for medical advice.</small></p>
+    """
+
 
 def generate_pdf_from_html(html_content):
-    # Wrap the content in a full HTML document
+    """Render report HTML to PDF bytes in memory"""
+    font_config, stylesheet = _get_styles()
     full_html = f"""
     <!DOCTYPE html>
     <html>
     <head>
         <meta charset="utf-8">
-        <style>
-            body {{ font-family: 'Arial', sans-serif; font-size: 12px; padding: 20px; }}
-            h3 {{ color: #1f4e79; }}
-            span[style*='color: red'] {{ color: red; font-weight: bold; }}
-            ul {{ margin-bottom: 20px; }}
-        </style>
     </head>
     <body>
         {html_content}
     </body>
     </html>
     """
+    return weasyprint.HTML(string=full_html).write_pdf(stylesheets=[stylesheet], font_config=font_config)
+
 
-    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    HTML(string=full_html).write_pdf(tmp_file.name)
-    return tmp_file.name
+def warm_up():
+    """Load WeasyPrint and its fonts now by rendering a tiny document"""
+    generate_pdf_from_html("<p>warm-up</p>")
@@ -0,0 +1,172 @@
+# utils/pipeline.py
+"""Report analysis stages, each backed by the content-addressed cache.
+
+Stages are keyed by the upload's SHA-256, so a repeat upload skips OCR
+and the summary LLM call; test explanations come from the explanation
+memo. Only successful AI summaries are cached; fallbacks are recomputed
+on the next upload. The summary call runs on a small
+thread pool so it overlaps with test parsing and the explanation call.
+A finished analysis is stored under a report ID so its PDF can be
+downloaded without posting the analysis back.
+"""
+
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.cache import analysis_cache, content_hash
+from utils.metrics import timed, submit_with_context
+from utils.ocr import iter_pdf_pages, extract_text_from_image
+from utils.extract import parse_tests, get_ai_explanations
+from utils.layout import PDF_LAYOUT, iter_document_tests
+from utils.summarizer import request_summary, stream_summary as stream_ai_summary
+
+# Threads for LLM calls that run alongside the request thread
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '8'))
+
+# Reading budgets per document: pages past PDF_MAX_PAGES are not read, and
+# reading stops before the text kept passes TEXT_MAX_CHARS; 0 disables either
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', '500'))
+TEXT_MAX_CHARS = int(os.getenv('TEXT_MAX_CHARS', '2000000'))
+
+logger = logging.getLogger(__name__)
+
+_llm_pool = ThreadPoolExecutor(max_workers=LLM_CONCURRENCY, thread_name_prefix='llm')
+
+
+def _budgeted(pages, kept, max_chars):
+    """Pass (text, rows) pages on, keeping their text, until the character budget is spent"""
+    chars = 0
+    for page_number, (text, rows) in enumerate(pages):
+        chars += len(text)
+        if max_chars and chars > max_chars:
+            logger.warning("Stopped reading at page %d: text budget of %d characters reached",
+                           page_number + 1, max_chars)
+            return
+        kept.append(text)
+        yield text, rows
+
+
+def extract_document(source, filename=None):
+    """Extract (text, tests) from an uploaded PDF or image, given as a path or as bytes.
+
+    ``filename`` decides the file type for in-memory uploads; without it,
+    bytes are sniffed for the PDF signature. PDFs are read page by page:
+    tests are parsed (or taken from the page layout) as each page
+    arrives, and reading stops at the PDF_MAX_PAGES and TEXT_MAX_CHARS
+    budgets. ``tests`` are unexplained, as parse_tests returns them, and
+    None for images, whose text is parsed afterwards.
+    """
+    name = filename or (source if isinstance(source, str) else '')
+    if name.lower().endswith('.pdf') or (not name and bytes(source[:5]) == b'%PDF-'):
+        texts = []
+        pages = iter_pdf_pages(source, layout=PDF_LAYOUT, max_pages=PDF_MAX_PAGES)
+        tests = list(iter_document_tests(_budgeted(pages, texts, TEXT_MAX_CHARS)))
+        # Stopping early closes the document and cancels pending OCR
+        pages.close()
+        return "\n".join(texts), tests
+    return extract_text_from_image(source), None
+
+
+def extract_text(source, filename=None):
+    """Extract text from an uploaded PDF or image, given as a path or as bytes"""
+    return extract_document(source, filename)[0]
+
+
+def get_text(digest, source, filename=None):
+    text = analysis_cache.get(digest, 'text')
+    if text is None:
+        # Pages are parsed as they are read; that share is recorded as 'extract'
+        with timed('ocr'):
+            text, tests = extract_document(source, filename)
+        analysis_cache.set(digest, 'text', text)
+        if tests is not None:
+            # Parsed while reading the pages; get_parsed_tests finds them here
+            analysis_cache.set(digest, 'tests', tests)
+    return text
+
+
+def get_parsed_tests(digest, text):
+    """Structured tests without explanations"""
+    tests = analysis_cache.get(digest, 'tests')
+    if tests is None:
+        with timed('extract'):
+            tests = parse_tests(text)
+        analysis_cache.set(digest, 'tests', tests)
+    return tests
+
+
+def get_tests(digest, text, fetch=True):
+    """Structured tests with explanations from the explanation memo or the LLM.
+
+    With ``fetch=False`` the LLM is not called and tests missing from the
+    memo carry basic explanations instead.
+    """
+    tests = get_parsed_tests(digest, text)
+    if not tests:
+        return tests
+    return get_ai_explanations(tests, fetch=fetch)
+
+
+def get_summary(digest, text):
+    """AI summary for the text; raises if the AI call fails so it is not cached"""
+    summary = analysis_cache.get(digest, 'summary')
+    if summary is None:
+        # The tests found while reading the pages, not a second parse of the text
+        tests = get_parsed_tests(digest, text)
+        with timed('summary_llm'):
+            summary = request_summary(text, tests)
+        analysis_cache.set(digest, 'summary', summary)
+    return summary
+
+
+def start_summary(digest, text):
+    """Start get_summary in the background and return its future"""
+    return submit_with_context(_llm_pool, get_summary, digest, text)
+
+
+def start_tests(digest, text):
+    """Start get_tests in the background and return its future"""
+    return submit_with_context(_llm_pool, get_tests, digest, text)
+
+
+def stream_summary(digest, text):
+    """Yield the AI summary in chunks, caching it once the stream completes.
+
+    A cached summary is yielded as a single chunk. Raises if the AI call
+    fails or produces too little, in which case nothing is cached.
+    """
+    summary = analysis_cache.get(digest, 'summary')
+    if summary is not None:
+        yield summary
+        return
+
+    tests = get_parsed_tests(digest, text)
+    chunks = []
+    with timed('summary_llm'):
+        for chunk in stream_ai_summary(text, tests):
+            chunks.append(chunk)
+            yield chunk
+    summary = ''.join(chunks).strip()
+    if len(summary) < 50:
+        raise Exception("AI response too short or empty")
+    analysis_cache.set(digest, 'summary', summary)
+
+
+def save_report(summary, tests):
+    """Store a finished analysis and return its report ID.
+
+    The ID is a hash of the report itself, so identical analyses share
+    one entry and one rendered PDF.
+    """
+    report = {'summary': summary, 'tests': tests}
+    report_id = content_hash(json.dumps(report, sort_keys=True).encode('utf-8'))
+    if analysis_cache.get(report_id, 'report') is None:
+        analysis_cache.set(report_id, 'report', report)
+    return report_id
+
+
+def get_report(report_id):
+    """Return the stored {summary, tests} for a report ID, or None if expired"""
+    return analysis_cache.get(report_id, 'report')
@@ -0,0 +1,231 @@
+# utils/preprocess.py
+"""Image clean-up before OCR for photos and scans of lab reports.
+
+Steps run in a fixed order, and each one can be switched off through
+``OCR_PREPROCESS``:
+
+- ``grayscale``: drop colour
+- ``binarize``: adaptive threshold against the local mean, which copes
+  with the uneven lighting of phone photos
+- ``deskew``: rotate by the angle that makes text rows sharpest
+- ``crop``: trim empty borders
+- ``rescale``: scale so text lines come out at ``OCR_TEXT_HEIGHT``
+  pixels, instead of capping the image at a fixed size
+
+Rescaling runs last so it can measure the cleaned-up page, but when it is
+going to shrink the image (large phone photos usually are) the shrinking
+is done right after ``grayscale`` instead, from a cheap estimate on a small
+copy, so binarize and deskew do not work on millions of pixels that are
+thrown away afterwards.
+
+Everything uses Pillow's C operations, with no per-pixel Python loops.
+Each step is timed as ``ocr_<step>`` in the stage metrics.
+"""
+
+import os
+import statistics
+
+from utils.lazy import lazy_import
+from utils.metrics import timed
+
+Image = lazy_import('PIL.Image')
+ImageChops = lazy_import('PIL.ImageChops')
+ImageFilter = lazy_import('PIL.ImageFilter')
+ImageOps = lazy_import('PIL.ImageOps')
+ImageStat = lazy_import('PIL.ImageStat')
+
+STEPS = ('grayscale', 'binarize', 'deskew', 'crop', 'rescale')
+
+# Comma-separated steps to run; empty to only apply the legacy size cap
+OCR_PREPROCESS = [
+    step.strip() for step in os.getenv('OCR_PREPROCESS', ','.join(STEPS)).split(',') if step.strip()
+]
+# Height in pixels of a text line's ink that tesseract reads best
+# (roughly 10 pt text scanned at 300 DPI)
+OCR_TEXT_HEIGHT = int(os.getenv('OCR_TEXT_HEIGHT', '24'))
+
+# Legacy fixed cap, used when rescaling is switched off
+MAX_SIZE = (2000, 2000)
+# Local window for adaptive thresholding, and how much darker than the
+# local mean a pixel must be to count as ink
+_BINARIZE_RADIUS = 15
+_BINARIZE_OFFSET = 12
+# Skew search range and final resolution, in degrees
+_MAX_SKEW = 5.0
+_SKEW_STEP = 0.25
+# Width the skew search and text-height estimate work at
+_ANALYSIS_WIDTH = 800
+_CROP_MARGIN = 10
+# Rows of the analysis copy a text line may dip below the threshold for
+_MAX_LINE_GAP = 2
+_MIN_SCALE, _MAX_SCALE = 0.3, 3.0
+# Upscaling never grows an image past this many pixels
+_MAX_PIXELS = 12_000_000
+
+
+def grayscale(image):
+    return ImageOps.exif_transpose(image).convert('L')
+
+
+def binarize(image):
+    """Ink is any pixel darker than its neighbourhood mean by the offset"""
+    image = image.convert('L')
+    local_mean = image.filter(ImageFilter.BoxBlur(_BINARIZE_RADIUS))
+    darkness = ImageChops.subtract(local_mean, image)
+    # The median filter removes isolated specks left by sensor noise
+    return darkness.point(lambda v: 0 if v > _BINARIZE_OFFSET else 255).filter(ImageFilter.MedianFilter(3))
+
+
+def _analysis_copy(image):
+    """Small inverted (ink = white) copy for cheap measurements"""
+    image = image.convert('L')
+    if image.width > _ANALYSIS_WIDTH:
+        size = (_ANALYSIS_WIDTH, max(1, image.height * _ANALYSIS_WIDTH // image.width))
+        image = image.resize(size, Image.Resampling.BOX)
+    return ImageOps.invert(image)
+
+
+def _row_profile(inverted):
+    """Mean ink per pixel row"""
+    return list(inverted.resize((1, inverted.height), Image.Resampling.BOX).getdata())
+
+
+def _skew_score(small, angle):
+    rotated = small.rotate(angle, resample=Image.Resampling.NEAREST, fillcolor=0)
+    # Aligned text gives alternating full and empty rows: high variance
+    return ImageStat.Stat(rotated.resize((1, rotated.height), Image.Resampling.BOX)).var[0]
+
+
+def estimate_skew(image):
+    """Angle (degrees) to rotate by so text rows are horizontal"""
+    small = _analysis_copy(image)
+    # Coarse pass in whole degrees, then refine around the best one
+    coarse = max(range(-int(_MAX_SKEW), int(_MAX_SKEW) + 1), key=lambda a: (_skew_score(small, a), -abs(a)))
+    fine = [coarse + i * _SKEW_STEP for i in range(-3, 4)]
+    return max(fine, key=lambda a: (_skew_score(small, a), -abs(a)))
+
+
+def deskew(image):
+    angle = estimate_skew(image)
+    if not angle:
+        return image
+    fill = 255 if image.mode in ('L', '1') else (255,) * len(image.getbands())
+    return image.rotate(angle, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=fill)
+
+
+def crop(image):
+    """Trim white borders, keeping a small margin"""
+    box = ImageOps.invert(image.convert('L')).point(lambda v: 255 if v > 64 else 0).getbbox()
+    if not box:
+        return image
+    left, top, right, bottom = box
+    return image.crop((
+        max(0, left - _CROP_MARGIN), max(0, top - _CROP_MARGIN),
+        min(image.width, right + _CROP_MARGIN), min(image.height, bottom + _CROP_MARGIN)
+    ))
+
+
+def estimate_text_height(image, angle=0):
+    """Median height in pixels of the runs of inked rows (text lines), or None
+
+    ``angle`` straightens the measuring copy first, for pages not yet deskewed.
+    """
+    small = _analysis_copy(image)
+    scale = image.width / small.width
+    if angle:
+        small = small.rotate(angle, resample=Image.Resampling.NEAREST, fillcolor=0)
+    profile = _row_profile(small)
+    if not profile:
+        return None
+    # Most rows are background, noisy or not; a row is text when it rises
+    # clearly above that floor. Short lines carry little ink per row, so
+    # the bar is low, scaled by a high percentile rather than the max so
+    # one rule line or smudge does not dominate.
+    ordered = sorted(profile)
+    floor = ordered[len(ordered) // 4]
+    threshold = floor + (ordered[len(ordered) * 98 // 100] - floor) * 0.1
+    runs = []
+    run = gap = 0
+    for value in profile:
+        if value > threshold:
+            # A dip of a row or two inside a line (between x-height and
+            # descenders) does not end it
+            run += gap + 1
+            gap = 0
+        elif run:
+            gap += 1
+            if gap > _MAX_LINE_GAP:
+                runs.append(run)
+                run = gap = 0
+    if run:
+        runs.append(run)
+    if not runs:
+        return None
+    # Noise can still poke a few rows above the threshold; real lines are
+    # all of a similar height, so drop runs far shorter than the tall ones
+    tall = sorted(runs)[len(runs) * 9 // 10]
+    runs = [r for r in runs if r >= max(2, tall * 0.4)]
+    return statistics.median(runs) * scale
+
+
+def _scale_factor(image, angle=0):
+    """How much to scale by for OCR_TEXT_HEIGHT lines, or None to leave it"""
+    height = estimate_text_height(image, angle)
+    if not height:
+        return None
+    factor = min(max(OCR_TEXT_HEIGHT / height, _MIN_SCALE), _MAX_SCALE)
+    factor = min(factor, max(1.0, (_MAX_PIXELS / (image.width * image.height)) ** 0.5))
+    if 0.8 < factor < 1.25:
+        # Close enough; resampling would cost more than it gains
+        return None
+    return factor
+
+
+def _resize(image, factor):
+    size = (max(1, round(image.width * factor)), max(1, round(image.height * factor)))
+    return image.resize(size, Image.Resampling.LANCZOS)
+
+
+def rescale(image):
+    factor = _scale_factor(image)
+    return _resize(image, factor) if factor else image
+
+
+def downscale(image):
+    """The shrinking half of rescale, for an image not yet deskewed"""
+    factor = _scale_factor(image, estimate_skew(image))
+    return _resize(image, factor) if factor and factor < 1 else image
+
+
+_STEP_FUNCTIONS = {
+    'grayscale': grayscale,
+    'binarize': binarize,
+    'deskew': deskew,
+    'crop': crop,
+    'rescale': rescale,
+}
+
+
+def preprocess_image(image, steps=None):
+    """Run the enabled steps in order and return the image to OCR"""
+    steps = OCR_PREPROCESS if steps is None else steps
+    unknown = set(steps) - set(STEPS)
+    if unknown:
+        raise ValueError(f"Unknown OCR preprocessing steps: {', '.join(sorted(unknown))}")
+    for step in STEPS:
+        if step in steps:
+            with timed(f'ocr_{step}'):
+                image = _STEP_FUNCTIONS[step](image)
+        if step == 'grayscale' and 'rescale' in steps and {'binarize', 'deskew'} & set(steps):
+            with timed('ocr_downscale'):
+                image = downscale(image)
+    if 'rescale' not in steps and (image.width > MAX_SIZE[0] or image.height > MAX_SIZE[1]):
+        image = image.copy()
+        image.thumbnail(MAX_SIZE, Image.Resampling.LANCZOS)
+    return image
+
+
+def warm_up():
+    """Import the Pillow modules the steps use"""
+    for module in (Image, ImageChops, ImageFilter, ImageOps, ImageStat):
+        module.load()
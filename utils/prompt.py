@@ -0,0 +1,140 @@
+# utils/prompt.py
+"""Token-budgeted content for the summary prompt.
+
+Report text is cleaned before it reaches the LLM: boilerplate lines
+(page numbers, disclaimers, headers and footers repeated on every page)
+are dropped, and test rows already found by the extractor are replaced
+by one compact line each. The rows block gets at most
+``SUMMARY_ROWS_TOKENS`` of the budget: out-of-range results come first,
+and the in-range ones that do not fit are only counted. Whatever
+narrative remains is split into chunks when it does not fit the rest of
+the budget.
+"""
+
+import os
+import re
+from collections import Counter
+
+from utils.extract import collapse_whitespace, iter_test_rows, parse_tests
+
+# Approximate tokens allowed for the document content in one prompt
+SUMMARY_TOKEN_BUDGET = int(os.getenv('SUMMARY_TOKEN_BUDGET', '6000'))
+# Approximate tokens of that budget the structured rows may take
+SUMMARY_ROWS_TOKENS = int(os.getenv('SUMMARY_ROWS_TOKENS', str(SUMMARY_TOKEN_BUDGET // 2)))
+# Approximate tokens per chunk when a long document is map-reduced
+SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', '3000'))
+# Chunks beyond this are dropped, bounding cost for any document length
+SUMMARY_MAX_CHUNKS = int(os.getenv('SUMMARY_MAX_CHUNKS', '8'))
+
+# Roughly four characters per token for English clinical text
+CHARS_PER_TOKEN = 4
+
+# Dates and times as printed in report headers and footers
+_DATE = r'(?:\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|\d{4}-\d{2}-\d{2}|\d{1,2}[ -][A-Za-z]{3,9}[ ,-]+\d{2,4})'
+_TIME = r'\d{1,2}:\d{2}(?::\d{2})?\s*(?:[AaPp]\.?[Mm]\.?)?'
+# Matched against whole lines; footers such as "Printed on" only with a date tail,
+# so clinical lines that mention reporting are kept
+_BOILERPLATE_RE = re.compile(
+    r'^\s*(?:'
+    r'page\s*\d+(?:\s*(?:of|/)\s*\d+)?'
+    r'|-+\s*end of report\s*-+|end of report'
+    r'|this is (?:a|an) (?:computer|electronically) generated report.*'
+    r'|.*\bdisclaimer\b.*'
+    r'|(?:report\s+)?(?:printed|reported|generated)\s+on\s*[:\-]?\s*' + _DATE + r'(?:\s*,?\s*(?:at\s+)?' + _TIME + r')?'
+    r'|.*\b(?:not valid for medico[- ]legal|for medico[- ]legal)\b.*'
+    r'|(?:www\.|https?://)\S+'
+    r'|(?:tel|phone|fax|email)\s*[:.].*'
+    r')\s*$',
+    re.IGNORECASE
+)
+# Lines at least this long that repeat this often are page headers/footers
+_REPEATED_LINE_CHARS = 20
+_REPEATED_LINE_COUNT = 3
+_SENTENCE_END_RE = re.compile(r'[.!?]\s')
+
+
+def estimate_tokens(text):
+    """Cheap token estimate; good enough to enforce a budget"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def strip_boilerplate(text):
+    """Drop page numbers, disclaimers and lines repeated on every page"""
+    lines = [line.strip() for line in text.splitlines()]
+    counts = Counter(line for line in lines if len(line) >= _REPEATED_LINE_CHARS)
+    kept = [
+        line for line in lines
+        if line
+        and not _BOILERPLATE_RE.match(line)
+        and counts.get(line, 0) < _REPEATED_LINE_COUNT
+    ]
+    return '\n'.join(kept)
+
+
+def _format_row(test):
+    return f"- {test['test']}: {test['value']} {test['unit']} (reference {test['ref_range']}) - {test['status']}".replace('  ', ' ')
+
+
+def format_rows(tests, max_tokens=None):
+    """One compact line per structured test result, within max_tokens.
+
+    Over budget, out-of-range results are kept before in-range ones, in
+    report order, and a last line counts the results left out.
+    """
+    if max_tokens is None:
+        return '\n'.join(_format_row(t) for t in tests)
+    ranked = sorted(range(len(tests)), key=lambda i: tests[i]['status'] == 'Normal')
+    limit = max_tokens * CHARS_PER_TOKEN
+    kept = set()
+    used = 0
+    for i in ranked:
+        size = len(_format_row(tests[i])) + 1
+        if used + size > limit:
+            break
+        kept.add(i)
+        used += size
+    lines = [_format_row(t) for i, t in enumerate(tests) if i in kept]
+    dropped = [t for i, t in enumerate(tests) if i not in kept]
+    if dropped:
+        normal = sum(t['status'] == 'Normal' for t in dropped)
+        lines.append(f"- {len(dropped)} more results not listed ({normal} within their reference range)")
+    return '\n'.join(lines)
+
+
+def prepare_content(text, tests=None, rows_tokens=SUMMARY_ROWS_TOKENS):
+    """Split report text into (structured rows block, remaining narrative).
+
+    ``tests`` are the report's already extracted tests; the text is only
+    parsed again when they are not given.
+    """
+    collapsed = collapse_whitespace(strip_boilerplate(text))
+
+    pieces = []
+    pos = 0
+    for _, start, end in iter_test_rows(collapsed):
+        pieces.append(collapsed[pos:start])
+        pos = end
+    pieces.append(collapsed[pos:])
+    narrative = collapse_whitespace(' '.join(pieces)).strip()
+
+    if tests is None:
+        tests = parse_tests(collapsed)
+    rows = format_rows(tests, rows_tokens)
+    return rows, narrative
+
+
+def split_chunks(text, chunk_tokens=SUMMARY_CHUNK_TOKENS, max_chunks=SUMMARY_MAX_CHUNKS):
+    """Split text into at most max_chunks pieces, preferring sentence breaks"""
+    limit = chunk_tokens * CHARS_PER_TOKEN
+    chunks = []
+    pos = 0
+    while pos < len(text) and len(chunks) < max_chunks:
+        end = min(pos + limit, len(text))
+        if end < len(text):
+            # Back up to the last sentence end in the second half of the chunk
+            breaks = [m.end() for m in _SENTENCE_END_RE.finditer(text, pos + limit // 2, end)]
+            if breaks:
+                end = breaks[-1]
+        chunks.append(text[pos:end].strip())
+        pos = end
+    return [chunk for chunk in chunks if chunk]
@@ -0,0 +1,171 @@
+# utils/results.py
+"""Optional store of extracted test results, for trends over time.
+
+Off unless ``RESULT_STORE=1``. Each analysis is recorded under a profile
+with the date the sample was taken, and one row per test. A profile is
+identified by a random key issued by ``new_profile``, never by a name
+the caller chooses. The key is the only credential for its history, so
+it is unguessable, and the app only records under and reads from keys
+that ``has_profile`` knows. The rows table is clustered on
+(profile, test, taken), so a trend for one test is a single range scan
+no matter how many rows other profiles and tests have. Recording the
+same upload for the same profile twice is a no-op. Test names match
+case-insensitively.
+"""
+
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+
+RESULT_STORE = os.getenv('RESULT_STORE', '0') == '1'
+RESULT_STORE_PATH = os.getenv('RESULT_STORE_PATH', os.path.join('cache', 'results.sqlite3'))
+
+# Profile keys: 24 random bytes, URL-safe base64
+_PROFILE_KEY_BYTES = 24
+PROFILE_KEY_RE = re.compile(r'^[A-Za-z0-9_-]{32}$')
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ResultStore:
+    """SQLite-backed result history; safe to share between threads and processes"""
+
+    def __init__(self, path=RESULT_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS profiles (key TEXT PRIMARY KEY, created REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            " id INTEGER PRIMARY KEY, profile TEXT NOT NULL, digest TEXT NOT NULL,"
+            " source TEXT, taken REAL NOT NULL, created REAL NOT NULL,"
+            " UNIQUE (profile, digest))"
+        )
+        # WITHOUT ROWID stores rows in primary key order, so the rows of
+        # one (profile, test) sit together sorted by time
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " profile TEXT NOT NULL, test TEXT NOT NULL COLLATE NOCASE, taken REAL NOT NULL,"
+            " analysis_id INTEGER NOT NULL, value REAL, unit TEXT, ref_low REAL, ref_high REAL,"
+            " status TEXT, PRIMARY KEY (profile, test, taken, analysis_id)) WITHOUT ROWID"
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def new_profile(self):
+        """Issue a new profile key"""
+        key = secrets.token_urlsafe(_PROFILE_KEY_BYTES)
+        self._connect().execute("INSERT INTO profiles (key, created) VALUES (?, ?)", (key, time.time()))
+        return key
+
+    def has_profile(self, key):
+        """Whether key is a well-formed profile key that was issued"""
+        if not key or not PROFILE_KEY_RE.match(key):
+            return False
+        row = self._connect().execute("SELECT 1 FROM profiles WHERE key = ?", (key,)).fetchone()
+        return row is not None
+
+    def record_many(self, entries):
+        """Store analyses given as (profile, digest, tests, taken, source) in one transaction.
+
+        ``taken`` is a Unix timestamp, or None for now. Returns how many
+        analyses were new; repeats of a (profile, digest) pair are skipped.
+        """
+        now = time.time()
+        conn = self._connect()
+        added = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for profile, digest, tests, taken, source in entries:
+                taken = now if taken is None else taken
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO analyses (profile, digest, source, taken, created)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (profile, digest, source, taken, now)
+                )
+                if not cursor.rowcount:
+                    continue
+                analysis_id = cursor.lastrowid
+                conn.executemany(
+                    "INSERT OR REPLACE INTO results"
+                    " (profile, test, taken, analysis_id, value, unit, ref_low, ref_high, status)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (profile, test['test'], taken, analysis_id, _number(test.get('value')),
+                         test.get('unit'), _number(test.get('ref_low')), _number(test.get('ref_high')),
+                         test.get('status'))
+                        for test in tests
+                    ]
+                )
+                added += 1
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def record(self, profile, digest, tests, taken=None, source=None):
+        """Store one analysis; returns True if it was new"""
+        return self.record_many([(profile, digest, tests, taken, source)]) == 1
+
+    def tests(self, profile):
+        """Tests recorded for a profile, with how many results each and the latest time"""
+        rows = self._connect().execute(
+            "SELECT test, COUNT(*), MAX(taken) FROM results WHERE profile = ? GROUP BY test ORDER BY test",
+            (profile,)
+        ).fetchall()
+        return [{'test': test, 'count': count, 'latest': latest} for test, count, latest in rows]
+
+    def trend(self, profile, test, since=None, until=None, limit=None):
+        """Results of one test for a profile, oldest first, optionally bounded by time.
+
+        With ``limit``, the most recent ``limit`` results are returned
+        (still oldest first).
+        """
+        query = (
+            "SELECT taken, value, unit, ref_low, ref_high, status FROM results"
+            " WHERE profile = ? AND test = ? AND taken >= ? AND taken <= ?"
+            " ORDER BY taken DESC"
+        )
+        params = [profile, test, since if since is not None else float('-inf'),
+                  until if until is not None else float('inf')]
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        rows = self._connect().execute(query, params).fetchall()
+        rows.reverse()
+        return [
+            {'taken': taken, 'value': value, 'unit': unit, 'ref_low': low, 'ref_high': high, 'status': status}
+            for taken, value, unit, low, high, status in rows
+        ]
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM results")
+        conn.execute("DELETE FROM analyses")
+        conn.execute("DELETE FROM profiles")
+
+
+result_store = ResultStore() if RESULT_STORE else None
@@ -0,0 +1,255 @@
+# utils/router.py
+"""Per-task model choice, hedged requests and deadlines for LLM calls.
+
+Each task ("summary", "explanation") has a tier: an ordered list of
+models (best first) and a time budget. The router keeps a rolling window
+of latencies and errors per (task, model). A call goes to the first
+model that is healthy and whose p95 fits the time left. If it has not
+answered by its p95, the same prompt is sent to the next model and the
+first good answer wins. A call that fails quickly fails over straight
+away.
+
+Every call gets a deadline: the task budget, tightened by the deadline
+of the surrounding request when one is set (``start_deadline``). The
+deadline is a context variable, so it follows work submitted with
+``submit_with_context``.
+
+The losing call of a hedge cannot be interrupted mid-request. Its result
+is discarded, and it ends at the same deadline, so it never holds a
+thread longer than the request it served.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils.llm import LLM_TIMEOUT, CircuitOpenError, LLMError, chat_completion, stream_chat_completion
+from utils.metrics import llm_hedges, llm_seconds, submit_with_context
+
+
+def _models(name, default):
+    return [m.strip() for m in os.getenv(name, default).split(',') if m.strip()]
+
+
+# Ordered model lists (primary first, then hedge/fallback models) and the
+# wall-clock budget in seconds for one call of each task
+TIERS = {
+    'summary': {
+        'models': _models('LLM_SUMMARY_MODELS', 'mistralai/mixtral-8x7b-instruct,mistralai/mistral-7b-instruct'),
+        'budget': float(os.getenv('LLM_SUMMARY_BUDGET', str(LLM_TIMEOUT))),
+    },
+    'explanation': {
+        'models': _models('LLM_EXPLANATION_MODELS', 'anthropic/claude-3-sonnet,anthropic/claude-3-haiku'),
+        'budget': float(os.getenv('LLM_EXPLANATION_BUDGET', str(LLM_TIMEOUT))),
+    },
+}
+# Set to 0 to disable hedging (fast failover to the next model still applies)
+LLM_HEDGE = os.getenv('LLM_HEDGE', '1') == '1'
+# Hedge delay in seconds until a model has enough samples for a p95
+LLM_HEDGE_AFTER = float(os.getenv('LLM_HEDGE_AFTER', '8'))
+# Calls remembered per (task, model), and how many are needed before the
+# window's p95 and error rate are trusted
+STATS_WINDOW = 200
+MIN_SAMPLES = 20
+# Error rate above which a model is skipped while others are healthy
+MAX_ERROR_RATE = 0.5
+
+# Absolute time.monotonic() deadline of the current request, or None
+_deadline = contextvars.ContextVar('llm_deadline', default=None)
+
+
+def start_deadline(seconds):
+    """Bound every LLM call made for the current request (and work it submits)"""
+    _deadline.set(time.monotonic() + seconds)
+
+
+def end_deadline():
+    _deadline.set(None)
+
+
+class ModelStats:
+    """Rolling latency and error window for one model on one task"""
+
+    def __init__(self, window=STATS_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(seconds)
+
+    def p95(self):
+        """95th percentile latency of recent successes, or None with too few samples"""
+        with self._lock:
+            if len(self.latencies) < MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def error_rate(self):
+        with self._lock:
+            if len(self.outcomes) < MIN_SAMPLES:
+                return 0.0
+            return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def snapshot(self):
+        p95 = self.p95()
+        return {
+            'calls': len(self.outcomes),
+            'p95_s': round(p95, 3) if p95 is not None else None,
+            'error_rate': round(self.error_rate(), 3),
+        }
+
+
+class ModelRouter:
+    """Routes each task's calls across its tier of models"""
+
+    def __init__(self, tiers=TIERS, hedge=LLM_HEDGE, hedge_after=LLM_HEDGE_AFTER, max_workers=16):
+        self.tiers = tiers
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-route')
+
+    def stats(self, task, model):
+        with self._lock:
+            stats = self._stats.get((task, model))
+            if stats is None:
+                stats = self._stats[(task, model)] = ModelStats()
+            return stats
+
+    def deadline(self, task):
+        """Absolute deadline for a call: the task budget, capped by the request deadline"""
+        deadline = time.monotonic() + self.tiers[task]['budget']
+        request_deadline = _deadline.get()
+        return min(deadline, request_deadline) if request_deadline is not None else deadline
+
+    def candidates(self, task, deadline):
+        """The tier's models in the order to try them.
+
+        Models that are erroring, or whose p95 would overrun the deadline,
+        move behind the rest; the configured quality order is kept otherwise.
+        """
+        remaining = deadline - time.monotonic()
+
+        def demoted(model):
+            stats = self.stats(task, model)
+            p95 = stats.p95()
+            return stats.error_rate() > MAX_ERROR_RATE or (p95 is not None and p95 > remaining)
+
+        return sorted(self.tiers[task]['models'], key=demoted)
+
+    def hedge_delay(self, task, model):
+        p95 = self.stats(task, model).p95()
+        return p95 if p95 is not None else self.hedge_after
+
+    def _call(self, task, model, prompt, max_tokens, temperature, deadline):
+        start = time.monotonic()
+        try:
+            content = chat_completion(model, prompt, max_tokens, temperature, deadline=deadline)
+        except CircuitOpenError:
+            # The service as a whole is down; says nothing about this model
+            raise
+        except LLMError:
+            self.stats(task, model).record(time.monotonic() - start, ok=False)
+            raise
+        seconds = time.monotonic() - start
+        self.stats(task, model).record(seconds, ok=True)
+        llm_seconds.observe(seconds, task=task, model=model)
+        return content
+
+    def complete(self, task, prompt, max_tokens, temperature=0.3):
+        """Chat completion for a task, hedged across its tier; raises LLMError if all fail"""
+        deadline = self.deadline(task)
+        models = self.candidates(task, deadline)
+        if len(models) == 1:
+            return self._call(task, models[0], prompt, max_tokens, temperature, deadline)
+
+        queue = deque(models)
+        running = {}
+        error = None
+
+        def launch():
+            model = queue.popleft()
+            running[submit_with_context(
+                self._pool, self._call, task, model, prompt, max_tokens, temperature, deadline
+            )] = model
+
+        launch()
+        hedge_at = time.monotonic() + self.hedge_delay(task, models[0])
+        while running:
+            if self.hedge and queue and len(running) == 1:
+                timeout = max(0.0, min(hedge_at, deadline) - time.monotonic())
+            else:
+                timeout = max(0.0, deadline - time.monotonic())
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if time.monotonic() >= deadline:
+                    break
+                # The call is slower than its usual p95: race the next model
+                llm_hedges.inc(task=task)
+                launch()
+                continue
+            for future in done:
+                running.pop(future)
+                try:
+                    content = future.result()
+                except CircuitOpenError as e:
+                    # The breaker is shared by every model, so fail over to none of them; a call
+                    # already running (the half-open trial) may still answer
+                    error = e
+                    queue.clear()
+                    continue
+                except LLMError as e:
+                    error = e
+                    continue
+                for loser in running:
+                    loser.cancel()
+                return content
+            if not running and queue:
+                # Fast failure: fail over without waiting for a hedge delay
+                launch()
+        for loser in running:
+            loser.cancel()
+        raise error or LLMError(f"No model answered the {task} request before its deadline")
+
+    def stream(self, task, prompt, max_tokens, temperature=0.3):
+        """Streaming completion from the first candidate model; streams are not hedged"""
+        deadline = self.deadline(task)
+        model = self.candidates(task, deadline)[0]
+        start = time.monotonic()
+        try:
+            yield from stream_chat_completion(model, prompt, max_tokens, temperature, deadline=deadline)
+        except CircuitOpenError:
+            raise
+        except LLMError:
+            self.stats(task, model).record(time.monotonic() - start, ok=False)
+            raise
+        seconds = time.monotonic() - start
+        self.stats(task, model).record(seconds, ok=True)
+        llm_seconds.observe(seconds, task=task, model=model)
+
+    def snapshot(self):
+        """Per task and model: calls in the window, p95 and error rate"""
+        return {
+            task: {model: self.stats(task, model).snapshot() for model in tier['models']}
+            for task, tier in self.tiers.items()
+        }
+
+
+router = ModelRouter()
+
+
+def routed_completion(task, prompt, max_tokens, temperature=0.3):
+    return router.complete(task, prompt, max_tokens, temperature)
+
+
+def routed_stream(task, prompt, max_tokens, temperature=0.3):
+    return router.stream(task, prompt, max_tokens, temperature)
@@ -0,0 +1,64 @@
+# utils/startup.py
+"""Worker startup: lazy by default, optionally preloaded before forking.
+
+By default importing the app loads none of the heavy backends. PyMuPDF,
+Pillow and the tesseract bindings load on the first OCR, and WeasyPrint
+on the first PDF export. A worker is ready as soon as Flask is imported,
+and a worker that only serves ``/health`` never pays for the rest.
+
+With ``PRELOAD=1`` (see gunicorn.conf.py) the app is imported once in
+the gunicorn master, and ``preload()`` loads everything before the
+workers fork. That covers the backends, the WeasyPrint fonts and
+stylesheet, the tesseract language model file, and the compiled regexes
+and alias index of the parser. Workers then start by fork alone and
+share those pages copy-on-write. A restarted worker is ready at once.
+"""
+
+import logging
+import os
+import time
+
+from utils import ocr, pdf_export
+from utils.extract import parse_tests
+
+PRELOAD = os.getenv('PRELOAD', '0') == '1'
+
+logger = logging.getLogger(__name__)
+
+# Parsed once so the regexes compiled on first use are cached before the fork
+_SAMPLE_REPORT = "Hemoglobin 13.5 g/dL 12.0 - 15.5\nGlucose (Fasting) 92 mg/dL 70-99\n"
+
+
+def _warm_parsers():
+    parse_tests(_SAMPLE_REPORT)
+
+
+STEPS = (
+    ('ocr', ocr.warm_up),
+    ('pdf_export', pdf_export.warm_up),
+    ('parsers', _warm_parsers),
+)
+
+
+def preload():
+    """Load every backend now; returns seconds per step, None for steps that failed.
+
+    A backend that cannot load is logged and left to fail on first use,
+    as it would without preloading.
+    """
+    timings = {}
+    for name, step in STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+        except (ImportError, OSError) as e:
+            logger.warning("Preloading %s failed: %s", name, e)
+            timings[name] = None
+            continue
+        timings[name] = time.perf_counter() - start
+    logger.info(
+        "Preloaded backends in %.0f ms (%s)",
+        sum(t for t in timings.values() if t) * 1000,
+        ", ".join(f"{name} {'failed' if t is None else f'{t * 1000:.0f} ms'}" for name, t in timings.items())
+    )
+    return timings
@@ -0,0 +1,167 @@
+# utils/templates.py
+"""Registry of known lab report layouts, read by column instead of by regex.
+
+Most reports come from a few labs whose layouts never change. Each one
+can be registered as a ``LabTemplate``. A template holds header words
+that identify the lab and, optionally, the page size its PDFs are
+printed on. It also declares the row columns in order, for example::
+
+    registry.register(LabTemplate(
+        'northside_pathology', header='NORTHSIDE PATHOLOGY SERVICES',
+        columns=('name', 'value', 'unit', 'range', 'flag'), separator='|'))
+
+The columns are compiled once into positions. A line is a row when
+splitting it gives exactly that many fields, its literal columns match,
+and its numbers parse. Lines are split from the right on whitespace, so
+the name may contain spaces, or on ``separator``. Matching a page costs
+one set comparison on the words of its first lines. The generic row
+scanner in utils/extract.py still reads every page after its template,
+and adds the rows the template did not read.
+
+Supported columns are ``name`` (always first), ``value``, ``unit``,
+``low`` and ``high``, ``range`` for a "low-high" field, and ``flag`` for
+an ignored field. Any other string is a literal that must appear as is.
+
+The registry ships empty. Only register a layout checked against real
+reports from that lab, with one as its golden sample in tests/golden.
+"""
+
+import math
+import os
+
+# Set to 0 to parse every report with the generic row scanner
+LAB_TEMPLATES = os.getenv('LAB_TEMPLATES', '1') == '1'
+
+# The fingerprint is taken from this many of a page's first lines
+_HEADER_LINES = 5
+# Page sizes, in points, within this distance count as equal
+_SIZE_TOLERANCE = 2.0
+_DASHES = '-–—'
+_BRACKETS = '()[]:'
+_FIELDS = {'name', 'value', 'unit', 'low', 'high', 'range', 'flag'}
+
+
+def parse_number(token):
+    """The token as a positive-looking decimal, or None"""
+    if not token[:1].isdigit():
+        return None
+    try:
+        value = float(token)
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+
+def parse_range(token):
+    """(low, high) from a token such as '12.0-15.5' or '(70–99)', or None"""
+    token = token.strip(_BRACKETS)
+    for i in range(1, len(token)):
+        if token[i] in _DASHES:
+            low, high = parse_number(token[:i]), parse_number(token[i + 1:])
+            return (low, high) if low is not None and high is not None else None
+    return None
+
+
+def fingerprint(text):
+    """Upper-cased words of a page's first lines"""
+    lines = text.lstrip().split('\n', _HEADER_LINES)[:_HEADER_LINES]
+    return frozenset(' '.join(lines).upper().split())
+
+
+class LabTemplate:
+    """One lab's report layout: how to recognise its pages and read their rows"""
+
+    def __init__(self, name, header, columns, separator=None, page_size=None):
+        if not columns or columns[0] != 'name':
+            raise ValueError(f"template {name!r}: the first column must be 'name'")
+        fields = set(columns) & _FIELDS
+        if 'value' not in fields or not ({'low', 'high'} <= fields or 'range' in fields):
+            raise ValueError(f"template {name!r}: columns need a value and a range")
+        self.name = name
+        self.header = frozenset(header.upper().split())
+        self.columns = tuple(columns)
+        self.separator = separator
+        self.page_size = page_size
+        # Compiled column positions
+        self._width = len(columns)
+        self._index = {column: i for i, column in enumerate(columns) if column in _FIELDS}
+        self._literals = [(i, column) for i, column in enumerate(columns) if column not in _FIELDS]
+
+    def __repr__(self):
+        return f"LabTemplate({self.name!r})"
+
+    def matches(self, words, page_size=None):
+        """Whether a page with these fingerprint words (and size, if known) is in this layout"""
+        if not self.header <= words:
+            return False
+        if page_size is None or self.page_size is None:
+            return True
+        return all(abs(a - b) <= _SIZE_TOLERANCE for a, b in zip(page_size, self.page_size))
+
+    def _split(self, line):
+        if self.separator is None:
+            return line.rsplit(None, self._width - 1)
+        return [part.strip() for part in line.split(self.separator)]
+
+    def read_row(self, line):
+        """(name, value, unit, low, high) for a row line, or None"""
+        parts = self._split(line)
+        if len(parts) != self._width:
+            return None
+        for i, literal in self._literals:
+            if parts[i] != literal:
+                return None
+        index = self._index
+        value = parse_number(parts[index['value']])
+        if 'range' in index:
+            bounds = parse_range(parts[index['range']])
+        else:
+            low, high = parse_number(parts[index['low']]), parse_number(parts[index['high']])
+            bounds = (low, high) if low is not None and high is not None else None
+        if value is None or bounds is None:
+            return None
+        unit = parts[index['unit']] if 'unit' in index else ''
+        return parts[0].strip(), value, unit, bounds[0], bounds[1]
+
+    def rows(self, text):
+        """Yield (name, value, unit, low, high) for every row line of a page"""
+        for line in text.splitlines():
+            row = self.read_row(line)
+            if row is not None:
+                yield row
+
+
+class TemplateRegistry:
+    """Registered lab templates, looked up by a page's fingerprint"""
+
+    def __init__(self, templates=(), enabled=LAB_TEMPLATES):
+        self.enabled = enabled
+        self.templates = {}
+        for template in templates:
+            self.register(template)
+
+    def register(self, template):
+        if template.name in self.templates:
+            raise ValueError(f"template {template.name!r} is already registered")
+        self.templates[template.name] = template
+        return template
+
+    def match(self, text, page_size=None):
+        """The template for a page, or None for an unknown layout.
+
+        When several match, the one with the most header words wins.
+        """
+        if not self.enabled or not self.templates:
+            return None
+        words = fingerprint(text)
+        best = None
+        for template in self.templates.values():
+            if template.matches(words, page_size) and (best is None or len(template.header) > len(best.header)):
+                best = template
+        return best
+
+    def __iter__(self):
+        return iter(self.templates.values())
+
+
+registry = TemplateRegistry()
@@ -0,0 +1,71 @@
+# utils/uploads.py
+"""Uploads read straight from the request stream.
+
+Small uploads stay in memory and are handed to OCR as bytes. Uploads
+above ``UPLOAD_SPOOL_BYTES`` spill to a private temporary file instead,
+which is removed as soon as the request is done with it. The SHA-256
+used as the cache key is computed while reading, so the upload is never
+read twice.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+from contextlib import contextmanager
+
+from utils.metrics import timed
+
+# Largest upload kept in memory; bigger ones spill to a temporary file
+UPLOAD_SPOOL_BYTES = int(os.getenv('UPLOAD_SPOOL_BYTES', str(8 * 1024 * 1024)))
+
+_CHUNK = 1 << 16
+
+
+class Upload:
+    """One received file: its name, digest and contents as bytes or a temp path"""
+
+    def __init__(self, filename, digest, data=None, path=None):
+        self.filename = filename
+        self.digest = digest
+        self.data = data
+        self.path = path
+
+    @property
+    def source(self):
+        """What the OCR functions accept: bytes in memory, or the spill path"""
+        return self.data if self.data is not None else self.path
+
+
+@contextmanager
+def receive_upload(storage, spool_bytes=UPLOAD_SPOOL_BYTES):
+    """Read a werkzeug FileStorage into an Upload, cleaning up any spill file on exit"""
+    digest = hashlib.sha256()
+    buffer = io.BytesIO()
+    spill = None
+    try:
+        with timed('upload'):
+            for chunk in iter(lambda: storage.stream.read(_CHUNK), b''):
+                digest.update(chunk)
+                if spill is None and buffer.tell() + len(chunk) > spool_bytes:
+                    suffix = os.path.splitext(storage.filename or '')[1].lower()
+                    spill = tempfile.NamedTemporaryFile(prefix='upload-', suffix=suffix, delete=False)
+                    spill.write(buffer.getbuffer())
+                    buffer = None
+                if spill is not None:
+                    spill.write(chunk)
+                else:
+                    buffer.write(chunk)
+
+        if spill is None:
+            yield Upload(storage.filename, digest.hexdigest(), data=buffer.getvalue())
+        else:
+            spill.close()
+            yield Upload(storage.filename, digest.hexdigest(), path=spill.name)
+    finally:
+        if spill is not None:
+            spill.close()
+            try:
+                os.remove(spill.name)
+            except OSError:
+                pass